@@ -2,11 +2,27 @@
 
 
 from __future__ import print_function
+import asyncio
+import email.utils
+import hashlib
+import io
+import os
+import re
 import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from itertools import islice
 import requests as rq
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 import pathos.threading as ptth
+from prwlr.errors import ParserError
 
 
 class Columns(object):
@@ -22,15 +38,569 @@ class Columns(object):
     KEGG_ID = "KEGG_ID"
     ORF_ID = "ORF_ID"
     ORG_GENE_ID = "ORG_GENE_ID"
+    # Suffix of the completed KEGG Orthology Groups manifest.
+    MANIFEST_SUF = ".manifest"
     dtypes = {TAXON_ID: "uint32"}
 
 
+class RateLimiter(object):
+    """
+    Token bucket limiting the rate of the requests shared between threads.
+
+    Parameters
+    -------
+    rate: float
+        Number of tokens added per second.
+    burst: int
+        Maximum number of tokens available at once.
+    """
+    def __init__(self,
+                 rate=3,
+                 burst=3):
+        self.rate = float(rate)
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """
+        Takes a token and returns seconds to wait until it is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def acquire(self):
+        """
+        Blocks until a token is available and takes it.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        """
+        Awaitable RateLimiter.acquire, waiting without blocking the thread.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class ResponseCache(object):
+    """
+    On-disk cache of the responses content, one file per URL named with its
+    sha256. Files are written atomically, so concurrent readers and writers
+    never see partial content. When the cache grows over max_size, the least
+    recently used files are removed until it fits in low_water of max_size.
+    The files are listed once, then tracked in the order of use.
+
+    Parameters
+    -------
+    directory: str, path
+        Directory of the cache. Created if missing.
+    ttl: float, default <604800>
+        Seconds after which the content is downloaded again. Never if <None>.
+    max_size: int, default <1073741824>
+        Size of the cache in bytes.
+    low_water: float, default <0.8>
+        Fraction of max_size the cache is reduced to when over it.
+    """
+    def __init__(self,
+                 directory,
+                 ttl=604800,
+                 max_size=2**30,
+                 low_water=0.8):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.low_water = low_water
+        self._size = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _path(self,
+              url):
+        """
+        Returns path of the cached content of URL.
+        """
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self,
+            url):
+        """
+        Returns cached content of URL, <None> if not cached or expired.
+
+        Parameters
+        -------
+        url: str
+            URL of the content.
+
+        Returns
+        -------
+        bytes
+        """
+        path = self._path(url)
+        now = time.time()
+        try:
+            stat = os.stat(path)
+            if self.ttl is not None and now - stat.st_mtime > self.ttl:
+                return None
+            with open(path, "rb") as fin:
+                content = fin.read()
+            os.utime(path, (now, stat.st_mtime))
+        except OSError:
+            return None
+        with self._lock:
+            if self._index is not None:
+                self._track(path, len(content))
+        return content
+
+    def set(self,
+            url,
+            content):
+        """
+        Caches content of URL.
+
+        Parameters
+        -------
+        url: str
+            URL of the content.
+        content: bytes
+            Content to cache.
+        """
+        path = self._path(url)
+        dirname = os.path.dirname(path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=dirname, prefix=".tmp")
+        with os.fdopen(fd, "wb") as fout:
+            fout.write(content)
+        os.replace(temp, path)
+        with self._lock:
+            if self._index is None:
+                self._index = OrderedDict((i[2], i[1]) for i in sorted(self._entries()))
+                self._size = sum(self._index.values())
+            else:
+                self._track(path, len(content))
+            if self._size > self.max_size:
+                self._evict()
+
+    def _track(self,
+               path,
+               size):
+        """
+        Records path of size as the most recently used one.
+        """
+        self._size += size - self._index.pop(path, 0)
+        self._index[path] = size
+
+    def _entries(self):
+        """
+        Returns list of last access time, size and path of the cached files.
+        """
+        entries = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for i in filenames:
+                if i.startswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, i)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        """
+        Removes the least recently used files until the cache fits in
+        low_water of max_size.
+        """
+        while self._index and self._size > self.max_size * self.low_water:
+            path, size = self._index.popitem(last=False)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._size -= size
+
+
+class KEGGClient(object):
+    """
+    HTTP client for the KEGG REST API. Keeps one pooled requests.Session per
+    thread, limits the rate of the requests shared by all the threads and
+    retries with backoff on access denial, server and connection errors.
+    Each retry waits for the rate limit as well, and for Retry-After if the
+    server sends it.
+
+    Parameters
+    -------
+    rate: float, default <3>
+        Requests per second, KEGG's limit.
+    burst: int, default <3>
+        Requests allowed at once before rate limiting.
+    retries: int, default <5>
+        Number of retries of a failed request.
+    backoff_factor: float, default <0.5>
+        Backoff between retries, doubled after each retry.
+    status_forcelist: tuple of int
+        Status codes to retry on. KEGG answers <403> when access is denied for
+        too many requests.
+    timeout: float, default <60>
+        Seconds to wait for the server.
+    cache: prwlr.apis.ResponseCache, default <None>
+        Cache consulted before each request and updated with the responses.
+        Set on prwlr.apis.KEGG_CLIENT to cache the requests of all the
+        KEGG_API in the process.
+    """
+    def __init__(self,
+                 rate=3,
+                 burst=3,
+                 retries=5,
+                 backoff_factor=0.5,
+                 status_forcelist=(403, 429, 500, 502, 503, 504),
+                 timeout=60,
+                 cache=None):
+        self.limiter = RateLimiter(rate=rate, burst=burst)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self.timeout = timeout
+        self.cache = cache
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """
+        requests.Session of the current thread. Its adapter does not retry,
+        so that every request goes through the rate limit.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            adapter = rq.adapters.HTTPAdapter(max_retries=0)
+            session = rq.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def get(self,
+            url):
+        """
+        Returns content of the response to GET request. Empty for not found,
+        which is how KEGG answers entries without records. Cached content is
+        returned without the request.
+
+        Parameters
+        -------
+        url: str
+            URL to get.
+
+        Returns
+        -------
+        bytes
+
+        Raises
+        -------
+        requests.HTTPError
+            If the request failed after all the retries.
+        """
+        if self.cache is not None:
+            content = self.cache.get(url)
+            if content is not None:
+                return content
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            content, wait = self._request(url, attempt)
+            if content is not None:
+                return content
+            time.sleep(wait)
+
+    async def aget(self,
+                   url,
+                   executor=None):
+        """
+        Awaitable KEGGClient.get. The rate limit and the backoff are waited
+        for in the event loop, only the request and the cache run in
+        executor.
+
+        Parameters
+        -------
+        url: str
+            URL to get.
+        executor: concurrent.futures.Executor, default <None>
+            Executor of the blocking calls. Default executor of the event
+            loop if <None>.
+
+        Returns
+        -------
+        bytes
+        """
+        loop = _running_loop()
+        if self.cache is not None:
+            content = await loop.run_in_executor(executor, self.cache.get, url)
+            if content is not None:
+                return content
+        for attempt in range(self.retries + 1):
+            await self.limiter.aacquire()
+            content, wait = await loop.run_in_executor(executor, self._request, url, attempt)
+            if content is not None:
+                return content
+            await asyncio.sleep(wait)
+
+    def _request(self,
+                 url,
+                 attempt):
+        """
+        Returns content of the response to GET request, without the rate
+        limit, and caches it. Returns <None> and seconds to wait instead if
+        the request should be retried.
+        """
+        try:
+            res = self.session.get(url, timeout=self.timeout)
+        except (rq.ConnectionError, rq.Timeout):
+            if attempt >= self.retries:
+                raise
+            return None, self.backoff_factor * 2 ** attempt
+        if res.status_code in self.status_forcelist and attempt < self.retries:
+            wait = _retry_after(res.headers.get("Retry-After"))
+            return None, self.backoff_factor * 2 ** attempt if wait is None else wait
+        if res.status_code == 404:
+            content = b""
+        else:
+            res.raise_for_status()
+            content = res.content
+        if self.cache is not None:
+            self.cache.set(url, content)
+        return content, 0
+
+
+def _retry_after(value):
+    """
+    Returns seconds to wait from Retry-After header, given in seconds or as
+    HTTP date, <None> if missing or malformed.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    date = email.utils.parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(date) - time.time())
+
+
+KEGG_CLIENT = KEGGClient()
+
+
+def _running_loop():
+    """
+    Returns the event loop running the calling coroutine.
+    asyncio.get_event_loop does the same before Python 3.7.
+    """
+    return getattr(asyncio, "get_running_loop", asyncio.get_event_loop)()
+
+
+def _batches(entries,
+            batch_size):
+    """
+    Returns list of lists of entries of batch_size length at most.
+
+    Parameters
+    -------
+    entries: iterable of str
+        Entries to batch.
+    batch_size: int
+        Maximum number of entries in one batch.
+
+    Returns
+    -------
+    list of list of str
+    """
+    entries = iter(entries)
+    return list(iter(lambda: list(islice(entries, batch_size)), []))
+
+
+def _entry_key(entry):
+    """
+    Returns KEGG entry without the database prefix, e.g. <K00001> for
+    <ko:K00001>, so that requested and returned entries are matched.
+    """
+    return entry.split(":")[-1]
+
+
+def _split_links(content):
+    """
+    Returns content of KEGG link response split per entry linked, keyed
+    with prwlr.apis._entry_key.
+
+    Parameters
+    -------
+    content: bytes
+        Response to link request with one or many <+> joined entries.
+
+    Returns
+    -------
+    dict of str, bytes
+    """
+    entries = {}
+    for line in content.splitlines(True):
+        entry = _entry_key(line.split(b"\t", 1)[0].decode())
+        entries.setdefault(entry, []).append(line)
+    return {k: b"".join(v) for k, v in entries.items()}
+
+
+def _split_entries(content):
+    """
+    Returns content of KEGG get response split per entry, each ending with
+    the <///> line, keyed with prwlr.apis._entry_key.
+
+    Parameters
+    -------
+    content: bytes
+        Response to get request with one or many <+> joined entries.
+
+    Returns
+    -------
+    dict of str, bytes
+    """
+    entries = {}
+    for entry in content.split(b"///\n"):
+        if not entry.strip():
+            continue
+        for line in entry.splitlines():
+            if line.startswith(b"ENTRY"):
+                entries[_entry_key(line.split()[1].decode())] = entry + b"///\n"
+                break
+    return entries
+
+
+class OrganismIndex(object):
+    """
+    Index of the organisms descriptions for substring lookups. Lookups return
+    positions of the descriptions in ascending order.
+
+    Parameters
+    -------
+    descriptions: list of str
+        Descriptions of the organisms.
+    ids: list of str
+        KEGG Organism IDs in the order of descriptions.
+    """
+    def __init__(self,
+                 descriptions,
+                 ids):
+        self.descriptions = pd.Series(list(descriptions), dtype=object)
+        self.ids = np.asarray(list(ids), dtype=object)
+        self._text = "".join("{}\n".format(i) for i in self.descriptions)
+        self._starts = np.cumsum([0] + [len(i) + 1 for i in self.descriptions]).tolist()
+        self._words = {}
+        for position, description in enumerate(self.descriptions):
+            for word in set(description.split()):
+                self._words.setdefault(word, []).append(position)
+        self._sorted_words = sorted(self._words)
+
+    def contains(self,
+                 name):
+        """
+        Returns positions of the descriptions containing name, the same as
+        pandas.Series.str.contains. Names without regular expression special
+        characters and new lines are found with substring search of all the
+        descriptions at once. Empty name is contained in all of them.
+        """
+        if not name:
+            return np.arange(len(self.descriptions))
+        if "\n" in name or re.search(r"[.^$*+?{}\[\]\\|()]", name):
+            return np.flatnonzero(self.descriptions.str.contains(name).values)
+        positions = []
+        start = self._text.find(name)
+        while start != -1:
+            position = bisect_right(self._starts, start) - 1
+            positions.append(position)
+            start = self._text.find(name, self._starts[position + 1])
+        return np.asarray(positions, dtype=int)
+
+    def resolve(self,
+                names):
+        """
+        Returns dict of positions of the descriptions containing each of the
+        distinct names. Only the descriptions with a word of name, looked up
+        with the words index, are searched when there are such words.
+
+        Parameters
+        -------
+        names: list of str
+            Names to look up.
+
+        Returns
+        -------
+        dict of str, numpy.ndarray
+        """
+        positions = {}
+        for name in set(names):
+            if not name or "\n" in name or re.search(r"[.^$*+?{}\[\]\\|()]", name):
+                positions[name] = self.contains(name)
+                continue
+            candidates = self._candidates(name)
+            if candidates is None:
+                positions[name] = self.contains(name)
+            else:
+                positions[name] = np.asarray([i for i in candidates if name in self.descriptions.iat[i]],
+                                             dtype=int)
+        return positions
+
+    def _candidates(self,
+                    name):
+        """
+        Returns sorted positions of the descriptions which can contain name,
+        looked up with the words index, or None for the name without a whole
+        word or a word prefix known to be in each of these descriptions.
+        """
+        words = name.split()
+        first = 0 if name[0].isspace() else 1
+        if first >= len(words):
+            return None
+        word = words[first]
+        if first < len(words) - 1 or name[-1].isspace():
+            return self._words.get(word, [])
+        candidates = set()
+        for i in range(bisect_left(self._sorted_words, word), len(self._sorted_words)):
+            if not self._sorted_words[i].startswith(word):
+                break
+            candidates.update(self._words[self._sorted_words[i]])
+        return sorted(candidates)
+
+
+# Parsed /list/genome tables and their OrganismIndex shared by all the
+# KEGG_API in the process, keyed by sha256 of the table content. Only the
+# _ORGANISMS_MAXSIZE most recently used tables are kept.
+_ORGANISMS = OrderedDict()
+_ORGANISMS_MAXSIZE = 4
+_ORGANISMS_LOCK = threading.Lock()
+
+
 class KEGG_API(Columns):
     """Provides connectivity with the KEGG database. Functions ending with <tbl>
     download files provided by KEGG but DO NOT modify them. Modifications
     needed for data processing are made on pandas.DataFrame.
+
+    Parameters
+    -------
+    client: prwlr.apis.KEGGClient, default <None>
+        Client for the requests. prwlr.apis.KEGG_CLIENT, shared in the
+        process, if <None>.
     """
-    def __init__(self):
+    def __init__(self,
+                 client=None):
+        self.client = KEGG_CLIENT if client is None else client
         self.home = "http://rest.kegg.jp"
         self.operations = {"db_statistics": "info",
                            "list_entry_ids": "list",
@@ -47,6 +617,8 @@ class KEGG_API(Columns):
                           "genes": "genes",
                           "enzyme": "ec"}
         self.organisms_ids_df = None
+        self._organisms_ids_key = None
+        self._organism_index = None
         self.id_conversions = {"ncbi_gene": "ncbi-geneid",
                                "ncbi_prot": "ncbi-proteinid",
                                "uniprot": "uniprot",
@@ -68,32 +640,81 @@ class KEGG_API(Columns):
             skip_dwnld (bool): read existing file when <True>. Default <False>
         """
         if skip_dwnld:
-            path = out_file_name
+            with open(out_file_name, "rb") as fin:
+                content = fin.read()
         else:
-            path = "{0}/{1}/{2}".format(self.home,
-                                       self.operations["list_entry_ids"],
-                                       self.databases["genome"])
-        self.organisms_ids_df = pd.read_csv(path,
-                                            names=[self.GENOME_ID,
-                                                   self.NAMES,
-                                                   self.DESCRIPTION],
-                                            header=None,
-                                            sep="\t|;",
-                                            engine="python",
-                                            error_bad_lines=False,
-                                            warn_bad_lines=True)
+            content = self.client.get("{0}/{1}/{2}".format(
+                self.home,
+                self.operations["list_entry_ids"],
+                self.databases["genome"],
+            ))
+        self._organisms_ids_key = hashlib.sha256(content).hexdigest()
+        with _ORGANISMS_LOCK:
+            entry = _ORGANISMS.get(self._organisms_ids_key)
+            if entry is None:
+                entry = [self._parse_organisms_ids(content), None]
+                _ORGANISMS[self._organisms_ids_key] = entry
+            _ORGANISMS.move_to_end(self._organisms_ids_key)
+            while len(_ORGANISMS) > _ORGANISMS_MAXSIZE:
+                _ORGANISMS.popitem(last=False)
+            listed_df, organisms_ids_df = entry[0]
         if not skip_dwnld:
-            self.organisms_ids_df.to_csv(out_file_name, sep='\t')
-        temp_sub_df = self.organisms_ids_df[self.NAMES].str.split(",", expand=True)
+            listed_df.to_csv(out_file_name, sep='\t')
+        self.organisms_ids_df = organisms_ids_df.copy()
+
+    def _parse_organisms_ids(self,
+                             content):
+        """
+        Returns the /list/genome table as read and parsed into
+        KEGG_API.organisms_ids_df.
+        """
+        listed_df = pd.read_csv(io.BytesIO(content),
+                                names=[self.GENOME_ID,
+                                       self.NAMES,
+                                       self.DESCRIPTION],
+                                header=None,
+                                sep="\t|;",
+                                engine="python",
+                                error_bad_lines=False,
+                                warn_bad_lines=True)
+        temp_sub_df = listed_df[self.NAMES].str.split(",", expand=True)
         temp_sub_df.columns = [self.KEGG_ORG_ID, self.NAME, self.TAXON_ID]
-        self.organisms_ids_df.drop(self.NAMES, axis=1, inplace=True)
-        self.organisms_ids_df = pd.concat([self.organisms_ids_df, temp_sub_df], axis=1)
-        self.organisms_ids_df.replace({"genome:": ""},
-                                      regex=True,
-                                      inplace=True)
-        self.organisms_ids_df.dropna(inplace=True)
-        self.organisms_ids_df = self.organisms_ids_df.astype({k: v for k, v in self.dtypes.items()
-                                                              if k in self.organisms_ids_df.columns})
+        organisms_ids_df = pd.concat([listed_df.drop(self.NAMES, axis=1), temp_sub_df], axis=1)
+        organisms_ids_df.replace({"genome:": ""},
+                                 regex=True,
+                                 inplace=True)
+        organisms_ids_df.dropna(inplace=True)
+        organisms_ids_df = organisms_ids_df.astype({k: v for k, v in self.dtypes.items()
+                                                    if k in organisms_ids_df.columns})
+        return listed_df, organisms_ids_df
+
+    @property
+    def organism_index(self):
+        """
+        prwlr.apis.OrganismIndex of KEGG_API.organisms_ids_df, built on first
+        use and shared by all the KEGG_API with the same table in the process.
+        Kept by the KEGG_API until KEGG_API.organisms_ids_df is replaced, also
+        for the table not set by KEGG_API.get_organisms_ids or no longer kept
+        in the process.
+        """
+        if self._organism_index is not None and self._organism_index[0] is self.organisms_ids_df:
+            return self._organism_index[1]
+        with _ORGANISMS_LOCK:
+            entry = _ORGANISMS.get(self._organisms_ids_key)
+            if entry is not None:
+                _ORGANISMS.move_to_end(self._organisms_ids_key)
+                if entry[1] is None:
+                    organisms_ids_df = entry[0][1]
+                    entry[1] = OrganismIndex(organisms_ids_df[self.DESCRIPTION],
+                                             organisms_ids_df[self.KEGG_ORG_ID])
+                index = entry[1]
+            else:
+                index = None
+        if index is None:
+            index = OrganismIndex(self.organisms_ids_df[self.DESCRIPTION],
+                                  self.organisms_ids_df[self.KEGG_ORG_ID])
+        self._organism_index = (self.organisms_ids_df, index)
+        return index
 
     def org_name_2_kegg_id(self,
                            organism,
@@ -109,22 +730,55 @@ class KEGG_API(Columns):
             assume_1st (bool): return the first item if more than one hit when
             <True> (default)
         """
-        org_bool = self.organisms_ids_df[self.DESCRIPTION].str.contains(organism)
-        organism_ser = self.organisms_ids_df[org_bool]
-        if len(organism_ser) == 0:
+        return self._org_id(organism,
+                            self.organism_index.contains(organism),
+                            assume_1st)
+
+    def org_names_2_kegg_ids(self,
+                             organisms,
+                             assume_1st=True):
+        """
+        Returns list of KEGG's organisms' IDs for the list of biological names,
+        the same as KEGG_API.org_name_2_kegg_id for each of them. The names
+        are looked up at once with KEGG_API.organism_index.
+
+        Parameters
+        -------
+        organisms: list of str
+            Biological organisms' names to query against the KEGG's IDs.
+        assume_1st: bool, default <True>
+            Return the first item if more than one hit.
+
+        Returns
+        -------
+        list of str
+        """
+        positions = self.organism_index.resolve(organisms)
+        return [self._org_id(i, positions[i], assume_1st) for i in organisms]
+
+    def _org_id(self,
+                organism,
+                positions,
+                assume_1st):
+        """
+        Returns KEGG's organism's ID of the first of the positions in
+        KEGG_API.organisms_ids_df and records organism as found or not found.
+        """
+        if len(positions) == 0:
             print("No record found for {}".format(organism))
             self.query_ids_not_found.append(organism)
-        elif len(organism_ser) > 1:
-            print("More than one record for this query\n{}".format(organism_ser[[self.DESCRIPTION,
-                                                                                 self.KEGG_ORG_ID]]))
+        elif len(positions) > 1:
+            print("More than one record for this query\n{}".format(
+                self.organisms_ids_df[[self.DESCRIPTION, self.KEGG_ORG_ID]].iloc[positions]
+            ))
             if assume_1st is True:
                 self.query_ids_found.append(organism)
-                return organism_ser[self.KEGG_ORG_ID].iloc[0]
+                return self.organism_index.ids[positions[0]]
             else:
                 return None
         else:
             self.query_ids_found.append(organism)
-            return organism_ser[self.KEGG_ORG_ID].iloc[0]
+            return self.organism_index.ids[positions[0]]
 
     def get_org_db_X_ref(self,
                          organism,
@@ -151,10 +805,12 @@ class KEGG_API(Columns):
         if skip_dwnld:
             path = out_file_name
         else:
-            path = "{0}/{1}/{2}/{3}".format(self.home,
-                                           self.operations["find_X_ref"],
-                                           self.databases[target_db],
-                                           org_id)
+            path = io.BytesIO(self.client.get("{0}/{1}/{2}/{3}".format(
+                self.home,
+                self.operations["find_X_ref"],
+                self.databases[target_db],
+                org_id,
+            )))
         self.org_db_X_ref_df = pd.read_csv(path,
                                            names=[self.ORF_ID, self.KEGG_ID],
                                            header=None,
@@ -187,7 +843,9 @@ class KEGG_API(Columns):
                          strip_prefix=True,
                          squeeze=True,
                          sep="\t",
-                         threads=1):
+                         threads=1,
+                         batch_size=10,
+                         resume=False):
         """
         Get desired KEGG's database entries linked with KEGG Orthology Group.
         Data are downloaded to a local file and then made into pandas.DataFrame.
@@ -207,7 +865,22 @@ class KEGG_API(Columns):
         sep: str, default: <\t>
             Delimiter to use.
         threads: int, default <1>
-            Number of threads to spawn during download.
+            Number of threads to spawn during download. Responses are written
+            by the calling thread in the order of the KEGG Orthology Groups,
+            so the file is the same for any number of threads.
+        batch_size: int, default <10>
+            Number of KEGG Orthology Groups joined in one request.
+        resume: bool, default <False>
+            Record the downloaded KEGG Orthology Groups in a manifest next to
+            the file and download only the ones missing from the manifest,
+            dropping anything written after the last recorded one. File
+            without manifest is downloaded again.
+
+        Raises
+        -------
+        prwlr.errors.ParserError
+            If KEGG Orthology Groups of the manifest and
+            KEGG_API.org_db_X_ref_df are different after resumed download.
 
         Uses
         -------
@@ -220,36 +893,177 @@ class KEGG_API(Columns):
             DataFrame of KEGG Orthology Group ID and belonging organisms and
             genes
         """
-        def f(i):
-            retries = rq.packages.urllib3.util.retry.Retry(
-                total=5,
-                backoff_factor=0.5,
-            )
-            adapter = rq.adapters.HTTPAdapter(max_retries=retries)
-            http = rq.Session()
-            http.mount("http://", adapter)
+        def f(batch):
             if sys.version_info.major < 3:
-                print("{} ".format(i))
+                print("{} ".format(batch[0]))
             else:
-                print("{} ".format(i), flush=True, end='\r')
-            url = '{}/{}/{}/{}'.format(
-                self.home,
-                self.operations['find_X_ref'],
-                self.databases[target_db],
-                i,
-            )
-            res = rq.get(url)
-            with open(filename, 'ab') as fout:
-                fout.write(res.content)
+                print("{} ".format(batch[0]), flush=True, end='\r')
+            return self._get_links(target_db, batch)
         if not skip_dwnld:
+            KOs_batches = _batches(self._KOs_to_download(filename, resume), batch_size)
             if threads > 1:
-                ptth.ThreadPool(threads).map(
-                    f,
-                    self.org_db_X_ref_df[self.KEGG_ID]
-                )
+                contents = ptth.ThreadPool(threads).imap(f, KOs_batches)
             else:
-                for i in self.org_db_X_ref_df[self.KEGG_ID]:
-                    f(i)
+                contents = map(f, KOs_batches)
+            with self._KOs_writer(filename, resume) as write:
+                for batch, content in zip(KOs_batches, contents):
+                    write(batch, content)
+        self._read_KOs_db_X_ref(filename, strip_prefix, squeeze, sep)
+
+    async def aget_KOs_db_X_ref(self,
+                                filename,
+                                target_db='genes',
+                                skip_dwnld=False,
+                                strip_prefix=True,
+                                squeeze=True,
+                                sep="\t",
+                                concurrency=6,
+                                batch_size=10,
+                                resume=False):
+        """
+        Awaitable KEGG_API.get_KOs_db_X_ref. Requests run through
+        KEGGClient.aget of KEGG_API.client, so the rate limit is shared with
+        all the other requests of the client and is waited for in the event
+        loop. The requests themselves are blocking calls of requests, each
+        holding one of concurrency threads of an executor of their own while
+        it waits for KEGG. Reading the file runs in the default executor of
+        the event loop.
+
+        Parameters
+        -------
+        concurrency: int, default <6>
+            Number of requests to KEGG at once. Replaces threads.
+
+        Sets
+        -------
+        KEGG_API.KOs_db_X_ref_df: pandas.DataFrame
+            DataFrame of KEGG Orthology Group ID and belonging organisms and
+            genes
+        """
+        loop = _running_loop()
+        if not skip_dwnld:
+            semaphore = asyncio.Semaphore(concurrency)
+            executor = ThreadPoolExecutor(max_workers=concurrency)
+
+            async def f(batch):
+                async with semaphore:
+                    return self._join_links(
+                        await self.client.aget(self._links_url(target_db, batch), executor),
+                        batch,
+                    )
+            KOs_batches = _batches(self._KOs_to_download(filename, resume), batch_size)
+            tasks = [asyncio.ensure_future(f(i)) for i in KOs_batches]
+            try:
+                with self._KOs_writer(filename, resume) as write:
+                    for batch, task in zip(KOs_batches, tasks):
+                        write(batch, await task)
+            finally:
+                for i in tasks:
+                    i.cancel()
+                executor.shutdown(wait=False)
+        await loop.run_in_executor(None, self._read_KOs_db_X_ref, filename, strip_prefix, squeeze, sep)
+
+    def _KOs_to_download(self,
+                         filename,
+                         resume):
+        """
+        Returns list of KEGG Orthology Groups of KEGG_API.org_db_X_ref_df to
+        download. Without resume all of them. With resume the ones missing
+        from the manifest, after the file is truncated to the end of the last
+        one recorded and the manifest to its complete lines.
+        """
+        KOs = self.org_db_X_ref_df[self.KEGG_ID].tolist()
+        if not resume:
+            return KOs
+        manifest = "{}{}".format(filename, self.MANIFEST_SUF)
+        lines = []
+        if os.path.exists(manifest):
+            with open(manifest, "r") as fin:
+                lines = [i for i in fin if i.endswith("\n")]
+        with open(manifest, "w") as fout:
+            fout.writelines(lines)
+        with open(filename, "ab") as fout:
+            fout.truncate(int(lines[-1].split("\t")[1]) if lines else 0)
+        completed = Counter(i.split("\t")[0] for i in lines)
+        missing = []
+        for i in KOs:
+            if completed[i] > 0:
+                completed[i] -= 1
+            else:
+                missing.append(i)
+        return missing
+
+    @contextmanager
+    def _KOs_writer(self,
+                    filename,
+                    resume):
+        """
+        Yields function writing content of a batch of KEGG Orthology Groups to
+        the file. With resume the KEGG Orthology Groups are recorded in the
+        manifest with the file size after the content is flushed, and the
+        manifest is verified against KEGG_API.org_db_X_ref_df on exit.
+        """
+        manifest = "{}{}".format(filename, self.MANIFEST_SUF)
+        with open(filename, "ab") as fout:
+            if not resume:
+                yield lambda batch, content: fout.write(content)
+                return
+            with open(manifest, "a") as fman:
+                def write(batch, content):
+                    fout.write(content)
+                    fout.flush()
+                    fman.write("".join("{}\t{}\n".format(i, fout.tell()) for i in batch))
+                    fman.flush()
+                yield write
+        with open(manifest, "r") as fin:
+            completed = Counter(i.split("\t")[0] for i in fin)
+        if completed != Counter(self.org_db_X_ref_df[self.KEGG_ID]):
+            raise ParserError("{} of {} and {} are different.".format(
+                self.KEGG_ID,
+                manifest,
+                "X_reference",
+            ))
+
+    def _get_links(self,
+                   target_db,
+                   entries):
+        """
+        Returns content of the link request of target_db for entries, lines
+        of each entry in the order of entries.
+        """
+        return self._join_links(self.client.get(self._links_url(target_db, entries)), entries)
+
+    def _links_url(self,
+                   target_db,
+                   entries):
+        """
+        Returns URL of the link request of target_db for entries.
+        """
+        return '{}/{}/{}/{}'.format(
+            self.home,
+            self.operations['find_X_ref'],
+            self.databases[target_db],
+            "+".join(entries),
+        )
+
+    def _join_links(self,
+                    content,
+                    entries):
+        """
+        Returns content of the link request, lines of each entry in the
+        order of entries.
+        """
+        links = _split_links(content)
+        return b"".join(links.get(_entry_key(i), b"") for i in entries)
+
+    def _read_KOs_db_X_ref(self,
+                           filename,
+                           strip_prefix,
+                           squeeze,
+                           sep):
+        """
+        Sets KEGG_API.KOs_db_X_ref_df from the downloaded file.
+        """
         self.KOs_db_X_ref_df = pd.read_csv(filename,
                                            names=[self.KEGG_ID,
                                                   self.ORG_GENE_ID],
@@ -268,7 +1082,8 @@ class KEGG_API(Columns):
                 )[self.ORG_GENE_ID].apply(list).to_frame().reset_index()
 
     def get_db_entries(self,
-                       out_file_name):
+                       out_file_name,
+                       batch_size=10):
         """Get full database by quering entries from
         KEGG_API.org_db_X_ref_df and download them into a local file.
         Necessary for Genome.parse_KO_db. The only func that does NOT convert
@@ -276,16 +1091,18 @@ class KEGG_API(Columns):
 
         Args:
             out_file_name (str): name for file to be downloaded
+            batch_size (int): number of entries joined in one request. KEGG
+            returns 10 at most. Default <10>
         """
         entries = self.org_db_X_ref_df[self.KEGG_ID].drop_duplicates()
-        for i in tqdm(entries):
+        for batch in tqdm(_batches(entries, batch_size)):
             url = "{0}/{1}/{2}".format(self.home,
                                        self.operations["get_by_entry_no"],
-                                       i)
+                                       "+".join(batch))
             print("Getting entry from {}".format(url))
-            res = rq.get(url)
+            content = _split_entries(self.client.get(url))
             with open(out_file_name, "ab") as fout:
-                fout.write(res.content)
+                fout.write(b"".join(content.get(_entry_key(i), b"") for i in batch))
 
 
 class CostanzoAPI(object):
@@ -353,3 +1170,20 @@ class CostanzoAPI(object):
         res = rq.get(url)
         with open("{}/{}".format(output_directory, out_file_name), "wb") as fout:
             fout.write(res.content)
+
+    async def aget_data(self,
+                        data,
+                        output_directory=".",
+                        sga_version="v2"):
+        """Awaitable CostanzoAPI.get_data. The download is the blocking
+        CostanzoAPI.get_data run in a thread of the default executor of the
+        event loop, so the loop is free while it runs but the thread is held
+        for the whole download and the writing of the file.
+        """
+        await _running_loop().run_in_executor(
+            None,
+            self.get_data,
+            data,
+            output_directory,
+            sga_version,
+        )
@@ -1,8 +1,14 @@
-import gc as _gc
+from itertools import chain as _chain
+from itertools import islice as _islice
+import glob as _glob
+import os as _os
 import pandas as _pd
 import numpy as _np
+import pathos.multiprocessing as _ptmp
 from . import databases as _databases
+from . import errors as _errors
 from . import profiles as _profiles
+from . import utils as _utils
 
 class Columns(_databases.Columns):
     """
@@ -16,6 +22,7 @@ class Columns(_databases.Columns):
     PROF_Q = _databases.Columns.PROF_Q
     PROF_A = _databases.Columns.PROF_A
     STR_SEP = '|'
+    PROFILES_SUF = '.profiles.csv'
 
 def get_IDs_names(
     species,
@@ -66,18 +73,88 @@ def profilize_organism(*args, **kwargs):
     threads: int
         Number of threads to utilize when downloading from KEGG. More means
         faster but can make KEGG block the download temporarily. Default: <2>
+    resume: bool
+        Download to KOs, skipping the KEGG Orthology Groups recorded in its
+        manifest by an interrupted run. Default: <False>
+    matrix: bool
+        Return prwlr.profiles.ProfileMatrix indexed with the ORF names
+        instead of pandas.DataFrame. Default: <False>
 
     Returns
     ------
-    pandas.DataFrame
+    pandas.DataFrame or prwlr.profiles.ProfileMatrix
     """
+    matrix = kwargs.pop('matrix', False)
     kegg_db = _databases.KEGG('Orthology')
     kegg_db.parse_organism_info(*args, **kwargs)
+    if matrix:
+        return kegg_db.profile_matrix
     return kegg_db.organism_info.drop(columns=_databases.Columns.KEGG_ID)
 
+async def profilize_organism_async(*args, **kwargs):
+    """
+    Awaitable prwlr.core.profilize_organism. KEGG is queried with
+    prwlr.apis.KEGG_API.aget_KOs_db_X_ref, so several organisms can be
+    profilized at once with asyncio.gather.
+
+    Parameters
+    -------
+    concurrency: int
+        Number of requests to KEGG at once. Replaces threads. Default: <6>
+
+    Returns
+    ------
+    pandas.DataFrame or prwlr.profiles.ProfileMatrix
+    """
+    matrix = kwargs.pop('matrix', False)
+    kegg_db = _databases.KEGG('Orthology')
+    await kegg_db.aparse_organism_info(*args, **kwargs)
+    if matrix:
+        return kegg_db.profile_matrix
+    return kegg_db.organism_info.drop(columns=_databases.Columns.KEGG_ID)
+
+def _sga_filenames(
+    filename,
+):
+    """
+    Returns list of SGA files from list of files or glob pattern, <None> for
+    a single file.
+    """
+    if isinstance(filename, (list, tuple)):
+        return [str(i) for i in filename]
+    if any(i in str(filename) for i in '*?['):
+        return sorted(_glob.glob(str(filename)))
+    return None
+
+def _read_sga_file(
+    task,
+):
+    """
+    Returns one SGA file parsed with prwlr.core.read_sga.
+    """
+    filename, version, kwargs = task
+    return read_sga(filename, version=version, **kwargs)
+
+def _with_source(
+    sga,
+    filename,
+    filenames,
+):
+    """
+    Returns chunk of SGA with the categorical source column.
+    """
+    sga[_databases.Columns.SOURCE] = _pd.Categorical.from_codes(
+        _np.full(len(sga), filenames.index(filename)),
+        categories=filenames,
+    )
+    return sga
+
 def read_sga(
     filename,
     version=2,
+    chunksize=None,
+    workers=None,
+    **kwargs
 ):
     """
     Returns pandas.DataFrame with Genetic Interaction Network from
@@ -85,22 +162,73 @@ def read_sga(
 
     Parameters
     -------
-    filename: str, path
-        Filename of the SGA.
+    filename: str, path, list of str
+        Filename of the SGA. List of filenames or glob pattern to read
+        multiple files, with the file of each interaction in the source
+        column.
     version: int
         Version number of the Costanzo's SGA experiment. 1 or 2 available.
+    chunksize: int, default <None>
+        Return iterator of pandas.DataFrame of chunksize rows instead of
+        reading the whole file. Multiple files are read one after another.
+    workers: int, default <None>
+        Number of processes parsing multiple files at once. One per file if
+        <None>. Files are parsed in the calling process if <1>.
+    usecols: list of str
+        Columns to keep. All the columns if <None>.
+    p_value: float
+        Keep interactions with GIS_P lower or equal.
+    gis: float
+        Keep interactions with absolute GIS greater or equal.
+    temp: str, list of str
+        Keep interactions with TEMP equal or in the list. Version 2 only.
+    predicate: callable
+        Called with each parsed chunk, returns boolean mask of the rows to
+        keep.
+    cache: bool
+        Memory-map the parsed SGA from a columnar cache next to the file,
+        written on the first call. Default: <False>
 
     Returns
     -------
-    pandas.DataFrame
+    pandas.DataFrame or iterator of pandas.DataFrame
     """
+    filenames = _sga_filenames(filename)
+    if filenames is not None:
+        if not filenames:
+            raise _errors.ParserError("No SGA files in: {}".format(filename))
+        if chunksize is not None:
+            return _chain.from_iterable(
+                (_with_source(chunk, i, filenames) for chunk in read_sga(i, version, chunksize, **kwargs))
+                for i in filenames
+            )
+        tasks = [(i, version, kwargs) for i in filenames]
+        if workers is None:
+            workers = len(filenames)
+        if workers > 1 and len(filenames) > 1:
+            frames = _ptmp.ProcessingPool(nodes=workers).map(_read_sga_file, tasks)
+        else:
+            frames = [_read_sga_file(i) for i in tasks]
+        # Frames are cast by read_sga already, only the categories of each
+        # file are unioned so the ID columns stay categorical.
+        sga = _databases._concat_chunks(frames)
+        sga.index = _pd.RangeIndex(len(sga))
+        sga[_databases.Columns.SOURCE] = _pd.Categorical.from_codes(
+            _np.repeat(_np.arange(len(filenames)), [len(i) for i in frames]),
+            categories=filenames,
+        )
+        return sga
     if version == 1:
         sga = _databases.SGA1()
     elif version == 2:
         sga = _databases.SGA2()
     else:
-        raise errors.ParserError("Only versions 1 and 2 of Costanzo's SGA experiment are supported.")
-    sga.parse(filename=filename)
+        raise _errors.ParserError("Only versions 1 and 2 of Costanzo's SGA experiment are supported.")
+    if chunksize is not None and not kwargs.get('cache'):
+        return sga.parse_chunks(filename=filename, chunksize=chunksize, **kwargs)
+    sga.parse(filename=filename, **kwargs)
+    if chunksize is not None:
+        return (sga.sga.iloc[i:i + chunksize] for i in range(0, len(sga.sga), chunksize))
     return sga.sga
 
 def read_profiles(
@@ -111,6 +239,8 @@ def read_profiles(
     Returns pandas.Series with prwlr.profiles.Profile objects from CSV file.
     Together with prwlr.core.save_profiles provides a convenient way of
     saving/reading-in prwlr.profiles.Profile objects to/from a flat text file.
+    Missing reference, written for profiles with none of the query elements
+    present, is read as an empty one.
 
     Parameters
     -------
@@ -122,14 +252,10 @@ def read_profiles(
     pandas.Series
     """
     ref_qry_df = _pd.read_csv(filename, **kwargs)
-    ref_qry_df[Columns.REF_SPLIT] = ref_qry_df[Columns.REF].str.split(Columns.STR_SEP)
-    ref_qry_df[Columns.QRY_SPLIT] = ref_qry_df[Columns.QRY].str.split(Columns.STR_SEP)
-    return ref_qry_df[[Columns.REF_SPLIT, Columns.QRY_SPLIT]].apply(
-        lambda x: _profiles.Profile(
-            reference=x[Columns.REF_SPLIT],
-            query=x[Columns.QRY_SPLIT],
-        ),
-        axis=1,
+    return _pd.Series(
+        _profiles_from_strings(ref_qry_df[Columns.REF], ref_qry_df[Columns.QRY]),
+        index=ref_qry_df.index,
+        dtype=object,
     )
 
 def save_profiles(
@@ -141,6 +267,9 @@ def save_profiles(
     Writes pandas.Series with prwlr.profiles.Profile objects to CSV file.
     Together with prwlr.core.read_profiles provides a convenient way of
     saving/reading-in prwlr.profiles.Profile objects to/from a flat text file.
+    References are written sorted. Profiles of
+    prwlr.profiles.ProfileArray, e.g. of prwlr.databases.KEGG.organism_info,
+    have the present query elements as the reference.
 
     Parameters
     -------
@@ -149,49 +278,149 @@ def save_profiles(
     """
     _pd.DataFrame(
         {
-            Columns.REF: series.apply(lambda x: x.reference).str.join(Columns.STR_SEP),
+            Columns.REF: series.apply(lambda x: sorted(x.reference)).str.join(Columns.STR_SEP),
             Columns.QRY: series.apply(lambda x: x.query).str.join(Columns.STR_SEP),
         },
     ).to_csv(filename, **kwargs)
 
-def read_network(
+def _profiles_from_strings(
+    references,
+    queries,
+):
+    """
+    Returns prwlr.profiles.Profile objects built from references and queries
+    joined with Columns.STR_SEP. Missing reference means an empty one.
+    """
+    return [
+        _profiles.Profile(
+            reference=ref.split(Columns.STR_SEP) if isinstance(ref, str) else [],
+            query=qry.split(Columns.STR_SEP),
+        )
+        for ref, qry in zip(references, queries)
+    ]
+
+def _profiles_strings(
+    series,
+):
+    """
+    Returns codes of the distinct profiles of pandas.Series and their
+    references and queries joined with Columns.STR_SEP. Each distinct
+    object, or each row of prwlr.profiles.ProfileArray table, is joined
+    only once.
+    """
+    values = series.array
+    if isinstance(values, _profiles.ProfileArray):
+        objects = list(_profiles.ProfileArray(
+            values._table,
+            _np.arange(len(values._table)),
+            values.dtype,
+        ))
+        codes = values._codes
+    else:
+        values = _np.asarray(values, dtype=object)
+        _, first, codes = _np.unique(
+            _np.fromiter((id(i) for i in values), dtype=_np.int64, count=len(values)),
+            return_index=True,
+            return_inverse=True,
+        )
+        objects = values[first]
+    strings = [
+        (Columns.STR_SEP.join(sorted(i.reference)), Columns.STR_SEP.join(i.query))
+        for i in objects
+    ]
+    return codes, strings
+
+def _profiles_table(
+    profiles_q,
+    profiles_a,
+):
+    """
+    Returns codes of the query and array profiles into one table of distinct
+    profiles and the table as references and queries joined with
+    Columns.STR_SEP.
+    """
+    table = {}
+    codes = []
+    for series in (profiles_q, profiles_a):
+        series_codes, strings = _profiles_strings(series)
+        remap = _np.array(
+            [table.setdefault(i, len(table)) for i in strings],
+            dtype=_np.int64,
+        )
+        codes.append(remap[series_codes])
+    return codes[0], codes[1], sorted(table, key=table.get)
+
+def _profiles_table_filename(
     filename,
-    **kwargs
 ):
     """
-    Returns pandas.DataFrame representing a Genetic Interaction Network with
-    prwlr.profiles.Profile objects from CSV file. Together with
-    prwlr.core.save_profiles provides a convenient way of saving/reading-in
-    prwlr.profiles.Profile objects to/from a flat text file.
+    Returns name of the profiles table file written next to the network by
+    prwlr.core.save_network with profiles_table.
+    """
+    return '{}{}'.format(filename, Columns.PROFILES_SUF)
 
-    Parameters
-    -------
-    filename: str, path
-        CSV file name.
+def _read_profiles_table(
+    filename,
+):
+    """
+    Returns numpy.ndarray of prwlr.profiles.Profile objects, one per code,
+    from the profiles table file.
+    """
+    table = _pd.read_csv(filename, index_col=[0])
+    if not table.index.equals(_pd.RangeIndex(len(table))):
+        raise _errors.ParserError("Profiles table {} is not indexed by codes.".format(filename))
+    profiles = _np.empty(len(table), dtype=object)
+    profiles[:] = _profiles_from_strings(table[Columns.REF], table[Columns.QRY])
+    return profiles
 
-    Returns
-    -------
-    pandas.DataFrame
+def _read_network_chunk(
+    df,
+    table,
+):
     """
+    Returns network read from CSV with the profiles columns built from the
+    references and queries of each row, or taken by the codes from the
+    profiles table. The table is a dict of the profiles by references and
+    queries, updated with the profiles built, and the profiles table as
+    numpy.ndarray under <None>. Raises prwlr.errors.ParserError for the
+    codes missing from the profiles table.
+    """
+    if Columns.PROF_Q in df.columns:
+        if None not in table:
+            raise _errors.ParserError("Profiles columns of codes need the profiles table.")
+        profiles = table[None]
+        for column in (Columns.PROF_Q, Columns.PROF_A):
+            codes = df[column].values.astype(_np.int64)
+            undefined = (codes < 0) | (codes >= len(profiles))
+            if undefined.any():
+                raise _errors.ParserError(
+                    "Profiles {} are missing from the profiles table.".format(
+                        sorted(set(codes[undefined].tolist()))[:10],
+                    )
+                )
+            df[column] = profiles[codes]
+        return df
     qry_ref_col = '{}_{}'.format(Columns.PROF_Q, Columns.REF)
     qry_qry_col = '{}_{}'.format(Columns.PROF_Q, Columns.QRY)
     arr_ref_col = '{}_{}'.format(Columns.PROF_A, Columns.REF)
     arr_qry_col = '{}_{}'.format(Columns.PROF_A, Columns.QRY)
-    df = _pd.read_csv(filename, **kwargs)
-    df[Columns.PROF_Q] = df[[qry_ref_col, qry_qry_col]].apply(
-        lambda x: _profiles.Profile(
-            reference=x[qry_ref_col].split(Columns.STR_SEP),
-            query=x[qry_qry_col].split(Columns.STR_SEP),
+    codes, uniques = _pd.MultiIndex.from_arrays([
+        _pd.concat([df[qry_ref_col], df[arr_ref_col]], ignore_index=True),
+        _pd.concat([df[qry_qry_col], df[arr_qry_col]], ignore_index=True),
+    ]).factorize()
+    keys = list(uniques)
+    missing = [i for i in keys if i not in table]
+    table.update(zip(
+        missing,
+        _profiles_from_strings(
+            [i[0] for i in missing],
+            [i[1] for i in missing],
         ),
-        axis=1,
-    )
-    df[Columns.PROF_A] = df[[arr_ref_col, arr_qry_col]].apply(
-        lambda x: _profiles.Profile(
-            reference=x[arr_ref_col].split(Columns.STR_SEP),
-            query=x[arr_qry_col].split(Columns.STR_SEP),
-        ),
-        axis=1,
-    )
+    ))
+    profiles = _np.empty(len(keys), dtype=object)
+    profiles[:] = [table[i] for i in keys]
+    df[Columns.PROF_Q] = profiles[codes[:len(df)]]
+    df[Columns.PROF_A] = profiles[codes[len(df):]]
     return df.drop(columns=[
         qry_ref_col,
         qry_qry_col,
@@ -199,43 +428,283 @@ def read_network(
         arr_qry_col,
     ])
 
+def _network_table(
+    filename,
+):
+    """
+    Returns dict of the profiles to be filled with the profiles read, with
+    the profiles table of the network file under <None> if there is one.
+    """
+    table_filename = _profiles_table_filename(filename)
+    if isinstance(filename, str) and _os.path.exists(table_filename):
+        return {None: _read_profiles_table(table_filename)}
+    return {}
+
+def _read_network_chunks(
+    filename,
+    chunksize,
+    **kwargs
+):
+    """
+    Yields chunks of network read from CSV, sharing one profiles table.
+    """
+    table = _network_table(filename)
+    for df in _pd.read_csv(filename, chunksize=chunksize, **kwargs):
+        yield _read_network_chunk(df, table)
+
+def read_network(
+    filename,
+    chunksize=None,
+    **kwargs
+):
+    """
+    Returns pandas.DataFrame representing a Genetic Interaction Network with
+    prwlr.profiles.Profile objects from CSV file. Together with
+    prwlr.core.save_profiles provides a convenient way of saving/reading-in
+    prwlr.profiles.Profile objects to/from a flat text file. Each distinct
+    profile is built once and shared by all the interactions pointing to it.
+    Networks saved with profiles_table have the profiles read from the
+    profiles table, once, and taken by the codes of the rows.
+
+    Parameters
+    -------
+    filename: str, path
+        CSV file name.
+    chunksize: int, default <None>
+        Return iterator of pandas.DataFrame of chunksize rows instead of
+        reading the whole file. The profiles are shared across the chunks.
+
+    Returns
+    -------
+    pandas.DataFrame or iterator of pandas.DataFrame
+    """
+    if chunksize is not None:
+        return _read_network_chunks(filename, chunksize, **kwargs)
+    return _read_network_chunk(_pd.read_csv(filename, **kwargs), _network_table(filename))
+
 def save_network(
     dataframe,
     filename,
+    chunksize=2 ** 16,
+    profiles_table=False,
     **kwargs
 ):
     """
     Writes pandas.DataFrame representing a Genetic Interaction Network with
     prwlr.profiles.Profile objects to CSV file. Together with
     prwlr.core.save_profiles provides a convenient way of saving/reading-in
-    prwlr.profiles.Profile objects to/from a flat text file.
+    prwlr.profiles.Profile objects to/from a flat text file. Each row holds
+    the references and queries of both profiles, so the file can be sorted,
+    filtered or split. The strings are joined once per distinct profile and
+    shared by the rows. The dataframe is not copied, it is written in
+    chunks, so the memory used does not grow with the network.
 
     Parameters
     -------
     filename: str, path
         CSV file name.
+    chunksize: int
+        Number of rows written at once.
+    profiles_table: bool, default <False>
+        Write the distinct profiles once, to the profiles table file named
+        as filename with Columns.PROFILES_SUF, and the profiles columns as
+        codes of the table rows. The rows can still be sorted, filtered or
+        split, the table is kept as it is.
     """
     qry_ref_col = '{}_{}'.format(Columns.PROF_Q, Columns.REF)
     qry_qry_col = '{}_{}'.format(Columns.PROF_Q, Columns.QRY)
     arr_ref_col = '{}_{}'.format(Columns.PROF_A, Columns.REF)
     arr_qry_col = '{}_{}'.format(Columns.PROF_A, Columns.QRY)
-    df = dataframe.copy()
-    df[qry_ref_col] = df[Columns.PROF_Q].apply(
-        lambda x: x.reference,
-    ).str.join(Columns.STR_SEP)
-    df[qry_qry_col] = df[Columns.PROF_Q].apply(
-        lambda x: x.query,
-    ).str.join(Columns.STR_SEP)
-    df[arr_ref_col] = df[Columns.PROF_A].apply(
-        lambda x: x.reference,
-    ).str.join(Columns.STR_SEP)
-    df[arr_qry_col] = df[Columns.PROF_A].apply(
-        lambda x: x.query,
-    ).str.join(Columns.STR_SEP)
-    df.drop(
-        columns=[Columns.PROF_Q, Columns.PROF_A],
-    ).to_csv(filename, **kwargs)
-    del df; _gc.collect()
+    header = kwargs.pop('header', True)
+    kwargs.pop('mode', None)
+    codes_q, codes_a, table = _profiles_table(
+        dataframe[Columns.PROF_Q],
+        dataframe[Columns.PROF_A],
+    )
+    references = _np.empty(len(table), dtype=object)
+    references[:] = [i[0] for i in table]
+    queries = _np.empty(len(table), dtype=object)
+    queries[:] = [i[1] for i in table]
+    if profiles_table:
+        _pd.DataFrame({
+            Columns.REF: references,
+            Columns.QRY: queries,
+        }).to_csv(_profiles_table_filename(filename))
+    for start in range(0, max(len(dataframe), 1), chunksize):
+        stop = start + chunksize
+        chunk = dataframe.iloc[start:stop]
+        if profiles_table:
+            chunk = chunk.assign(**{
+                Columns.PROF_Q: codes_q[start:stop],
+                Columns.PROF_A: codes_a[start:stop],
+            })
+        else:
+            chunk = chunk.drop(
+                columns=[Columns.PROF_Q, Columns.PROF_A],
+            ).assign(**{
+                qry_ref_col: references.take(codes_q[start:stop]),
+                qry_qry_col: queries.take(codes_q[start:stop]),
+                arr_ref_col: references.take(codes_a[start:stop]),
+                arr_qry_col: queries.take(codes_a[start:stop]),
+            })
+        chunk.to_csv(
+            filename,
+            mode='w' if start == 0 else 'a',
+            header=header if start == 0 else False,
+            **kwargs
+        )
+
+def _is_profiles(
+    series,
+):
+    """
+    Returns <True> if pandas.Series holds prwlr.profiles.Profile objects.
+    """
+    if isinstance(series.dtype, _profiles.ProfileDtype):
+        return True
+    if series.dtype != object:
+        return False
+    present = series.dropna()
+    return len(present) > 0 and all(isinstance(i, _profiles.Profile) for i in present)
+
+def _network_to_arrays(
+    dataframe,
+):
+    """
+    Returns arrays and description of the network for the binary columnar
+    format, with the profiles columns packed by
+    prwlr.profiles.profiles_to_arrays.
+    """
+    profiles_columns = [
+        i for i in range(dataframe.shape[1])
+        if _is_profiles(dataframe.iloc[:, i])
+    ]
+    arrays, meta = _utils.frame_to_arrays(
+        dataframe.iloc[:, [i for i in range(dataframe.shape[1]) if i not in profiles_columns]],
+    )
+    meta["order"] = dataframe.columns.tolist()
+    meta["profiles"] = []
+    for i in profiles_columns:
+        profiles_arrays, profiles_meta = _profiles.profiles_to_arrays(
+            dataframe.iloc[:, i],
+            "p{}".format(i),
+        )
+        profiles_meta["name"] = meta["order"][i]
+        profiles_meta["position"] = i
+        arrays.update(profiles_arrays)
+        meta["profiles"].append(profiles_meta)
+    return arrays, meta
+
+def _network_from_arrays(
+    arrays,
+    meta,
+):
+    """
+    Returns network from arrays and description returned by
+    prwlr.core._network_to_arrays.
+    """
+    df = _utils.frame_from_arrays(arrays, meta)
+    if not meta["profiles"]:
+        return df
+    columns = [df.iloc[:, i] for i in range(df.shape[1])]
+    for profiles_meta in meta["profiles"]:
+        columns.insert(profiles_meta["position"], _pd.Series(
+            _profiles.profiles_from_arrays(arrays, profiles_meta),
+            index=df.index,
+            name=profiles_meta["name"],
+            copy=False,
+        ))
+    df = _pd.concat(columns, axis=1, copy=False)
+    df.columns = meta["order"]
+    return df
+
+def save_network_binary(
+    dataframe,
+    dirname,
+):
+    """
+    Writes pandas.DataFrame representing a Genetic Interaction Network with
+    prwlr.profiles.Profile objects to a directory in a binary columnar
+    format, one .npy file per array. Distinct profiles of each of the
+    profiles columns are packed into one block, with the species axes in the
+    header. The other columns are stored as numeric arrays or as codes and
+    categories. Together with prwlr.core.read_network_binary it makes a
+    lossless round trip without parsing the profiles from text.
+
+    Parameters
+    -------
+    dataframe: pandas.DataFrame
+        Network to write. Profiles columns may hold prwlr.profiles.Profile
+        objects or be prwlr.profiles.ProfileArray.
+    dirname: str, path
+        Directory name. Created if it does not exist.
+    """
+    arrays, meta = _network_to_arrays(dataframe)
+    _utils.save_arrays(dirname, arrays, meta)
+
+def read_network_binary(
+    dirname,
+    mmap_mode="r",
+):
+    """
+    Returns pandas.DataFrame representing a Genetic Interaction Network with
+    prwlr.profiles.Profile objects from a directory written by
+    prwlr.core.save_network_binary. Numeric columns and the codes are
+    memory-mapped, so loading does not read them into memory.
+
+    Parameters
+    -------
+    dirname: str, path
+        Directory name.
+    mmap_mode: str, default <"r">
+        Passed to numpy.load. Arrays are read into memory if <None>.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    return _network_from_arrays(*_utils.read_arrays(dirname, mmap_mode=mmap_mode))
+
+def save_profiles_binary(
+    series,
+    dirname,
+):
+    """
+    Writes pandas.Series with prwlr.profiles.Profile objects to a directory
+    in the binary columnar format of prwlr.core.save_network_binary.
+
+    Parameters
+    -------
+    series: pandas.Series
+        Profiles to write.
+    dirname: str, path
+        Directory name. Created if it does not exist.
+    """
+    arrays, meta = _network_to_arrays(series.to_frame(name=0))
+    meta["series_name"] = series.name
+    _utils.save_arrays(dirname, arrays, meta)
+
+def read_profiles_binary(
+    dirname,
+    mmap_mode="r",
+):
+    """
+    Returns pandas.Series with prwlr.profiles.Profile objects from a
+    directory written by prwlr.core.save_profiles_binary.
+
+    Parameters
+    -------
+    dirname: str, path
+        Directory name.
+    mmap_mode: str, default <"r">
+        Passed to numpy.load. Arrays are read into memory if <None>.
+
+    Returns
+    -------
+    pandas.Series
+    """
+    arrays, meta = _utils.read_arrays(dirname, mmap_mode=mmap_mode)
+    return _network_from_arrays(arrays, meta).iloc[:, 0].rename(meta["series_name"])
 
 def merge_sga_profiles(
     sga,
@@ -243,8 +712,33 @@ def merge_sga_profiles(
 ):
     """
     Returns Genetic Interaction Network from the Costanzo's SGA experiment with
-    Phylogenetic Profiles.
+    Phylogenetic Profiles. Profiles columns hold pointers to the profiles of
+    the table, shared objects or prwlr.profiles.ProfileArray codes, not
+    copies.
+
+    Parameters
+    -------
+    sga: pandas.DataFrame
+        Genetic Interaction Network, as returned by prwlr.core.read_sga.
+    profiles: pandas.DataFrame or prwlr.profiles.ProfileMatrix
+        Phylogenetic Profiles, as returned by prwlr.core.profilize_organism.
+        ProfileMatrix rows are matched with ORFs by its index.
+
+    Returns
+    -------
+    pandas.DataFrame
     """
+    if isinstance(profiles, _profiles.ProfileMatrix):
+        profiles = _pd.DataFrame({
+            _databases.Columns.ORF_ID: profiles.index,
+            _databases.Columns.PROF: _profiles.ProfileArray.from_profile_matrix(profiles),
+        })
+    if _databases.Columns.PROF in profiles.columns and profiles[_databases.Columns.PROF].dtype == object:
+        profiles = profiles.assign(**{
+            _databases.Columns.PROF: _profiles.hash_cons(profiles[_databases.Columns.PROF]),
+        })
+    if profiles[_databases.Columns.ORF_ID].is_unique:
+        return _merge_sga_profiles_table(sga, profiles)
     merged = _pd.merge(
         left=sga,
         right=profiles,
@@ -274,39 +768,446 @@ def merge_sga_profiles(
         drop=True,
         inplace=True,
     )
-    return merged
+    return _databases.drop_unused_categories(merged)
+
+def _merge_sga_profiles_table(
+    sga,
+    profiles,
+):
+    """
+    Returns Genetic Interaction Network with Phylogenetic Profiles of ORFs
+    looked up by position in the profiles table with unique ORFs. The
+    columns of the table are taken by the positions found.
+    """
+    orfs = profiles[_databases.Columns.ORF_ID]
+    qry_pos = _utils.index_positions(orfs, sga[_databases.Columns.ORF_Q])
+    arr_pos = _utils.index_positions(orfs, sga[_databases.Columns.ORF_A])
+    found = (qry_pos != -1) & (arr_pos != -1)
+    merged = sga[found].reset_index(drop=True)
+    qry_pos = qry_pos[found]
+    arr_pos = arr_pos[found]
+    columns = [i for i in profiles.columns if i != _databases.Columns.ORF_ID]
+    for suffix, positions in (
+        (_databases.Columns.QUERY_SUF, qry_pos),
+        (_databases.Columns.ARRAY_SUF, arr_pos),
+    ):
+        for column in columns:
+            merged["{}{}".format(column, suffix)] = profiles[column].array.take(positions)
+    merged.dropna(inplace=True)
+    merged.reset_index(
+        drop=True,
+        inplace=True,
+    )
+    return _databases.drop_unused_categories(merged)
+
+def _pack_profiles(
+    series,
+):
+    """
+    Returns packed bits of distinct prwlr.profiles.Profile objects from
+    pandas.Series and codes pointing each row to its packed profile. Each
+    distinct object is packed only once, which is cheap for networks where
+    one object is shared by all the interactions of an ORF.
+    """
+    values = series.values
+    _, first, codes = _np.unique(
+        _np.fromiter((id(i) for i in values), dtype=_np.int64, count=len(values)),
+        return_index=True,
+        return_inverse=True,
+    )
+    unique_profiles = [values[i].profile for i in first]
+    lengths = set(len(i) for i in unique_profiles)
+    if len(lengths) > 1:
+        raise _errors.ProfileError("Different profiles' lengths")
+    length = lengths.pop() if lengths else 0
+    bits = _np.packbits(
+        _np.array(unique_profiles, dtype=bool).reshape(len(unique_profiles), length),
+        axis=1,
+    )
+    return bits, codes, length
 
 def calculate_pss(
     network,
     method,
+    chunksize=2 ** 20,
+    cache=None,
+    ignore=None,
 ):
     """
     Returns Genetic Interaction Network from the Costanzo's SGA experiment with
-    Profiles Similarity Score.
+    Profiles Similarity Score. Identical profiles are hash-consed and each
+    distinct pair of profiles is scored once, from the 2x2 contingency counts
+    of the packed profiles, see prwlr.profiles.PairCache.
 
     Parameters
     -------
     network: pandas.DataFrame
     method: str
+        One of prwlr.profiles.PSS_METHODS.
+    chunksize: int
+        Number of distinct pairs of profiles scored at once. Limits the
+        temporary memory.
+    cache: prwlr.profiles.PairCache, default <None>
+        Cache of the scored pairs to reuse across calls. New one is used for
+        this call only if <None>.
+    ignore: list of str, default <None>
+        Species left out of the comparison, as in
+        prwlr.profiles.Profile.calculate_pss. Profiles are not modified.
 
     Returns
     -------
     pandas.DataFrame
     """
-    if method == 'pairwise':
-        def pss(ar1, ar2):
-            return sum(a == b for a, b in zip(ar1, ar2))
-        pss_vect = _np.vectorize(pss)
-        network[_databases.Columns.PSS] = pss_vect(
-            network[_databases.Columns.PROF_Q].apply(lambda x: x.profile),
-            network[_databases.Columns.PROF_A].apply(lambda x: x.profile),
-            )
+    if cache is None:
+        cache = _profiles.PairCache()
+    network[_databases.Columns.PSS] = cache.score(
+        network[_databases.Columns.PROF_Q],
+        network[_databases.Columns.PROF_A],
+        method=method,
+        ignore=ignore,
+        chunksize=chunksize,
+    )
+    return network
+
+def _profiles_lookup(
+    profiles,
+):
+    """
+    Returns index of ORFs, row of the packed profiles table for each of the
+    ORFs, the table and the profiles' length, from
+    prwlr.profiles.ProfileMatrix or pandas.DataFrame of profiles.
+    """
+    if isinstance(profiles, _profiles.ProfileMatrix):
+        profiles = _pd.DataFrame({
+            _databases.Columns.ORF_ID: profiles.index,
+            _databases.Columns.PROF: _profiles.ProfileArray.from_profile_matrix(profiles),
+        })
+    orfs = _pd.Index(_np.asarray(profiles[_databases.Columns.ORF_ID], dtype=object))
+    if not orfs.is_unique:
+        raise _errors.ProfileError("ORFs of the profiles must be unique.")
+    if len(orfs) == 0:
+        raise _errors.ProfileError("No profiles to score with.")
+    cache = _profiles.PairCache()
+    used, ids = _np.unique(cache.intern(profiles[_databases.Columns.PROF]), return_inverse=True)
+    return orfs, ids, cache.bits(used), len(cache.query(used))
+
+# Profiles lookup of prwlr.core.score_sga in the worker processes, set once
+# per worker by prwlr.core._init_score_sga instead of sent with each chunk.
+_SCORE_SGA_LOOKUP = None
+
+def _init_score_sga(
+    lookup,
+):
+    """
+    Sets the profiles lookup used by prwlr.core._score_sga_chunk in the
+    worker process.
+    """
+    global _SCORE_SGA_LOOKUP
+    _SCORE_SGA_LOOKUP = lookup
+
+def _score_sga_chunk(
+    chunk,
+    method,
+    lookup=None,
+):
+    """
+    Returns chunk of SGA with Profiles Similarity Score, without the
+    interactions of ORFs missing from the profiles. The lookup set by
+    prwlr.core._init_score_sga is used if lookup is <None>.
+    """
+    orfs, ids, bits, length = _SCORE_SGA_LOOKUP if lookup is None else lookup
+    qry_pos = _utils.index_positions(orfs, chunk[_databases.Columns.ORF_Q])
+    arr_pos = _utils.index_positions(orfs, chunk[_databases.Columns.ORF_A])
+    found = (qry_pos != -1) & (arr_pos != -1) & chunk.notna().all(axis=1).values
+    size = len(bits)
+    keys, inverse = _np.unique(
+        ids[qry_pos[found]] * size + ids[arr_pos[found]],
+        return_inverse=True,
+    )
+    pss = _profiles.pss_from_contingency(
+        *_profiles.contingency(bits[keys // size], bits[keys % size], length),
+        method=method
+    )
+    return chunk[found].assign(**{_databases.Columns.PSS: pss[inverse]})
+
+def score_sga(
+    filename,
+    profiles,
+    out,
+    method,
+    version=2,
+    chunksize=2 ** 16,
+    workers=1,
+    **kwargs
+):
+    """
+    Writes Genetic Interaction Network from the Costanzo's SGA experiment
+    with Profiles Similarity Score to CSV file, without keeping the whole
+    network in memory. The SGA is read in chunks, the ORFs of each chunk
+    are looked up in the profiles, the distinct pairs of profiles are scored
+    from the packed profiles and the chunk is appended to the output file.
+    Equivalent to prwlr.core.read_sga, prwlr.core.merge_sga_profiles and
+    prwlr.core.calculate_pss, without the profiles columns. The duplicates
+    of SGA v1 are dropped across the chunks as well, by the rows hashes. The
+    header is written even if no interactions are.
+
+    Parameters
+    -------
+    filename: str, path
+        Filename of the SGA.
+    profiles: pandas.DataFrame or prwlr.profiles.ProfileMatrix
+        Phylogenetic Profiles with unique ORFs, as returned by
+        prwlr.core.profilize_organism.
+    out: str, path
+        Output CSV file name.
+    method: str
+        One of prwlr.profiles.PSS_METHODS.
+    version: int
+        Version number of the Costanzo's SGA experiment. 1 or 2 available.
+    chunksize: int
+        Number of rows of the SGA processed at once.
+    workers: int
+        Number of processes to spawn. At most workers chunks are held in
+        memory at once. Chunks are scored in the calling process if <1>.
+    **kwargs
+        Filters passed to prwlr.core.read_sga, applied while reading.
+
+    Returns
+    -------
+    int
+        Number of written interactions.
+    """
+    if method not in _profiles.PSS_METHODS:
+        raise _errors.ProfileError("Unknown method: {}".format(method))
+    lookup = _profiles_lookup(profiles)
+    chunks = read_sga(filename, version=version, chunksize=chunksize, **kwargs)
+    pool = None
+    if workers > 1:
+        # The lookup is sent once per worker, the tasks carry the chunks only.
+        # Each call gets its own pool, pathos would reuse a cached pool with
+        # the lookup of another call or compare the lookups to decide.
+        pool = _ptmp.ProcessingPool(
+            nodes=workers,
+            id=object(),
+            initializer=_init_score_sga,
+            initargs=(lookup,),
+        )
+        batches = iter(lambda: list(_islice(chunks, workers)), [])
+        results = (
+            i for batch in batches
+            for i in pool.map(_score_sga_chunk, batch, [method] * len(batch))
+        )
     else:
-        network[_databases.Columns.PSS] = network.apply(
-            lambda x: x[_databases.Columns.PROF_Q].calculate_pss(
-                x[_databases.Columns.PROF_A],
-                method=method,
-                ),
-            axis=1,
+        results = (_score_sga_chunk(i, method, lookup) for i in chunks)
+    written = 0
+    number = -1
+    try:
+        for number, result in enumerate(results):
+            result.to_csv(
+                out,
+                mode='w' if number == 0 else 'a',
+                header=number == 0,
+                index=False,
+            )
+            written += len(result)
+    finally:
+        if pool is not None:
+            pool.clear()
+    if number == -1:
+        # No chunks read, so the columns come from the empty SGA.
+        _score_sga_chunk(
+            read_sga(filename, version=version, **kwargs).iloc[:0], method, lookup,
+        ).to_csv(out, index=False)
+    return written
+
+def leave_one_out_pss(
+    network,
+    method,
+    species=None,
+    chunksize=None,
+    memory=2 ** 28,
+):
+    """
+    Returns Profiles Similarity Score of each interaction of the Genetic
+    Interaction Network with each of the species left out, one at a time.
+    Equivalent to prwlr.core.calculate_pss with ignore=[species] for every
+    species but calculated in a single pass: the contingency counts of each
+    distinct pair of profiles are calculated once and the contribution of
+    the left out species is subtracted.
+
+    Parameters
+    -------
+    network: pandas.DataFrame
+        Network with the profiles sharing the same query.
+    method: str
+        One of prwlr.profiles.PSS_METHODS.
+    species: list of str, default <None>
+        Species to leave out. All the species of the profiles if <None>.
+    chunksize: int, default <None>
+        Number of distinct pairs of profiles processed at once. Derived from
+        memory and the numbers of species if <None>.
+    memory: int, default <2 ** 28>
+        Approximate number of bytes of the temporary arrays of a chunk of the
+        pairs, used if chunksize is <None>.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed like the network, one column per left out species.
+    """
+    if method not in _profiles.PSS_METHODS:
+        raise _errors.ProfileError("Unknown method: {}".format(method))
+    cache = _profiles.PairCache()
+    ids_q, ids_a, inverse = cache.distinct_pairs(
+        network[_databases.Columns.PROF_Q],
+        network[_databases.Columns.PROF_A],
+    )
+    if len(inverse) == 0:
+        return _pd.DataFrame(index=network.index, columns=species)
+    used = _np.unique(_np.concatenate((ids_q, ids_a)))
+    query = cache.query(used)
+    species = list(query) if species is None else list(species)
+    positions = {k: v for v, k in enumerate(query)}
+    try:
+        positions = [positions[i] for i in species]
+    except KeyError:
+        raise _errors.ProfileError("Element to ignore not in profile")
+    bits = cache.bits(used)
+    ids_q = _np.searchsorted(used, ids_q)
+    ids_a = _np.searchsorted(used, ids_a)
+    if chunksize is None:
+        # Each pair takes two unpacked profiles and about twelve 8-byte
+        # temporaries per left out species.
+        chunksize = max(1, memory // (2 * len(query) + 96 * len(species)))
+    pss = _np.empty(
+        (len(ids_q), len(species)),
+        dtype=_np.int64 if method == 'pairwise' else _np.float64,
+    )
+    for start in range(0, len(ids_q), chunksize):
+        pss[start:start + chunksize] = _profiles.pss_from_contingency(
+            *_profiles.leave_one_out_contingency(
+                bits[ids_q[start:start + chunksize]],
+                bits[ids_a[start:start + chunksize]],
+                len(query),
+                positions,
+            ),
+            method=method
         )
-    return network
+    return _pd.DataFrame(pss[inverse], index=network.index, columns=species)
+
+def _profiles_bits(
+    profiles,
+):
+    """
+    Returns packed bits, one row per profile, and the profiles' length from
+    either prwlr.profiles.ProfileMatrix or pandas.Series of
+    prwlr.profiles.Profile objects.
+    """
+    if isinstance(profiles, _profiles.ProfileMatrix):
+        return profiles.bits, len(profiles.query)
+    bits, codes, length = _pack_profiles(profiles)
+    return bits[codes], length
+
+def _pss_tile(
+    tile,
+):
+    """
+    Returns PSS of all the pairs between two blocks of packed profiles.
+    """
+    bits_i, bits_j, length, method = tile
+    return _profiles.pss_from_contingency(
+        *_profiles.contingency(
+            bits_i[:, None, :],
+            bits_j[None, :, :],
+            length,
+        ),
+        method=method
+    )
+
+def all_vs_all_pss(
+    profiles,
+    method='pairwise',
+    block_size=512,
+    workers=1,
+    out=None,
+    condensed=False,
+):
+    """
+    Returns Profiles Similarity Score of all the pairs of profiles. The
+    computation is split into tiles of block_size x block_size pairs, which
+    are calculated in a process pool one row of tiles at a time and written
+    as they come, so the whole matrix never has to be kept in memory when
+    out is a file.
+
+    Parameters
+    -------
+    profiles: pandas.Series or prwlr.profiles.ProfileMatrix
+        Profiles to compare. The order of the rows and columns of the result
+        follows the order of the profiles.
+    method: str
+        One of prwlr.profiles.PSS_METHODS.
+    block_size: int
+        Number of profiles in one tile side.
+    workers: int
+        Number of processes to spawn. Tiles are calculated in the calling
+        process if <1>.
+    out: str, path, numpy.ndarray or numpy.memmap, default <None>
+        Where to write the result. Filename is opened as numpy.memmap in
+        the .npy format. Array must be of the shape of the result. New array
+        is allocated in memory if <None>.
+    condensed: bool
+        Write only the upper triangle without the diagonal, in the order of
+        scipy.spatial.distance.squareform, if <True>.
+
+    Returns
+    -------
+    numpy.ndarray or numpy.memmap
+        Square matrix of shape (n, n) or condensed vector of length
+        n * (n - 1) / 2.
+    """
+    if method not in _profiles.PSS_METHODS:
+        raise _errors.ProfileError("Unknown method: {}".format(method))
+    bits, length = _profiles_bits(profiles)
+    n = len(bits)
+    shape = (n * (n - 1) // 2,) if condensed else (n, n)
+    dtype = _np.int64 if method == 'pairwise' else _np.float64
+    if out is None:
+        out = _np.empty(shape, dtype=dtype)
+    elif not isinstance(out, _np.ndarray):
+        out = _np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=shape)
+    elif out.shape != shape:
+        raise ValueError("out must be of shape {}".format(shape))
+    starts = range(0, n, block_size)
+    pool = None
+    if workers > 1:
+        pool = _ptmp.ProcessingPool(nodes=workers)
+    try:
+        # One row of tiles is submitted at a time, so only the blocks of
+        # that row are held in the tasks queue.
+        for row_number, i in enumerate(starts):
+            tiles = [
+                (bits[i:i + block_size], bits[j:j + block_size], length, method)
+                for j in starts[row_number:]
+            ]
+            if pool is None:
+                results = (_pss_tile(k) for k in tiles)
+            else:
+                results = pool.imap(_pss_tile, tiles)
+            for j, tile in zip(starts[row_number:], results):
+                if condensed:
+                    for row in range(i, min(i + block_size, n)):
+                        col_start = max(j, row + 1)
+                        col_stop = min(j + block_size, n)
+                        if col_start >= col_stop:
+                            continue
+                        offset = n * row - row * (row + 1) // 2 - row - 1
+                        out[offset + col_start:offset + col_stop] = tile[row - i, col_start - j:]
+                else:
+                    out[i:i + tile.shape[0], j:j + tile.shape[1]] = tile
+                    out[j:j + tile.shape[1], i:i + tile.shape[0]] = tile.T
+    finally:
+        if pool is not None:
+            pool.clear()
+    if isinstance(out, _np.memmap):
+        out.flush()
+    return out
@@ -2,18 +2,68 @@
 
 
 from __future__ import print_function
+import os
 import re
+import shutil
 import pathos.multiprocessing as ptmp
 import numpy as np
 import pandas as pd
 import tempfile
+import warnings
 from prwlr.apis import KEGG_API as _KEGG_API
 from prwlr.apis import Columns as _ApisColumns
+from prwlr.apis import _running_loop
 from prwlr.errors import *
-from prwlr.profiles import Profile as _Profile
+from prwlr.profiles import ProfileArray as _ProfileArray
+from prwlr.profiles import ProfileMatrix as _ProfileMatrix
 from prwlr.utils import *
 
 
+def cast_dtypes(dataframe,
+                dtypes):
+    """
+    Return pandas.DataFrame with the columns present in dtypes cast to the
+    dtypes, without copying the columns already of their dtype.
+
+    Parameters
+    -------
+    dataframe: pandas.DataFrame
+        Data to cast.
+    dtypes: dict
+        Dtype of each of the columns, as in prwlr.databases.Columns.dtypes.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    return dataframe.astype({k: v for k, v in dtypes.items()
+                             if k in dataframe.columns},
+                            copy=False)
+
+
+def drop_unused_categories(dataframe):
+    """
+    Return pandas.DataFrame with the categories not used by any of the rows
+    removed from the categorical columns, so a frame with the rows filtered
+    lists its own identifiers only.
+
+    Parameters
+    -------
+    dataframe: pandas.DataFrame
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    unused = {k: dataframe[k].cat.remove_unused_categories()
+              for k in dataframe.columns
+              if isinstance(dataframe[k].dtype, pd.CategoricalDtype) and
+              len(dataframe[k].cat.categories) > dataframe[k].nunique()}
+    if not unused:
+        return dataframe
+    return dataframe.assign(**unused)
+
+
 class Columns(_ApisColumns):
     """
     Container for the columns names defined in this module.
@@ -44,6 +94,10 @@ class Columns(_ApisColumns):
     GENE_Q = "GENE_Q".format(QUERY_SUF)
     STR_ID_A = "STR_ID{}".format(ARRAY_SUF)
     TEMP = "TEMP"
+    # File of the interaction when reading multiple SGA files.
+    SOURCE = "SOURCE"
+    # Suffix of the parsed SGA cache directory.
+    SGA_CACHE_SUF = ".prwlr_cache"
     # Bioprocesses and permutation internal dataframe column names.
     ORF = "ORF"
     GENE = "GENE"
@@ -72,6 +126,24 @@ class Columns(_ApisColumns):
               DMF: "float32",
               DMF_SD: "float32",
               PSS: "uint8"}
+    # Identifiers columns, categorical with the frame's own identifiers, so
+    # joins look up the categories once and take the rows by the codes, see
+    # prwlr.utils.index_positions.
+    gene_ids = [ORF_Q,
+                ORF_A,
+                GENE_Q,
+                GENE_A,
+                STR_ID_Q,
+                STR_ID_A,
+                ORF,
+                GENE,
+                _ApisColumns.ORF_ID,
+                _ApisColumns.KEGG_ID,
+                ORF_ID_Q,
+                ORF_ID_A,
+                KEGG_ID_Q,
+                KEGG_ID_A]
+    dtypes.update(dict.fromkeys(gene_ids, "category"))
 
 
 class KEGG(Columns):
@@ -175,11 +247,89 @@ class KEGG(Columns):
                             drop_ORF_duplicates=True,
                             drop_KO_duplicates=True,
                             threads=6,
-                            raise_exceptions=True):
-        KOs_different = """{} of X_reference and KO_organisms are different.""".format(self.KEGG_ID)
-        KOs_different_mltpl_threads_msg = """{} of X_reference and KO_organisms are different. This
-        might be caused by the server access denial. Try
-        deacreasing number of threads""".format(self.KEGG_ID)
+                            raise_exceptions=True,
+                            resume=False):
+        self._parse_organism_ids(reference_species, IDs)
+        if IDs_only:
+            return
+        self._parse_X_reference(organism, restrict_to, X_ref, drop_ORF_duplicates, drop_KO_duplicates)
+        print("Getting the Organisms List for Each of The Orthology Group...")
+        if KOs and resume:
+            self._api.get_KOs_db_X_ref(filename=KOs,
+                                       skip_dwnld=False,
+                                       squeeze=True,
+                                       threads=threads,
+                                       resume=True)
+        elif KOs:
+            self._api.get_KOs_db_X_ref(filename=KOs,
+                                       skip_dwnld=True)
+        else:
+            KOs_temp = tempfile.NamedTemporaryFile(delete=True)
+            self._api.get_KOs_db_X_ref(filename=KOs_temp.name,
+                                       skip_dwnld=False,
+                                       squeeze=True,
+                                       threads=threads)
+            KOs_temp.close()
+        self._parse_organism_profiles(threads > 1, raise_exceptions)
+
+    async def aparse_organism_info(self,
+                                   organism,
+                                   reference_species,
+                                   restrict_to=None,
+                                   IDs=None,
+                                   X_ref=None,
+                                   KOs=None,
+                                   strip_prefix=True,
+                                   IDs_only=False,
+                                   drop_ORF_duplicates=True,
+                                   drop_KO_duplicates=True,
+                                   concurrency=6,
+                                   raise_exceptions=True,
+                                   resume=False):
+        """
+        Awaitable KEGG.parse_organism_info. The Orthology Groups are
+        downloaded with KEGG_API.aget_KOs_db_X_ref, in threads of its own,
+        and the parsing runs in the default executor of the event loop.
+
+        Parameters
+        -------
+        concurrency: int, default <6>
+            Number of requests to KEGG at once. Replaces threads.
+        resume: bool, default <False>
+            Download to KOs, skipping the KEGG Orthology Groups recorded in
+            its manifest.
+        """
+        loop = _running_loop()
+        await loop.run_in_executor(None, self._parse_organism_ids, reference_species, IDs)
+        if IDs_only:
+            return
+        await loop.run_in_executor(None, self._parse_X_reference, organism, restrict_to, X_ref,
+                                   drop_ORF_duplicates, drop_KO_duplicates)
+        print("Getting the Organisms List for Each of The Orthology Group...")
+        if KOs and resume:
+            await self._api.aget_KOs_db_X_ref(filename=KOs,
+                                              skip_dwnld=False,
+                                              squeeze=True,
+                                              concurrency=concurrency,
+                                              resume=True)
+        elif KOs:
+            await self._api.aget_KOs_db_X_ref(filename=KOs,
+                                              skip_dwnld=True)
+        else:
+            KOs_temp = tempfile.NamedTemporaryFile(delete=True)
+            await self._api.aget_KOs_db_X_ref(filename=KOs_temp.name,
+                                              skip_dwnld=False,
+                                              squeeze=True,
+                                              concurrency=concurrency)
+            KOs_temp.close()
+        await loop.run_in_executor(None, self._parse_organism_profiles, concurrency > 1, raise_exceptions)
+
+    def _parse_organism_ids(self,
+                            reference_species,
+                            IDs):
+        """
+        Sets KEGG.reference_species, KEGG.name_ID and KEGG.ID_name.
+        """
         print("Getting the organisms' KEGG IDs...")
         if IDs:
             self._api.get_organisms_ids(IDs, skip_dwnld=True)
@@ -187,16 +337,24 @@ class KEGG(Columns):
             IDs_tmp = tempfile.NamedTemporaryFile(delete=True)
             self._api.get_organisms_ids(IDs_tmp.name, skip_dwnld=False)
             IDs_tmp.close()
-        self.reference_species = [self._api.org_name_2_kegg_id(i) for i in reference_species
-                                  if i not in self._api.query_ids_not_found]
+        self.reference_species = self._api.org_names_2_kegg_ids([i for i in reference_species
+                                                                 if i not in self._api.query_ids_not_found])
         self.reference_species = [i.upper() for i in self.reference_species if i is not None]
         self.name_ID = dict(list(zip([i for i in reference_species
                                  if i not in self._api.query_ids_not_found],
                                 self.reference_species)))
         self.ID_name = dict(list(zip(self.reference_species, [i for i in reference_species
                                                          if i not in self._api.query_ids_not_found])))
-        if IDs_only:
-            return
+
+    def _parse_X_reference(self,
+                           organism,
+                           restrict_to,
+                           X_ref,
+                           drop_ORF_duplicates,
+                           drop_KO_duplicates):
+        """
+        Sets KEGG.X_reference.
+        """
         print("Getting the ORF-Orthology Group Cross Reference...")
         if X_ref:
             self._api.get_org_db_X_ref(organism=organism,
@@ -221,17 +379,20 @@ class KEGG(Columns):
                 self._api.org_db_X_ref_df[self._api.ORF_ID].isin(restrict_to)
             ]
         self.X_reference = self._api.org_db_X_ref_df
-        print("Getting the Organisms List for Each of The Orthology Group...")
-        if KOs:
-            self._api.get_KOs_db_X_ref(filename=KOs,
-                                       skip_dwnld=True)
-        else:
-            KOs_temp = tempfile.NamedTemporaryFile(delete=True)
-            self._api.get_KOs_db_X_ref(filename=KOs_temp.name,
-                                       skip_dwnld=False,
-                                       squeeze=True,
-                                       threads=threads)
-            KOs_temp.close()
+
+    def _parse_organism_profiles(self,
+                                 concurrent,
+                                 raise_exceptions):
+        """
+        Sets KEGG.KO_organisms, KEGG.organism_info and KEGG.profile_matrix.
+        The profiles are kept packed, so the reference of each of them is the
+        reference species the Orthology Group is found in. Organisms outside
+        of the reference species are in KEGG.KO_organisms.
+        """
+        KOs_different = """{} of X_reference and KO_organisms are different.""".format(self.KEGG_ID)
+        KOs_different_mltpl_threads_msg = """{} of X_reference and KO_organisms are different. This
+        might be caused by the server access denial. Try
+        deacreasing number of threads""".format(self.KEGG_ID)
         try:
             pd.testing.assert_series_equal(
                 self.X_reference[self.KEGG_ID].
@@ -245,7 +406,7 @@ class KEGG(Columns):
             )
             self.KO_organisms = self._api.KOs_db_X_ref_df
         except AssertionError:
-            if threads > 1:
+            if concurrent:
                 if raise_exceptions:
                     raise ParserError(KOs_different_mltpl_threads_msg)
                 else:
@@ -260,19 +421,192 @@ class KEGG(Columns):
             right=self.KO_organisms,
             on=self.KEGG_ID,
         )
-        self.organism_info[self.PROF] = self.organism_info[self.ORG_GENE_ID].apply(
-            lambda x: _Profile(
-                x,
-                [i.lower() for i in self.name_ID.values()],
-            )
+        self.profile_matrix = _ProfileMatrix.from_references(
+            self.organism_info[self.ORG_GENE_ID],
+            [i.lower() for i in self.name_ID.values()],
+            index=self.organism_info[self.ORF_ID],
         )
+        self.organism_info[self.PROF] = _ProfileArray.from_profile_matrix(self.profile_matrix)
         self.organism_info.drop(
             columns=self.ORG_GENE_ID,
             inplace=True,
         )
         self.organism_info.drop_duplicates(inplace=True)
+        self.profile_matrix = self.profile_matrix.take(
+            self.organism_info.index.values,
+        )
+        self.organism_info = cast_dtypes(self.organism_info, self.dtypes)
+
+
+def _filter_sga(sga,
+                p_value=None,
+                gis=None,
+                temp=None,
+                predicate=None):
+    """
+    Return rows of SGA passing the filters. Filters set to <None> are not
+    applied.
+
+    Parameters
+    -------
+    sga: pandas.DataFrame
+        SGA with the columns named as in prwlr.databases.Columns.
+    p_value: float
+        Maximal GIS_P.
+    gis: float
+        Minimal absolute GIS.
+    temp: str, list of str
+        TEMP, arraytype/temperature, or list of TEMPs to keep.
+    predicate: callable
+        Called with the SGA, returns boolean mask of the rows to keep.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    mask = np.ones(len(sga), dtype=bool)
+    if p_value is not None:
+        mask &= (sga[Columns.GIS_P] <= p_value).values
+    if gis is not None:
+        mask &= (sga[Columns.GIS].abs() >= gis).values
+    if temp is not None:
+        mask &= sga[Columns.TEMP].isin([temp] if isinstance(temp, str) else temp).values
+    if predicate is not None:
+        mask &= np.asarray(predicate(sga), dtype=bool)
+    if mask.all():
+        return sga
+    return sga[mask]
+
+
+def _filters_columns(p_value=None,
+                     gis=None,
+                     temp=None,
+                     predicate=None):
+    """
+    Return columns needed by the filters of prwlr.databases._filter_sga.
+    """
+    return [column for column, value in ((Columns.GIS_P, p_value),
+                                         (Columns.GIS, gis),
+                                         (Columns.TEMP, temp))
+            if value is not None]
 
 
+def _drop_seen_rows(chunks):
+    """
+    Yields chunks of SGA without the rows found before, the same as
+    drop_duplicates of the concatenated chunks. Rows are compared by their
+    64-bit hashes, 8 bytes per distinct row, kept in sorted runs merged like
+    a binary counter, so each hash is merged O(log n) times. Distinct rows
+    with the same hash are taken for duplicates and dropped, for n rows it
+    happens with the probability about n ** 2 / 2 ** 65.
+    """
+    runs = []
+    for chunk in chunks:
+        hashes = pd.util.hash_pandas_object(chunk, index=False).values
+        keep = np.zeros(len(hashes), dtype=bool)
+        keep[np.unique(hashes, return_index=True)[1]] = True
+        for run in runs:
+            positions = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            keep &= run[positions] != hashes
+        new = np.sort(hashes[keep])
+        while runs and len(runs[-1]) <= len(new):
+            new = np.union1d(runs.pop(), new)
+        if len(new):
+            runs.append(new)
+        yield chunk[keep]
+
+
+def _concat_chunks(chunks):
+    """
+    Return one pandas.DataFrame of parsed chunks. Columns categorical in all
+    the chunks are recoded once to the sorted union of their categories, so
+    they stay categorical instead of falling back to object, and the
+    categories left unused by the filters are removed.
+    """
+    chunks = list(chunks)
+    if len(chunks) == 1:
+        return drop_unused_categories(chunks[0])
+    for column in chunks[0].columns:
+        if not all(isinstance(i[column].dtype, pd.CategoricalDtype) for i in chunks):
+            continue
+        categories = chunks[0][column].cat.categories
+        for i in chunks[1:]:
+            categories = categories.union(i[column].cat.categories)
+        dtype = pd.CategoricalDtype(categories)
+        chunks = [i.astype({column: dtype}, copy=False) for i in chunks]
+    return drop_unused_categories(pd.concat(chunks, ignore_index=True, copy=False))
+
+
+def _select_sga(sga,
+                usecols=None,
+                **filters):
+    """
+    Return rows of parsed SGA passing the filters of
+    prwlr.databases._filter_sga, with the usecols columns only.
+    """
+    sga = drop_unused_categories(_filter_sga(sga, **filters))
+    if usecols is None:
+        return sga
+    unknown = [i for i in usecols if i not in sga.columns]
+    if unknown:
+        raise ParserError("Unknown columns: {}".format(unknown))
+    return sga[[i for i in sga.columns if i in usecols]]
+
+
+def _cached_sga(parser,
+                filename,
+                parse,
+                **options):
+    """
+    Return parsed SGA from the columnar cache next to the file, see
+    prwlr.utils.save_arrays, with the columns of str memory-mapped as
+    categorical codes and the numeric ones as they are. The file is parsed
+    with the parse callable and the cache is written if it is missing or
+    does not match the file, the parser version or the options. The cache is
+    written to a temporary directory next to it and renamed into place.
+    Nothing is pickled, SGA with columns of mixed types is returned uncached,
+    as well as SGA which cache cannot be written or which columns names are
+    not JSON serializable, with a warning.
+    """
+    dirname = "{}{}".format(filename, Columns.SGA_CACHE_SUF)
+    key = {
+        "file": file_fingerprint(filename),
+        "parser": type(parser).__name__,
+        "parser_version": parser.parser_version,
+        "options": options,
+    }
+    if os.path.isdir(dirname):
+        try:
+            arrays, meta = read_arrays(dirname)
+            if meta.get("key") == key:
+                return cast_dtypes(frame_from_arrays(arrays, meta), Columns.dtypes)
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+    sga = parse()
+    sga = sga.astype({k: "category" for k in sga.columns if sga[k].dtype == object})
+    arrays, meta = frame_to_arrays(sga)
+    meta["key"] = key
+    parent = os.path.dirname(os.path.abspath(dirname))
+    prefix = ".{}.".format(os.path.basename(dirname))
+    temp = None
+    try:
+        # Written aside and renamed into place, so readers never see a
+        # partial cache.
+        temp = tempfile.mkdtemp(dir=parent, prefix=prefix)
+        save_arrays(temp, arrays, meta)
+        if os.path.isdir(dirname):
+            old = tempfile.mkdtemp(dir=parent, prefix=prefix)
+            os.rename(dirname, old)
+            shutil.rmtree(old, ignore_errors=True)
+        os.rename(temp, dirname)
+    except (IOError, OSError, TypeError, ValueError) as error:
+        warnings.warn("SGA cache {} not written: {}".format(dirname, error))
+        return cast_dtypes(sga, Columns.dtypes)
+    finally:
+        if temp is not None:
+            shutil.rmtree(temp, ignore_errors=True)
+    return cast_dtypes(frame_from_arrays(*read_arrays(dirname)), Columns.dtypes)
+
 
 class SGA1(Columns):
     """
@@ -282,6 +616,8 @@ class SGA1(Columns):
     -------
 
     """
+    parser_version = 1
+
     def __init__(self):
         self.names = (('Query_ORF', self.ORF_Q),
                       ('Query_gene_name', self.GENE_Q),
@@ -301,38 +637,163 @@ class SGA1(Columns):
               filename,
               remove_white_spaces=True,
               in_sep="\t",
-              cleanup=True):
-        """Return Ortho_Interactions.interact_df (pandas.DataFrame) from
-        parsed <csv> file. The minimal filtration is based of a given GIS_P
-        and presence of DMF value. Further filtration results in DMF
-        higher/lower than both SMFs.
+              cleanup=True,
+              usecols=None,
+              chunksize=2 ** 16,
+              cache=False,
+              **filters):
+        """
+        Parse SGA v1 <csv> file into SGA1.sga (pandas.DataFrame). Filters
+        are applied to each chunk while reading, so the rows and columns
+        left out are never held all at once.
 
-        Args:
-            sga (str): name of file to parse
-            sga_ver (int) = costanzo dataframe version
-            excel (bool): pandas.read_excel when <True>. pandas.read_csv when
-            <False> (default).
-            p_value (float): maximum GIS_P for filtering
-            DMF_type (str): positive -> DMF > both SMFs
-                            negative -> DMF < both SMFs
-                            neutral  -> DMF not <None> (default)
-                            raw      -> no filter
-            remove_white_spaces (bool): replaces whitespaces from col names
-            with <_> when True (default)
-            in_sep (str): separator for pandas.read_csv method
+        Parameters
+        -------
+        filename: str
+            Name of file to parse.
+        remove_white_spaces: bool
+            Replace whitespaces in the columns names with <_>. Default: <True>
+        in_sep: str
+            Separator for pandas.read_csv. Default: <"\t">
+        cleanup: bool
+            Drop rows with missing values and duplicated rows. All the
+            columns are compared, also the ones not in usecols. Default:
+            <True>
+        usecols: list of str, default <None>
+            Columns, named as in prwlr.databases.Columns, to keep. All the
+            columns if <None>.
+        chunksize: int
+            Number of rows read at once when filtering.
+        p_value: float
+            Keep interactions with GIS_P lower or equal.
+        gis: float
+            Keep interactions with absolute GIS greater or equal.
+        predicate: callable
+            Called with each parsed chunk, returns boolean mask of the rows
+            to keep.
+        cache: bool
+            Read the whole file once, write it to a columnar cache next to
+            the file and memory-map the cache in the following calls. The
+            columns of str become categorical. Filters and usecols are
+            applied to the cached SGA. Default: <False>
+        """
+        if filters.get("temp") is not None:
+            raise ValueError("SGA v1 has no {} column to filter".format(self.TEMP))
+        if cache:
+            self.sga = _select_sga(_cached_sga(self,
+                                               filename,
+                                               lambda: self._parse(filename,
+                                                                   None,
+                                                                   remove_white_spaces,
+                                                                   in_sep,
+                                                                   cleanup,
+                                                                   None),
+                                               remove_white_spaces=remove_white_spaces,
+                                               in_sep=in_sep,
+                                               cleanup=cleanup),
+                                   usecols=usecols,
+                                   **filters)
+            return
+        if all(v is None for v in filters.values()):
+            chunksize = None
+        self.sga = self._parse(filename,
+                               chunksize,
+                               remove_white_spaces,
+                               in_sep,
+                               cleanup,
+                               usecols,
+                               **filters)
+
+    def _parse(self,
+               filename,
+               chunksize,
+               remove_white_spaces,
+               in_sep,
+               cleanup,
+               usecols,
+               **filters):
+        """
+        Return parsed SGA v1 file read in chunks of chunksize rows.
+        """
+        return _concat_chunks(self.parse_chunks(filename,
+                                                chunksize=chunksize,
+                                                remove_white_spaces=remove_white_spaces,
+                                                in_sep=in_sep,
+                                                cleanup=cleanup,
+                                                usecols=usecols,
+                                                **filters))
+
+    def parse_chunks(self,
+                     filename,
+                     chunksize,
+                     remove_white_spaces=True,
+                     in_sep="\t",
+                     cleanup=True,
+                     usecols=None,
+                     **filters):
+        """
+        Yields pandas.DataFrame of chunksize rows of the parsed <csv> file,
+        processed as in SGA1.parse, without reading the whole file. The
+        cleanup drops the rows seen in the previous chunks as well. It
+        compares all the columns, so they are all read and the ones not in
+        usecols are dropped afterwards, which keeps the rows the same
+        whatever usecols is.
+
+        Parameters
+        -------
+        filename: str
+            Name of file to parse.
+        chunksize: int
+            Number of rows read at once. Whole file at once if <None>.
+        """
+        if filters.get("temp") is not None:
+            raise ValueError("SGA v1 has no {} column to filter".format(self.TEMP))
+        names = {v: k for k, v in self.names}
+        columns = None
+        if usecols is not None:
+            columns = list(usecols) + [i for i in _filters_columns(**filters)
+                                       if i not in usecols]
+            unknown = [i for i in columns if i not in names]
+            if unknown:
+                raise ParserError("Unknown columns: {}".format(unknown))
+        reader = pd.read_csv(filename,
+                             sep=in_sep,
+                             names=[k for k, v in self.names],
+                             usecols=[names[i] for i in columns] if columns is not None and not cleanup else None,
+                             error_bad_lines=False,
+                             warn_bad_lines=True,
+                             chunksize=chunksize)
+        chunks = (self._process(chunk,
+                                remove_white_spaces=remove_white_spaces,
+                                cleanup=cleanup,
+                                **filters)
+                  for chunk in ([reader] if chunksize is None else reader))
+        if cleanup:
+            chunks = _drop_seen_rows(chunks)
+        for chunk in chunks:
+            if usecols is not None:
+                chunk = chunk[[i for i in chunk.columns if i in usecols]]
+            yield chunk.reset_index(drop=True) if cleanup else chunk
+
+    def _process(self,
+                 sga,
+                 remove_white_spaces=True,
+                 cleanup=True,
+                 predicate=None,
+                 **filters):
+        """
+        Return read SGA with the columns renamed and typed and the rows
+        filtered.
         """
-        self.sga = pd.read_csv(filename,
-                               sep=in_sep,
-                               names=[k for k, v in self.names],
-                               error_bad_lines=False,
-                               warn_bad_lines=True)
         if remove_white_spaces is True:
-            self.sga.columns = [i.replace(" ", "_") for i in self.sga.columns]
-        self.sga.rename(columns=dict(self.names), inplace=True)
-        self.sga = self.sga.astype({k: v for k, v in self.dtypes.items()
-                                    if k in self.sga.columns})
+            sga.columns = [i.replace(" ", "_") for i in sga.columns]
+        sga.rename(columns=dict(self.names), inplace=True)
+        sga = _filter_sga(sga, **filters)
+        sga = cast_dtypes(sga, self.dtypes)
+        sga = _filter_sga(sga, predicate=predicate)
         if cleanup:
-            self.sga = self.sga.dropna().drop_duplicates().reset_index(drop=True)
+            sga = sga.dropna().drop_duplicates().reset_index(drop=True)
+        return sga
 
 
 class SGA2(Columns):
@@ -343,6 +804,8 @@ class SGA2(Columns):
     -------
 
     """
+    parser_version = 1
+
     def __init__(self):
         self.names = {"Query_Strain_ID": self.STR_ID_Q,
                       "Query_allele_name": self.GENE_Q,
@@ -359,34 +822,138 @@ class SGA2(Columns):
     def parse(self,
               filename,
               remove_white_spaces=True,
-              in_sep="\t"):
-        """Return Ortho_Interactions.interact_df (pandas.DataFrame) from
-        parsed <csv> file. The minimal filtration is based of a given GIS_P
-        and presence of DMF value. Further filtration results in DMF
-        higher/lower than both SMFs.
+              in_sep="\t",
+              usecols=None,
+              chunksize=2 ** 16,
+              cache=False,
+              **filters):
+        """
+        Parse SGA v2 <csv> file into SGA2.sga (pandas.DataFrame). Filters
+        are applied to each chunk while reading, so the rows and columns
+        left out are never held all at once.
 
-        Args:
-            filename (str): name of file to parse
-            p_value (float): maximum GIS_P for filtering
-            DMF_type (str): positive -> DMF > both SMFs
-                            negative -> DMF < both SMFs
-                            neutral  -> DMF not <None> (default)
-                            raw      -> no filter
-            remove_white_spaces (bool): replaces whitespaces from col names
-            with <_> when True (default)
-            in_sep (str): separator for pandas.read_csv method
+        Parameters
+        -------
+        filename: str
+            Name of file to parse.
+        remove_white_spaces: bool
+            Replace whitespaces in the columns names with <_>. Default: <True>
+        in_sep: str
+            Separator for pandas.read_csv. Default: <"\t">
+        usecols: list of str, default <None>
+            Columns, named as in prwlr.databases.Columns, to keep. All the
+            columns if <None>.
+        chunksize: int
+            Number of rows read at once when filtering.
+        p_value: float
+            Keep interactions with GIS_P lower or equal.
+        gis: float
+            Keep interactions with absolute GIS greater or equal.
+        temp: str, list of str
+            Keep interactions with TEMP, arraytype/temperature, equal or in
+            the list.
+        predicate: callable
+            Called with each parsed chunk, returns boolean mask of the rows
+            to keep.
+        cache: bool
+            Read the whole file once, write it to a columnar cache next to
+            the file and memory-map the cache in the following calls. The
+            columns of str become categorical. Filters and usecols are
+            applied to the cached SGA. Default: <False>
+        """
+        if cache:
+            self.sga = _select_sga(_cached_sga(self,
+                                               filename,
+                                               lambda: _concat_chunks(self.parse_chunks(filename,
+                                                                                        chunksize=None,
+                                                                                        remove_white_spaces=remove_white_spaces,
+                                                                                        in_sep=in_sep)),
+                                               remove_white_spaces=remove_white_spaces,
+                                               in_sep=in_sep),
+                                   usecols=usecols,
+                                   **filters)
+            return
+        if all(v is None for v in filters.values()):
+            chunksize = None
+        self.sga = _concat_chunks(self.parse_chunks(filename,
+                                                    chunksize=chunksize,
+                                                    remove_white_spaces=remove_white_spaces,
+                                                    in_sep=in_sep,
+                                                    usecols=usecols,
+                                                    **filters))
+
+    def parse_chunks(self,
+                     filename,
+                     chunksize,
+                     remove_white_spaces=True,
+                     in_sep="\t",
+                     usecols=None,
+                     **filters):
+        """
+        Yields pandas.DataFrame of chunksize rows of the parsed <csv> file,
+        processed as in SGA2.parse, without reading the whole file.
+
+        Parameters
+        -------
+        filename: str
+            Name of file to parse.
+        chunksize: int
+            Number of rows read at once. Whole file at once if <None>.
+        """
+        names = {v: k for k, v in self.names.items()}
+        derived = {self.ORF_Q: self.STR_ID_Q, self.ORF_A: self.STR_ID_A}
+        columns = None
+        if usecols is not None:
+            columns = list(usecols)
+            for i in _filters_columns(**filters) + list(derived.values()):
+                if i not in columns:
+                    columns.append(i)
+            unknown = [i for i in columns if i not in names and i not in derived]
+            if unknown:
+                raise ParserError("Unknown columns: {}".format(unknown))
+            raw = set(names[i] for i in columns if i in names)
+        reader = pd.read_csv(filename,
+                             sep=in_sep,
+                             usecols=(lambda x: (x.replace(" ", "_") if remove_white_spaces else x) in raw)
+                             if columns is not None else None,
+                             chunksize=chunksize)
+        for chunk in [reader] if chunksize is None else reader:
+            chunk = self._process(chunk,
+                                  remove_white_spaces=remove_white_spaces,
+                                  **filters)
+            if columns is not None:
+                chunk = chunk[[i for i in chunk.columns if i in usecols]]
+            yield chunk
+
+    def _process(self,
+                 sga,
+                 remove_white_spaces=True,
+                 predicate=None,
+                 **filters):
+        """
+        Return read SGA with the columns renamed and typed, the rows
+        filtered and the ORFs split from the strains IDs.
         """
-        self.sga = pd.read_csv(filename, sep=in_sep)
         if remove_white_spaces is True:
-            self.sga.columns = [i.replace(" ", "_") for i in self.sga.columns]
-        self.sga.rename(columns=self.names, inplace=True)
-        ORF_Q_col = self.sga[self.STR_ID_Q].str.split("_", expand=True)[0]
-        ORF_A_col = self.sga[self.STR_ID_A].str.split("_", expand=True)[0]
-        ORF_Q_col.name = self.ORF_Q
-        ORF_A_col.name = self.ORF_A
-        self.sga = pd.concat([ORF_Q_col, ORF_A_col, self.sga], axis=1)
-        self.sga = self.sga.astype({k: v for k, v in self.dtypes.items()
-                                    if k in self.sga.columns})
+            sga.columns = [i.replace(" ", "_") for i in sga.columns]
+        sga.rename(columns=self.names, inplace=True)
+        sga = _filter_sga(sga, **filters)
+        sga.insert(0, self.ORF_A, self._strain_ORFs(sga[self.STR_ID_A]))
+        sga.insert(0, self.ORF_Q, self._strain_ORFs(sga[self.STR_ID_Q]))
+        sga = cast_dtypes(sga, self.dtypes)
+        return _filter_sga(sga, predicate=predicate)
+
+    @staticmethod
+    def _strain_ORFs(strains):
+        """
+        Return ORFs split from the strains IDs. Each distinct strain ID is
+        split once.
+        """
+        codes, uniques = pd.factorize(strains)
+        ORFs = np.asarray(pd.Index(uniques).str.split("_").str[0], dtype=object)
+        values = np.full(len(codes), np.nan, dtype=object)
+        values[codes != -1] = ORFs[codes[codes != -1]]
+        return values
 
 
 class AnyNetwork(Columns):
@@ -420,6 +987,7 @@ class AnyNetwork(Columns):
         if len(kwargs) > 0:
             self.sga.rename(columns=kwargs,
                             inplace=True)
+        self.sga = cast_dtypes(self.sga, self.dtypes)
 
 
 class Bioprocesses(Columns):
@@ -445,5 +1013,4 @@ class Bioprocesses(Columns):
         """
         self.bioprocesses = pd.read_excel(filename,
                                           names=self.names)
-        self.bioprocesses = self.bioprocesses.astype({k: v for k, v in self.dtypes.items()
-                                                     if k in self.bioprocesses.columns})
+        self.bioprocesses = cast_dtypes(self.bioprocesses, self.dtypes)
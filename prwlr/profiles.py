@@ -2,18 +2,39 @@
 
 
 from __future__ import print_function
+from collections import OrderedDict
+from itertools import compress
 from prwlr.errors import *
+import numbers
 import numpy as np
 import pandas as pd
+from pandas.api.extensions import ExtensionArray
+from pandas.api.extensions import ExtensionDtype
+from pandas.api.extensions import register_extension_dtype
+from pandas.api.extensions import take as _take
+from pandas.api.indexers import check_array_indexer
 from scipy.spatial import distance as dist
 
 
+class Columns(object):
+    """
+    Container for the columns names defined in this module.
+    """
+    QUERY = "QUERY"
+    TARGET = "TARGET"
+    PSS = "PSS"
+
+
 class Profile(object):
     """
     Profile object.
     """
     _positive_sign = "+"
     _negative_sign = "-"
+    _profile = None
+    _reference = None
+    _row = None
+    _packed = None
 
     def __init__(self,
                  reference,
@@ -28,6 +49,7 @@ class Profile(object):
             raise ProfileConstructorError("Query must be an iterable.")
         self.reference = set(reference)
         self.query = sorted(tuple(set(query)))
+        self._positions = None
         self._construct()
 
     def __len__(self):
@@ -54,14 +76,111 @@ class Profile(object):
 
     def __ne__(self,
                other):
-        return self.profile != other.profile
+        return not self.__eq__(other)
 
     def __eq__(self,
                other):
         return self.profile == other.profile and self.query == other.query
 
     def __hash__(self):
-        return hash(self.profile)
+        return hash((self.profile, tuple(self.query)))
+
+    def __setstate__(self,
+                     state):
+        # Profiles pickled before profile and reference became properties.
+        for name in ("profile", "reference"):
+            if name in state:
+                state["_{}".format(name)] = state.pop(name)
+        self.__dict__.update(state)
+
+    @property
+    def profile(self):
+        """
+        Presence/absence of each of the query elements, tuple of bool. Built
+        from the row on first use for Profile.from_array.
+        """
+        if self._profile is None:
+            if self._packed is not None:
+                row = np.unpackbits(self._packed, count=len(self.query)).astype(bool)
+            else:
+                row = self._row
+            self._profile = tuple(np.asarray(row, dtype=bool).tolist())
+            self._row = self._packed = None
+        return self._profile
+
+    @profile.setter
+    def profile(self,
+                value):
+        self._profile = value
+
+    @property
+    def reference(self):
+        """
+        Set of the elements present. Built from the profile on first use for
+        Profile.from_array.
+        """
+        if self._reference is None:
+            self._reference = set(compress(self.query, self.profile))
+        return self._reference
+
+    @reference.setter
+    def reference(self,
+                  value):
+        self._reference = value
+
+    @classmethod
+    def from_array(cls,
+                   profile,
+                   query,
+                   positions=None,
+                   packed=None):
+        """
+        Return Profile built directly from a boolean vector aligned with an
+        already sorted query. The query is shared, not copied, and
+        numpy.ndarray rows are kept as they are until Profile.profile or
+        Profile.reference is used, which makes the Profile a lightweight
+        view of a ProfileMatrix row. The vector holds no elements outside of
+        the query, so the reference is the present query elements only.
+        prwlr.profiles.Profile built from the same reference and query has
+        the same profile.
+
+        Parameters
+        -------
+        profile: iterable of bool
+            Presence/absence of each of the query elements. Ignored if
+            packed is given.
+        query: list
+            Sorted query the profile is aligned with.
+        positions: dict, default <None>
+            Map of the query elements to their positions, shared as well.
+            Built on first use if <None>.
+        packed: numpy.ndarray, default <None>
+            Row of packed bits, as in prwlr.profiles.ProfileMatrix.bits,
+            unpacked on first use.
+
+        Returns
+        -------
+        prwlr.profiles.Profile
+        """
+        obj = cls.__new__(cls)
+        obj.query = query
+        if packed is not None:
+            obj._packed = packed
+        elif isinstance(profile, np.ndarray):
+            obj._row = profile
+        else:
+            obj.profile = tuple(bool(i) for i in profile)
+        obj._positions = positions
+        return obj
+
+    @property
+    def positions(self):
+        """
+        Map of the query elements to their positions in the profile.
+        """
+        if getattr(self, "_positions", None) is None:
+            self._positions = {k: v for v, k in enumerate(self.query)}
+        return self._positions
 
     def _construct(self):
         """
@@ -89,10 +208,8 @@ class Profile(object):
         Returns <True> if all positions from queries are present in the
         profile.
         """
-        if all([dict(tuple(zip(self.query, self.profile)))[i] for i in queries]):
-            return True
-        else:
-            return False
+        positions = self.positions
+        return all(self.profile[positions[i]] for i in queries)
 
     def isany(self,
               queries):
@@ -100,10 +217,8 @@ class Profile(object):
         Return <True> if any of the positions from queries is present in the
         profile.
         """
-        if any([dict(tuple(zip(self.query, self.profile)))[i] for i in queries]):
-            return True
-        else:
-            return False
+        positions = self.positions
+        return any(self.profile[positions[i]] for i in queries)
 
     def to_string(self,
                   positive_sign=_positive_sign,
@@ -170,44 +285,46 @@ class Profile(object):
                       ignore=None,
                       method="pairwise"):
         """
-        Calculate Profiles Similarity Score.
+        Calculate Profiles Similarity Score. Elements to ignore are left out
+        of the comparison without modifying any of the profiles.
         """
         if len(self) != len(profile):
             raise ProfileError("Different profiles' lengths")
-        prof_1 = self
-        prof_2 = profile
+        prof_1 = self.profile
+        prof_2 = profile.profile
         if ignore:
-            for i in ignore:
-                try:
-                    prof_1.profile = list(prof_1.profile)
-                    del prof_1.profile[prof_1.query.index(i)]
-                    prof_1.profile = tuple(prof_1.profile)
-                except IndexError:
-                    raise ProfileError("Element to ignore not in profile")
-                try:
-                    prof_2.profile = list(prof_2.profile)
-                    del prof_2.profile[prof_2.query.index(i)]
-                    prof_2.profile = tuple(prof_2.profile)
-                except IndexError:
-                    raise ProfileError("Element to ignore not in profile")
+            prof_1 = self._without(ignore)
+            prof_2 = profile._without(ignore)
         if method == "pairwise":
-            return sum(a == b for a, b in zip(prof_1.profile, prof_2.profile))
+            return sum(a == b for a, b in zip(prof_1, prof_2))
         elif method == "jaccard":
-            return dist.jaccard(prof_1.profile, prof_2.profile)
+            return dist.jaccard(prof_1, prof_2)
         elif method == "yule":
-            return dist.yule(prof_1.profile, prof_2.profile)
+            return dist.yule(prof_1, prof_2)
         elif method == "dice":
-            return dist.dice(prof_1.profile, prof_2.profile)
+            return dist.dice(prof_1, prof_2)
         elif method == "hamming":
-            return dist.hamming(prof_1.profile, prof_2.profile)
+            return dist.hamming(prof_1, prof_2)
         elif method == "kulsinski":
-            return dist.kulsinski(prof_1.profile, prof_2.profile)
+            return dist.kulsinski(prof_1, prof_2)
         elif method == "rogerstanimoto":
-            return dist.rogerstanimoto(prof_1.profile, prof_2.profile)
+            return dist.rogerstanimoto(prof_1, prof_2)
         elif method == "russellrao":
-            return dist.russellrao(prof_1.profile, prof_2.profile)
+            return dist.russellrao(prof_1, prof_2)
         elif method == "sokalmichener":
-            return dist.sokalmichener(prof_1.profile, prof_2.profile)
+            return dist.sokalmichener(prof_1, prof_2)
+
+    def _without(self,
+                 ignore):
+        """
+        Return profile values without the positions of the elements to
+        ignore.
+        """
+        try:
+            ignored = set(self.positions[i] for i in ignore)
+        except KeyError:
+            raise ProfileError("Element to ignore not in profile")
+        return tuple(v for k, v in enumerate(self.profile) if k not in ignored)
 
     def get_present(self):
         """
@@ -220,3 +337,1586 @@ class Profile(object):
         Return element absent in the profile.
         """
         return tuple(k for k, v in self._bind() if v is False)
+
+
+PSS_METHODS = ("pairwise",
+               "jaccard",
+               "yule",
+               "dice",
+               "hamming",
+               "kulsinski",
+               "rogerstanimoto",
+               "russellrao",
+               "sokalmichener")
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(bits):
+    """
+    Return number of set bits in each row of packed profiles.
+
+    Parameters
+    -------
+    bits: numpy.ndarray
+        Packed profiles of uint8 dtype, one profile per row.
+
+    Returns
+    -------
+    numpy.ndarray of int64
+    """
+    return _POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+
+def contingency(bits_1,
+                bits_2,
+                length):
+    """
+    Return 2x2 contingency counts of packed profiles compared row by row.
+
+    Parameters
+    -------
+    bits_1: numpy.ndarray
+        Packed profiles of uint8 dtype, one profile per row.
+    bits_2: numpy.ndarray
+        Packed profiles of uint8 dtype, broadcastable to bits_1.
+    length: int
+        Number of species in the profiles.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Counts of positions present in both profiles, present only in the
+        first, present only in the second and absent in both.
+    """
+    ntt = popcount(bits_1 & bits_2)
+    ntf = popcount(bits_1) - ntt
+    nft = popcount(bits_2) - ntt
+    nff = length - ntt - ntf - nft
+    return ntt, ntf, nft, nff
+
+
+def pss_from_contingency(ntt,
+                         ntf,
+                         nft,
+                         nff,
+                         method="pairwise"):
+    """
+    Return Profiles Similarity Score calculated from 2x2 contingency counts,
+    as returned by prwlr.profiles.contingency. Values are identical to these
+    of Profile.calculate_pss.
+
+    Parameters
+    -------
+    ntt, ntf, nft, nff: numpy.ndarray
+        Contingency counts.
+    method: str, default <pairwise>
+        One of prwlr.profiles.PSS_METHODS.
+
+    Returns
+    -------
+    numpy.ndarray
+        int64 for <pairwise>, float64 otherwise.
+    """
+    ntt, ntf, nft, nff = (np.asarray(i, dtype=np.int64) for i in (ntt, ntf, nft, nff))
+    diff = ntf + nft
+    n = ntt + diff + nff
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if method == "pairwise":
+            return ntt + nff
+        elif method == "jaccard":
+            union = ntt + diff
+            return np.where(union != 0, diff / np.where(union != 0, union, 1), 0.0)
+        elif method == "yule":
+            half_R = ntf * nft
+            return np.where(half_R != 0, 2.0 * half_R / (ntt * nff + half_R), 0.0)
+        elif method == "dice":
+            return diff / (2.0 * ntt + diff)
+        elif method == "hamming":
+            return diff / n
+        elif method == "kulsinski":
+            return (diff - ntt + n) / (diff + n).astype(np.float64)
+        elif method in ("rogerstanimoto", "sokalmichener"):
+            return 2.0 * diff / (ntt + nff + 2.0 * diff)
+        elif method == "russellrao":
+            return (n - ntt) / n.astype(np.float64)
+    raise ProfileError("Unknown method: {}".format(method))
+
+
+def _packed_width(length):
+    """
+    Return number of bytes needed to pack given number of bits.
+    """
+    return (length + 7) // 8
+
+
+class ProfileMatrix(object):
+    """
+    Collection of Phylogenetic Profiles sharing one query (species axis).
+    Profiles are stored as a numpy.packbits array, one row per profile, which
+    takes one bit per species instead of a Python object per profile.
+
+    Parameters
+    -------
+    bits: numpy.ndarray
+        Packed profiles of uint8 dtype and shape
+        (number of profiles, ceil(number of species / 8)).
+    query: list
+        Species axis shared by all the profiles.
+    index: list-like, default <None>
+        Labels of the profiles, e.g. ORF IDs. Positions if <None>.
+    """
+    def __init__(self,
+                 bits,
+                 query,
+                 index=None):
+        self.bits = np.ascontiguousarray(bits, dtype=np.uint8)
+        self.query = list(query)
+        if self.bits.ndim != 2 or self.bits.shape[1] != _packed_width(len(self.query)):
+            raise ProfileError("Bits shape does not match the query length.")
+        if index is None:
+            index = pd.RangeIndex(len(self.bits))
+        self.index = pd.Index(index)
+        if len(self.index) != len(self.bits):
+            raise ProfileError("Index length does not match the number of profiles.")
+        self.positions = {k: v for v, k in enumerate(self.query)}
+
+    def __len__(self):
+        return len(self.bits)
+
+    def __repr__(self):
+        return "<{} {} profiles x {} species>".format(
+            self.__class__.__name__,
+            len(self),
+            len(self.query),
+        )
+
+    def __getitem__(self,
+                    key):
+        if isinstance(key, (int, np.integer)):
+            return Profile.from_array(
+                None,
+                self.query,
+                positions=self.positions,
+                packed=self.bits[key],
+            )
+        return self.take(np.arange(len(self))[key])
+
+    @classmethod
+    def from_bool(cls,
+                  array,
+                  query,
+                  index=None):
+        """
+        Return ProfileMatrix from a boolean array of shape
+        (number of profiles, number of species).
+        """
+        array = np.asarray(array, dtype=bool).reshape(-1, len(query))
+        return cls(np.packbits(array, axis=1), query, index=index)
+
+    @classmethod
+    def from_references(cls,
+                        references,
+                        query,
+                        index=None):
+        """
+        Return ProfileMatrix from an iterable of references, the same way
+        prwlr.profiles.Profile is built from a reference and a query.
+        Elements of the references missing from the query are not kept and
+        the profiles read back have the present query elements as the
+        reference.
+
+        Parameters
+        -------
+        references: iterable of iterables
+            Elements present in each of the profiles.
+        query: iterable
+            Species axis. Sorted and deduplicated as in
+            prwlr.profiles.Profile.
+        index: list-like, default <None>
+            Labels of the profiles.
+
+        Returns
+        -------
+        prwlr.profiles.ProfileMatrix
+        """
+        query = sorted(tuple(set(query)))
+        positions = {k: v for v, k in enumerate(query)}
+        references = list(references)
+        rows = []
+        cols = []
+        for row, reference in enumerate(references):
+            found = set(positions[i] for i in reference if i in positions)
+            rows.extend([row] * len(found))
+            cols.extend(found)
+        array = np.zeros((len(references), len(query)), dtype=bool)
+        array[rows, cols] = True
+        return cls.from_bool(array, query, index=index)
+
+    @classmethod
+    def from_profiles(cls,
+                      profiles):
+        """
+        Return ProfileMatrix from pandas.Series (or any iterable) of
+        prwlr.profiles.Profile objects. All the profiles must share the same
+        query.
+        """
+        profiles = list(profiles.items()) if isinstance(profiles, pd.Series) else list(enumerate(profiles))
+        if len(profiles) == 0:
+            return cls(np.zeros((0, 0), dtype=np.uint8), [])
+        query = profiles[0][1].query
+        if any(i.query != query for _, i in profiles):
+            raise ProfileError("Profiles must share the same query.")
+        return cls.from_bool(
+            [i.profile for _, i in profiles],
+            query,
+            index=[k for k, _ in profiles],
+        )
+
+    @property
+    def shape(self):
+        """
+        Number of profiles and number of species.
+        """
+        return (len(self), len(self.query))
+
+    @property
+    def nbytes(self):
+        """
+        Number of bytes taken by the packed profiles.
+        """
+        return self.bits.nbytes
+
+    def to_bool(self,
+                bits=None):
+        """
+        Return profiles unpacked to boolean array of shape
+        (number of profiles, number of species).
+        """
+        bits = self.bits if bits is None else bits
+        return np.unpackbits(bits, axis=1, count=len(self.query)).astype(bool)
+
+    def take(self,
+             positions):
+        """
+        Return ProfileMatrix with profiles at given positions.
+        """
+        positions = np.asarray(positions)
+        return self.__class__(self.bits[positions], self.query, index=self.index[positions])
+
+    def mask(self,
+             species):
+        """
+        Return packed bits with given species set, aligned with the query.
+
+        Parameters
+        -------
+        species: iterable
+            Elements of the query.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        array = np.zeros(len(self.query), dtype=bool)
+        try:
+            array[[self.positions[i] for i in species]] = True
+        except KeyError as e:
+            raise ProfileError("Element not in profile: {}".format(e))
+        return np.packbits(array)
+
+    def project(self,
+                species):
+        """
+        Return ProfileMatrix restricted to given species, in given order.
+        Only the columns of the packed profiles are selected, the profiles
+        are not rebuilt from the references.
+
+        Parameters
+        -------
+        species: iterable
+            Elements of the query to keep.
+
+        Returns
+        -------
+        prwlr.profiles.ProfileMatrix
+        """
+        species = list(species)
+        try:
+            columns = [self.positions[i] for i in species]
+        except KeyError as e:
+            raise ProfileError("Element not in profile: {}".format(e))
+        return self.from_bool(self.to_bool()[:, columns], species, index=self.index)
+
+    def drop(self,
+             species):
+        """
+        Return ProfileMatrix without given species.
+        """
+        species = set(species)
+        missing = species.difference(self.query)
+        if missing:
+            raise ProfileError("Element not in profile: {}".format(", ".join(sorted(missing))))
+        return self.project([i for i in self.query if i not in species])
+
+    def to_series(self):
+        """
+        Return pandas.Series of prwlr.profiles.Profile row views, indexed
+        with ProfileMatrix.index.
+        """
+        return pd.Series(
+            [Profile.from_array(None, self.query, positions=self.positions, packed=i)
+             for i in self.bits],
+            index=self.index,
+            dtype=object,
+        )
+
+
+class ProfileIndex(Columns):
+    """
+    Exact nearest-profile search over a collection of Phylogenetic Profiles.
+    The packed profiles are cut into bit slices and the number of present
+    species in each slice is kept. The L1 distance between slice counts of
+    two profiles never exceeds the number of species they differ in, which
+    gives a cheap lower bound of the hamming and jaccard distances. Exact
+    distances are calculated only for the candidates the bound cannot rule
+    out.
+
+    Parameters
+    -------
+    profiles: pandas.Series or prwlr.profiles.ProfileMatrix
+        Profiles to search in. Must share the same query.
+    method: str, default <hamming>
+        Distance to search with, <hamming> or <jaccard>. Values are the same
+        as these of Profile.calculate_pss.
+    slices: int, default <8>
+        Number of bit slices to bound the distance with.
+    """
+    methods = ("hamming", "jaccard")
+
+    def __init__(self,
+                 profiles,
+                 method="hamming",
+                 slices=8):
+        if method not in self.methods:
+            raise ProfileError("Method must be one of: {}".format(", ".join(self.methods)))
+        if not isinstance(profiles, ProfileMatrix):
+            profiles = ProfileMatrix.from_profiles(profiles)
+        self.matrix = profiles
+        self.method = method
+        width = self.matrix.bits.shape[1]
+        self._slice_starts = np.array_split(np.arange(width), max(min(slices, width), 1))
+        self._slice_starts = np.array([i[0] for i in self._slice_starts if len(i) > 0], dtype=np.intp)
+        self._slice_counts = self._count_slices(self.matrix.bits)
+        self._popcount = self._slice_counts.sum(axis=1)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def _count_slices(self,
+                      bits):
+        """
+        Return number of set bits in each slice of packed profiles.
+        """
+        if len(self._slice_starts) == 0:
+            return np.zeros((len(bits), 1), dtype=np.int64)
+        return np.add.reduceat(_POPCOUNT[bits].astype(np.int64), self._slice_starts, axis=1)
+
+    def _as_query(self,
+                  query):
+        """
+        Return packed bits of the query and position to exclude from the
+        results. Queries given as labels are looked up in the index and
+        excluded from their own results.
+        """
+        if isinstance(query, Profile):
+            if len(query) != len(self.matrix.query):
+                raise ProfileError("Different profiles' lengths")
+            return np.packbits(np.array(query.profile, dtype=bool))[None, :], None
+        position = self.matrix.index.get_loc(query)
+        if not isinstance(position, (int, np.integer)):
+            position = np.arange(len(self))[position][0]
+        return self.matrix.bits[[position]], position
+
+    def _bounds(self,
+                bits):
+        """
+        Return lower bounds of the distances between the query and all the
+        profiles.
+        """
+        lower = np.abs(self._slice_counts - self._count_slices(bits)).sum(axis=1)
+        length = len(self.matrix.query)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.method == "hamming":
+                return lower / float(length)
+            denominator = self._popcount + popcount(bits)[0] + lower
+            return np.where(denominator != 0, 2.0 * lower / np.where(denominator != 0, denominator, 1), 0.0)
+
+    def _distances(self,
+                   bits,
+                   positions):
+        """
+        Return exact distances between the query and the profiles at given
+        positions.
+        """
+        return pss_from_contingency(
+            *contingency(self.matrix.bits[positions], bits, len(self.matrix.query)),
+            method=self.method
+        )
+
+    def _topk(self,
+              query,
+              k,
+              chunksize):
+        """
+        Return positions and distances of k profiles nearest to one query.
+        """
+        bits, exclude = self._as_query(query)
+        bounds = self._bounds(bits)
+        order = np.argsort(bounds, kind="stable")
+        if exclude is not None:
+            order = order[order != exclude]
+        positions = np.array([], dtype=np.intp)
+        distances = np.array([], dtype=np.float64)
+        for start in range(0, len(order), chunksize):
+            candidates = order[start:start + chunksize]
+            if len(positions) == k and bounds[candidates[0]] > distances[-1]:
+                break
+            positions = np.concatenate([positions, candidates])
+            distances = np.concatenate([distances, self._distances(bits, candidates)])
+            best = np.lexsort((positions, distances))[:k]
+            positions, distances = positions[best], distances[best]
+        return positions, distances
+
+    def _radius(self,
+                query,
+                radius):
+        """
+        Return positions and distances of the profiles within radius from
+        one query.
+        """
+        bits, exclude = self._as_query(query)
+        candidates = np.flatnonzero(self._bounds(bits) <= radius)
+        if exclude is not None:
+            candidates = candidates[candidates != exclude]
+        distances = self._distances(bits, candidates)
+        found = distances <= radius
+        positions, distances = candidates[found], distances[found]
+        best = np.lexsort((positions, distances))
+        return positions[best], distances[best]
+
+    def _search(self,
+                queries,
+                search,
+                *args):
+        """
+        Return results of the search as pandas.Series for a single query or
+        pandas.DataFrame in long format for many queries.
+        """
+        if isinstance(queries, ProfileMatrix):
+            queries = queries.to_series()
+        if isinstance(queries, (Profile, str)) or np.isscalar(queries):
+            positions, distances = search(queries, *args)
+            return pd.Series(distances, index=self.matrix.index[positions], name=self.PSS)
+        if isinstance(queries, pd.Series):
+            labels, queries = list(queries.index), list(queries.values)
+        else:
+            labels = queries = list(queries)
+        results = []
+        for label, query in zip(labels, queries):
+            positions, distances = search(query, *args)
+            results.append(pd.DataFrame({
+                self.QUERY: [label] * len(positions),
+                self.TARGET: self.matrix.index[positions],
+                self.PSS: distances,
+            }))
+        if not results:
+            return pd.DataFrame(columns=[self.QUERY, self.TARGET, self.PSS])
+        return pd.concat(results, ignore_index=True)
+
+    def topk(self,
+             queries,
+             k=10,
+             chunksize=1024):
+        """
+        Return k profiles nearest to the query. Ties are broken by the
+        position in the index.
+
+        Parameters
+        -------
+        queries: prwlr.profiles.Profile, label or collection of these
+            Profile to search for or label of the indexed profile. Labels are
+            excluded from their own results. pandas.Series,
+            prwlr.profiles.ProfileMatrix or list are searched for one by one.
+        k: int, default <10>
+            Number of profiles to return.
+        chunksize: int, default <1024>
+            Number of candidates scored at once.
+
+        Returns
+        -------
+        pandas.Series
+            Distances indexed with the labels of the nearest profiles, for a
+            single query.
+        pandas.DataFrame
+            QUERY, TARGET and PSS columns, for many queries.
+        """
+        if k < 1:
+            raise ValueError("k must be a positive integer")
+        return self._search(queries, self._topk, k, max(chunksize, k))
+
+    def radius(self,
+               queries,
+               radius):
+        """
+        Return all the profiles within given distance from the query, sorted
+        by distance.
+
+        Parameters
+        -------
+        queries: prwlr.profiles.Profile, label or collection of these
+            See ProfileIndex.topk.
+        radius: float
+            Maximal distance, inclusive.
+
+        Returns
+        -------
+        pandas.Series or pandas.DataFrame
+            See ProfileIndex.topk.
+        """
+        return self._search(queries, self._radius, radius)
+
+
+def leave_one_out_contingency(bits_1,
+                              bits_2,
+                              length,
+                              positions):
+    """
+    Return 2x2 contingency counts of packed profiles compared row by row,
+    each time with one position left out. The counts of all the positions
+    are calculated once and the contribution of the left out position is
+    subtracted.
+
+    Parameters
+    -------
+    bits_1: numpy.ndarray
+        Packed profiles of uint8 dtype, one profile per row.
+    bits_2: numpy.ndarray
+        Packed profiles of uint8 dtype, of the same shape as bits_1.
+    length: int
+        Number of species in the profiles.
+    positions: list of int
+        Positions to leave out, one at a time.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Counts as in prwlr.profiles.contingency, of shape
+        (number of profiles, number of positions).
+    """
+    ntt, ntf, nft, nff = contingency(bits_1, bits_2, length)
+    u = np.unpackbits(bits_1, axis=1, count=length)[:, positions].astype(bool)
+    v = np.unpackbits(bits_2, axis=1, count=length)[:, positions].astype(bool)
+    return (ntt[:, None] - (u & v),
+            ntf[:, None] - (u & ~v),
+            nft[:, None] - (~u & v),
+            nff[:, None] - (~u & ~v))
+
+
+def select(profiles,
+           present=None,
+           absent=None,
+           any_of=None):
+    """
+    Return profiles matching the pattern of present and absent species. The
+    pattern is evaluated as bit masks over all the packed profiles at once.
+
+    Parameters
+    -------
+    profiles: pandas.Series or prwlr.profiles.ProfileMatrix
+        Profiles sharing the same query.
+    present: iterable, default <None>
+        Species that must all be present, as in Profile.isall.
+    absent: iterable, default <None>
+        Species that must all be absent.
+    any_of: iterable, default <None>
+        Species of which at least one must be present, as in Profile.isany.
+
+    Returns
+    -------
+    pandas.Series or prwlr.profiles.ProfileMatrix
+        Selected profiles, of the same type as passed.
+    """
+    matrix = _as_profile_matrix(profiles)
+    selected = np.ones(len(matrix), dtype=bool)
+    if present is not None:
+        mask = matrix.mask(present)
+        selected &= ((matrix.bits & mask) == mask).all(axis=1)
+    if absent is not None:
+        selected &= ~(matrix.bits & matrix.mask(absent)).any(axis=1)
+    if any_of is not None:
+        selected &= (matrix.bits & matrix.mask(any_of)).any(axis=1)
+    if isinstance(profiles, ProfileMatrix):
+        return profiles.take(np.flatnonzero(selected))
+    return profiles[selected]
+
+
+def _as_profile_matrix(profiles):
+    """
+    Return prwlr.profiles.ProfileMatrix from pandas.Series of
+    prwlr.profiles.Profile objects. ProfileMatrix is returned as is.
+    """
+    if isinstance(profiles, ProfileMatrix):
+        return profiles
+    return ProfileMatrix.from_profiles(profiles)
+
+
+def minhash_signatures(profiles,
+                       num_perm=128,
+                       seed=0):
+    """
+    Return MinHash signatures of the profiles. Each column corresponds to a
+    random permutation of the species and holds the rank of the first
+    species present in the profile. The probability that two profiles share
+    a value equals their jaccard similarity.
+
+    Parameters
+    -------
+    profiles: pandas.Series or prwlr.profiles.ProfileMatrix
+        Profiles sharing the same query.
+    num_perm: int, default <128>
+        Number of permutations.
+    seed: int, default <0>
+        Seed of the permutations.
+
+    Returns
+    -------
+    numpy.ndarray
+        Signatures of int32 dtype and shape (number of profiles, num_perm).
+        Profiles with no species present get the number of species.
+    """
+    matrix = _as_profile_matrix(profiles)
+    length = len(matrix.query)
+    rows, cols = np.nonzero(matrix.to_bool())
+    nonempty, starts = np.unique(rows, return_index=True)
+    rng = np.random.RandomState(seed)
+    ranks = np.array([rng.permutation(length) for _ in range(num_perm)], dtype=np.int32)
+    signatures = np.full((len(matrix), num_perm), length, dtype=np.int32)
+    if len(cols) == 0:
+        return signatures
+    step = max(1, (1 << 24) // len(cols))
+    for i in range(0, num_perm, step):
+        signatures[nonempty, i:i + step] = np.minimum.reduceat(
+            ranks[i:i + step, cols],
+            starts,
+            axis=1,
+        ).T
+    return signatures
+
+
+def lsh_bands(max_distance,
+              num_perm=128,
+              recall=0.95):
+    """
+    Return number of bands and rows per band for locality-sensitive hashing
+    of MinHash signatures. The largest number of rows per band is chosen,
+    which keeps the candidates fewest, for which a pair at max_distance
+    still becomes a candidate with at least the given probability.
+    """
+    similarity = 1.0 - max_distance
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1.0 - (1.0 - similarity ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+
+def _expand_groups(pairs,
+                   inverse):
+    """
+    Return pairs of positions of the members of pairs of groups, first
+    position lower than the second, sorted, and the row of the pair of
+    groups each of them comes from. A group paired with itself gives all
+    the pairs of its members. Each pair of groups is expanded once.
+    """
+    counts = np.bincount(inverse)
+    members = np.argsort(inverse, kind="stable")
+    starts = np.cumsum(counts) - counts
+    sizes = counts[pairs[:, 0]] * counts[pairs[:, 1]]
+    source = np.repeat(np.arange(len(pairs)), sizes)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    width = counts[pairs[source, 1]]
+    first = members[starts[pairs[source, 0]] + offsets // width]
+    second = members[starts[pairs[source, 1]] + offsets % width]
+    keep = (pairs[source, 0] != pairs[source, 1]) | (first < second)
+    first, second, source = first[keep], second[keep], source[keep]
+    first, second = np.minimum(first, second), np.maximum(first, second)
+    order = np.lexsort((second, first))
+    return np.column_stack((first[order], second[order])).astype(np.int64), source[order]
+
+
+def lsh_candidate_pairs(signatures,
+                        bands):
+    """
+    Return pairs of positions of the profiles which share all the MinHash
+    values in at least one band. Identical signatures are grouped first, so
+    the buckets hold distinct signatures and the pairs within each group
+    are made once, not once per band.
+
+    Parameters
+    -------
+    signatures: numpy.ndarray
+        MinHash signatures, as returned by prwlr.profiles.minhash_signatures.
+    bands: int
+        Number of bands the signatures are cut into.
+
+    Returns
+    -------
+    numpy.ndarray
+        Pairs of positions of shape (number of pairs, 2), first position
+        lower than the second.
+    """
+    if len(signatures) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    signatures, inverse = np.unique(signatures, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    pairs = np.empty(0, dtype=np.int64)
+    for band in range(bands):
+        keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = keys.view(np.dtype((np.void, keys.dtype.itemsize * rows))).ravel()
+        _, buckets, sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        order = np.argsort(buckets, kind="stable")
+        ends = np.cumsum(sizes)
+        band_pairs = []
+        for size, end in zip(sizes, ends):
+            if size < 2:
+                continue
+            members = order[end - size:end]
+            first, second = np.triu_indices(size, k=1)
+            band_pairs.append(members[first].astype(np.int64) * n + members[second])
+        if band_pairs:
+            pairs = np.union1d(pairs, np.concatenate(band_pairs))
+    groups = np.nonzero(np.bincount(inverse) > 1)[0]
+    pairs = np.concatenate((
+        np.column_stack((pairs // n, pairs % n)),
+        np.column_stack((groups, groups)),
+    )).astype(np.int64)
+    return _expand_groups(pairs, inverse)[0]
+
+
+def _pairs_frame(matrix,
+                 pairs,
+                 distances):
+    """
+    Return pandas.DataFrame of labelled pairs of profiles with the
+    distances.
+    """
+    return pd.DataFrame({
+        Columns.QUERY: matrix.index[pairs[:, 0]],
+        Columns.TARGET: matrix.index[pairs[:, 1]],
+        Columns.PSS: distances,
+    })
+
+
+def similar_pairs(profiles,
+                  max_distance,
+                  num_perm=128,
+                  bands=None,
+                  seed=0):
+    """
+    Return pairs of profiles within given jaccard distance, found
+    approximately. Candidates come from banded locality-sensitive hashing of
+    MinHash signatures and are re-scored exactly, with the same values as
+    Profile.calculate_pss(method="jaccard"). Some pairs may be missed, none
+    is reported falsely. Identical profiles are grouped, each group is
+    hashed and scored once.
+
+    Parameters
+    -------
+    profiles: pandas.Series or prwlr.profiles.ProfileMatrix
+        Profiles sharing the same query.
+    max_distance: float
+        Maximal jaccard distance, inclusive.
+    num_perm: int, default <128>
+        Number of MinHash permutations.
+    bands: int, default <None>
+        Number of LSH bands. Chosen with prwlr.profiles.lsh_bands if <None>.
+    seed: int, default <0>
+        Seed of the MinHash permutations.
+
+    Returns
+    -------
+    pandas.DataFrame
+        QUERY, TARGET and PSS columns.
+    """
+    matrix = _as_profile_matrix(profiles)
+    if bands is None:
+        bands, _ = lsh_bands(max_distance, num_perm=num_perm)
+    # Identical profiles are hashed and scored once, as one group.
+    bits, inverse = np.unique(matrix.bits, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    unique = ProfileMatrix(bits, matrix.query)
+    groups = np.nonzero(np.bincount(inverse, minlength=len(bits)) > 1)[0]
+    pairs = np.concatenate((
+        lsh_candidate_pairs(minhash_signatures(unique, num_perm=num_perm, seed=seed), bands),
+        np.column_stack((groups, groups)).astype(np.int64),
+    ))
+    distances = pss_from_contingency(
+        *contingency(bits[pairs[:, 0]], bits[pairs[:, 1]], len(matrix.query)),
+        method="jaccard"
+    )
+    found = distances <= max_distance
+    pairs, source = _expand_groups(pairs[found], inverse)
+    return _pairs_frame(matrix, pairs, distances[found][source])
+
+
+def exact_similar_pairs(profiles,
+                        max_distance,
+                        block_size=512):
+    """
+    Return all the pairs of profiles within given jaccard distance,
+    comparing the profiles block by block.
+
+    Parameters
+    -------
+    profiles: pandas.Series or prwlr.profiles.ProfileMatrix
+        Profiles sharing the same query.
+    max_distance: float
+        Maximal jaccard distance, inclusive.
+    block_size: int, default <512>
+        Number of profiles in one block side.
+
+    Returns
+    -------
+    pandas.DataFrame
+        QUERY, TARGET and PSS columns.
+    """
+    matrix = _as_profile_matrix(profiles)
+    pairs = []
+    distances = []
+    for i in range(0, len(matrix), block_size):
+        for j in range(i, len(matrix), block_size):
+            block = pss_from_contingency(
+                *contingency(
+                    matrix.bits[i:i + block_size, None, :],
+                    matrix.bits[None, j:j + block_size, :],
+                    len(matrix.query),
+                ),
+                method="jaccard"
+            )
+            first, second = np.nonzero(block <= max_distance)
+            first, second = first + i, second + j
+            upper = first < second
+            pairs.append(np.column_stack((first[upper], second[upper])))
+            distances.append(block[first[upper] - i, second[upper] - j])
+    if not pairs:
+        return _pairs_frame(matrix, np.empty((0, 2), dtype=np.int64), [])
+    return _pairs_frame(matrix, np.concatenate(pairs), np.concatenate(distances))
+
+
+def similar_pairs_recall(profiles,
+                         max_distance,
+                         **kwargs):
+    """
+    Return fraction of the pairs found by prwlr.profiles.exact_similar_pairs
+    that are also found by prwlr.profiles.similar_pairs. Keyword arguments
+    are passed to prwlr.profiles.similar_pairs.
+
+    Returns
+    -------
+    float
+        Recall, <1.0> if there are no similar pairs at all.
+    """
+    exact = exact_similar_pairs(profiles, max_distance)
+    if len(exact) == 0:
+        return 1.0
+    approximate = similar_pairs(profiles, max_distance, **kwargs)
+    found = pd.merge(
+        exact[[Columns.QUERY, Columns.TARGET]],
+        approximate[[Columns.QUERY, Columns.TARGET]],
+        how="inner",
+    )
+    return len(found) / float(len(exact))
+
+
+def hash_cons(profiles):
+    """
+    Return pandas.Series in which identical prwlr.profiles.Profile objects
+    are replaced with one shared instance.
+
+    Parameters
+    -------
+    profiles: pandas.Series
+        Series of prwlr.profiles.Profile objects.
+
+    Returns
+    -------
+    pandas.Series
+    """
+    canonical = {}
+    return pd.Series(
+        [canonical.setdefault(i, i) for i in profiles.values],
+        index=profiles.index,
+        name=profiles.name,
+        dtype=object,
+    )
+
+
+class PairCache(object):
+    """
+    LRU-bounded cache of Profiles Similarity Scores of pairs of profiles.
+    Profiles are hash-consed: identical profiles get one integer ID, so each
+    distinct pair of profiles is scored only once and the result is shared
+    by all the interactions with the same pair of profiles, also across
+    calls reusing the same cache. The cache is cleared after a call leaving
+    more than max_profiles distinct profiles interned.
+
+    Parameters
+    -------
+    maxsize: int, default <2 ** 20>
+        Maximal number of pairs kept.
+    max_profiles: int, default <2 ** 16>
+        Maximal number of distinct profiles kept.
+    """
+    def __init__(self,
+                 maxsize=2 ** 20,
+                 max_profiles=2 ** 16):
+        self.maxsize = maxsize
+        self.max_profiles = max_profiles
+        self.hits = 0
+        self.misses = 0
+        self.clear()
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def clear(self):
+        """
+        Remove all the interned profiles and the scored pairs.
+        """
+        self._ids = {}
+        self._bits = []
+        self._lengths = []
+        self._profiles = []
+        self._pairs = OrderedDict()
+
+    def _intern(self,
+                profile):
+        """
+        Return integer ID of the profile, assigning a new one to a profile
+        not seen before.
+        """
+        profile_id = self._ids.get(profile)
+        if profile_id is None:
+            profile_id = len(self._bits)
+            self._ids[profile] = profile_id
+            self._bits.append(np.packbits(np.array(profile.profile, dtype=bool)))
+            self._lengths.append(len(profile))
+            self._profiles.append(profile)
+        return profile_id
+
+    def intern(self,
+               profiles):
+        """
+        Return integer IDs of prwlr.profiles.Profile objects. Identical
+        profiles get the same ID. Each distinct object is hashed only once.
+
+        Parameters
+        -------
+        profiles: pandas.Series
+            Series of prwlr.profiles.Profile objects or with
+            prwlr.profiles.ProfileDtype, for which only the distinct profiles
+            of the table are interned.
+
+        Returns
+        -------
+        numpy.ndarray of int64
+        """
+        values = profiles.array if isinstance(profiles, pd.Series) else profiles
+        if isinstance(values, ProfileArray):
+            if values.isna().any():
+                raise ProfileError("Missing profiles cannot be scored.")
+            table = ProfileArray(values._table, np.arange(len(values._table)), values.dtype)
+            return np.array([self._intern(i) for i in table], dtype=np.int64)[values._codes]
+        values = np.asarray(values, dtype=object)
+        _, first, codes = np.unique(
+            np.fromiter((id(i) for i in values), dtype=np.int64, count=len(values)),
+            return_index=True,
+            return_inverse=True,
+        )
+        ids = np.array([self._intern(values[i]) for i in first], dtype=np.int64)
+        return ids[codes]
+
+    def bits(self,
+             ids):
+        """
+        Return table of packed profiles of given IDs, one row per ID.
+        """
+        bits = np.empty((len(ids), _packed_width(self._lengths[ids[0]])), dtype=np.uint8)
+        for row, profile_id in enumerate(ids.tolist()):
+            bits[row] = self._bits[profile_id]
+        return bits
+
+    def query(self,
+              ids):
+        """
+        Return query shared by the profiles of given IDs.
+        """
+        query = self._profiles[ids[0]].query
+        if any(self._profiles[i].query != query for i in ids.tolist()):
+            raise ProfileError("Profiles must share the same query")
+        return query
+
+    def distinct_pairs(self,
+                       profiles_1,
+                       profiles_2):
+        """
+        Return IDs of distinct pairs of profiles compared row by row and
+        positions of the pairs for each row.
+
+        Parameters
+        -------
+        profiles_1: pandas.Series
+            Series of prwlr.profiles.Profile objects.
+        profiles_2: pandas.Series
+            Series of prwlr.profiles.Profile objects of the same length.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            IDs of the first and the second profile of each distinct pair
+            and the position of the pair for each row.
+        """
+        ids_1 = self.intern(profiles_1)
+        ids_2 = self.intern(profiles_2)
+        used = np.unique(np.concatenate((ids_1, ids_2)))
+        if len(set(self._lengths[i] for i in used.tolist())) > 1:
+            raise ProfileError("Different profiles' lengths")
+        size = len(self._bits)
+        keys, inverse = np.unique(ids_1 * size + ids_2, return_inverse=True)
+        return keys // size, keys % size, inverse
+
+    def _ignore_mask(self,
+                     ids,
+                     ignore):
+        """
+        Return packed mask of the positions kept after ignoring given
+        elements and the number of these positions. All the profiles must
+        share the same query.
+        """
+        query = self.query(ids)
+        keep = np.ones(len(query), dtype=bool)
+        positions = self._profiles[ids[0]].positions
+        try:
+            keep[[positions[i] for i in ignore]] = False
+        except KeyError:
+            raise ProfileError("Element to ignore not in profile")
+        return np.packbits(keep), int(keep.sum())
+
+    def score(self,
+              profiles_1,
+              profiles_2,
+              method="pairwise",
+              ignore=None,
+              chunksize=2 ** 20):
+        """
+        Return Profiles Similarity Score of profiles compared row by row.
+
+        Parameters
+        -------
+        profiles_1: pandas.Series
+            Series of prwlr.profiles.Profile objects.
+        profiles_2: pandas.Series
+            Series of prwlr.profiles.Profile objects of the same length.
+        method: str, default <pairwise>
+            One of prwlr.profiles.PSS_METHODS.
+        ignore: iterable, default <None>
+            Elements of the query left out of the comparison, as in
+            Profile.calculate_pss. Applied as a column mask, the profiles are
+            not modified.
+        chunksize: int, default <2 ** 20>
+            Number of distinct pairs scored at once.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        if method not in PSS_METHODS:
+            raise ProfileError("Unknown method: {}".format(method))
+        ignore = frozenset(ignore) if ignore else None
+        dtype = np.int64 if method == "pairwise" else np.float64
+        ids_1, ids_2, inverse = self.distinct_pairs(profiles_1, profiles_2)
+        if len(inverse) == 0:
+            return np.array([], dtype=dtype)
+        used = np.unique(np.concatenate((ids_1, ids_2)))
+        length = self._lengths[used[0]]
+        mask, kept = None, length
+        if ignore is not None:
+            mask, kept = self._ignore_mask(used, ignore)
+        values = np.empty(len(ids_1), dtype=dtype)
+        missing = []
+        for position, pair in enumerate(zip(ids_1.tolist(), ids_2.tolist())):
+            pair = (method, ignore) + pair
+            value = self._pairs.get(pair)
+            if value is None:
+                missing.append(position)
+            else:
+                self._pairs.move_to_end(pair)
+                values[position] = value
+        self.hits += len(ids_1) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            missing = np.array(missing, dtype=np.int64)
+            bits = self.bits(used)
+            if mask is not None:
+                bits &= mask
+            rows_1 = np.searchsorted(used, ids_1)
+            rows_2 = np.searchsorted(used, ids_2)
+            for start in range(0, len(missing), chunksize):
+                chunk = missing[start:start + chunksize]
+                values[chunk] = pss_from_contingency(
+                    *contingency(
+                        bits[rows_1[chunk]],
+                        bits[rows_2[chunk]],
+                        kept,
+                    ),
+                    method=method
+                )
+            if len(self._bits) > self.max_profiles:
+                self.clear()
+            else:
+                for position in missing.tolist():
+                    pair = (method, ignore, int(ids_1[position]), int(ids_2[position]))
+                    self._pairs[pair] = values[position].item()
+                while len(self._pairs) > self.maxsize:
+                    self._pairs.popitem(last=False)
+        return values[inverse]
+
+
+def _remap(codes,
+           remap):
+    """
+    Return codes mapped to a new table, keeping missing <-1> codes.
+    """
+    codes = np.array(codes, dtype=np.int64)
+    valid = codes != -1
+    codes[valid] = remap[codes[valid]]
+    return codes
+
+
+def _unique_rows(bits):
+    """
+    Return unique rows of packed profiles and position of each of the rows
+    in the unique ones.
+    """
+    bits = np.ascontiguousarray(bits, dtype=np.uint8)
+    if len(bits) == 0 or bits.shape[1] == 0:
+        return bits[:min(len(bits), 1)], np.zeros(len(bits), dtype=np.int64)
+    _, first, inverse = np.unique(
+        bits.view(np.dtype((np.void, bits.shape[1]))).ravel(),
+        return_index=True,
+        return_inverse=True,
+    )
+    return bits[first], inverse.astype(np.int64).ravel()
+
+
+@register_extension_dtype
+class ProfileDtype(ExtensionDtype):
+    """
+    pandas extension dtype of Phylogenetic Profiles sharing one query.
+
+    Parameters
+    -------
+    query: iterable, default <None>
+        Species axis shared by all the profiles.
+    """
+    name = "profile"
+    type = Profile
+    kind = "O"
+    na_value = np.nan
+    _metadata = ("query",)
+
+    def __init__(self,
+                 query=None):
+        self.query = tuple(query) if query is not None else None
+
+    def __repr__(self):
+        return "ProfileDtype({} species)".format(
+            len(self.query) if self.query is not None else None,
+        )
+
+    @classmethod
+    def construct_array_type(cls):
+        """
+        Return array type associated with this dtype.
+        """
+        return ProfileArray
+
+    @classmethod
+    def construct_from_string(cls,
+                              string):
+        """
+        Return ProfileDtype from its name.
+        """
+        if not isinstance(string, str):
+            raise TypeError("'construct_from_string' expects a string, got {}".format(type(string)))
+        if string == cls.name:
+            return cls()
+        raise TypeError("Cannot construct a '{}' from '{}'".format(cls.__name__, string))
+
+
+class ProfileArray(ExtensionArray):
+    """
+    pandas extension array of Phylogenetic Profiles. Distinct profiles are
+    kept once, packed with numpy.packbits in one contiguous table, and each
+    element is a code pointing into the table, <-1> for a missing profile.
+    Taking, merging and concatenating copy only the codes.
+
+    Parameters
+    -------
+    table: numpy.ndarray
+        Distinct packed profiles of uint8 dtype, one per row.
+    codes: numpy.ndarray
+        Row of the table for each of the elements.
+    dtype: prwlr.profiles.ProfileDtype
+        Dtype holding the species axis.
+    """
+    def __init__(self,
+                 table,
+                 codes,
+                 dtype):
+        self._table = np.ascontiguousarray(table, dtype=np.uint8)
+        self._codes = np.asarray(codes, dtype=np.int64)
+        self._dtype = dtype
+        self._query = list(dtype.query)
+        self._positions = None
+
+    @classmethod
+    def from_profile_matrix(cls,
+                            matrix):
+        """
+        Return ProfileArray with profiles of prwlr.profiles.ProfileMatrix.
+        """
+        table, codes = _unique_rows(matrix.bits)
+        return cls(table, codes, ProfileDtype(matrix.query))
+
+    def to_profile_matrix(self,
+                          index=None):
+        """
+        Return prwlr.profiles.ProfileMatrix with the profiles.
+        """
+        if self.isna().any():
+            raise ProfileError("Missing profiles cannot be put into ProfileMatrix.")
+        return ProfileMatrix(self._table[self._codes], self._query, index=index)
+
+    @classmethod
+    def _from_sequence(cls,
+                       scalars,
+                       dtype=None,
+                       copy=False):
+        if isinstance(scalars, cls):
+            return scalars.copy() if copy else scalars
+        scalars = list(scalars)
+        present = [i for i in scalars if isinstance(i, Profile)]
+        if dtype is None or getattr(dtype, "query", None) is None:
+            query = present[0].query if present else []
+        else:
+            query = list(dtype.query)
+        if any(i.query != query for i in present):
+            raise ProfileError("Profiles must share the same query.")
+        array = np.zeros((len(present), len(query)), dtype=bool)
+        if present:
+            array[:] = [i.profile for i in present]
+        table, inverse = _unique_rows(np.packbits(array, axis=1))
+        codes = np.full(len(scalars), -1, dtype=np.int64)
+        codes[[isinstance(i, Profile) for i in scalars]] = inverse
+        return cls(table, codes, ProfileDtype(query))
+
+    @classmethod
+    def _from_factorized(cls,
+                         values,
+                         original):
+        return cls(original._table, values, original.dtype)
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def nbytes(self):
+        return self._table.nbytes + self._codes.nbytes
+
+    @property
+    def positions(self):
+        """
+        Map of the query elements to their positions, shared by the elements.
+        """
+        if self._positions is None:
+            self._positions = {k: v for v, k in enumerate(self._query)}
+        return self._positions
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self,
+                    item):
+        if isinstance(item, numbers.Integral):
+            code = self._codes[item]
+            if code == -1:
+                return self.dtype.na_value
+            return Profile.from_array(
+                None,
+                self._query,
+                positions=self.positions,
+                packed=self._table[code],
+            )
+        item = check_array_indexer(self, item)
+        return self.__class__(self._table, self._codes[item], self._dtype)
+
+    def __setitem__(self,
+                    key,
+                    value):
+        if isinstance(value, Profile) or pd.api.types.is_scalar(value):
+            value = [value]
+            key = check_array_indexer(self, key) if not isinstance(key, numbers.Integral) else [key]
+        value = self._from_sequence(value, dtype=self._dtype)
+        table, remaps = self._union_tables([self, value])
+        self._codes = _remap(self._codes, remaps[0])
+        self._table = table
+        self._codes[key] = _remap(value._codes, remaps[1])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __array__(self,
+                  dtype=None):
+        return np.array(list(self), dtype=object)
+
+    def __eq__(self,
+               other):
+        if isinstance(other, (pd.Series, pd.Index, pd.DataFrame)):
+            return NotImplemented
+        if isinstance(other, Profile):
+            other = self._from_sequence([other] * len(self), dtype=self._dtype)
+        elif not isinstance(other, ProfileArray):
+            return np.array([a == b for a, b in zip(self, other)], dtype=bool)
+        if len(other) != len(self):
+            raise ValueError("Lengths must match to compare")
+        if other._query != self._query:
+            return np.zeros(len(self), dtype=bool)
+        valid = (self._codes != -1) & (other._codes != -1)
+        if other._table is self._table:
+            return valid & (self._codes == other._codes)
+        equal = np.zeros(len(self), dtype=bool)
+        equal[valid] = (self._table[self._codes[valid]] == other._table[other._codes[valid]]).all(axis=1)
+        return equal
+
+    def __ne__(self,
+               other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return ~result
+
+    def isna(self):
+        return self._codes == -1
+
+    def copy(self):
+        return self.__class__(self._table, self._codes.copy(), self._dtype)
+
+    def take(self,
+             indices,
+             allow_fill=False,
+             fill_value=None):
+        if allow_fill and isinstance(fill_value, Profile):
+            array = self._concat_same_type([self, self._from_sequence([fill_value], dtype=self._dtype)])
+            codes = _take(array._codes[:-1], indices, allow_fill=True, fill_value=array._codes[-1])
+            return self.__class__(array._table, codes, self._dtype)
+        codes = _take(self._codes, indices, allow_fill=allow_fill, fill_value=-1)
+        return self.__class__(self._table, codes, self._dtype)
+
+    @staticmethod
+    def _union_tables(arrays):
+        """
+        Return one table with distinct profiles of all the arrays and, for
+        each of the arrays, mapping of its codes to the new table.
+        """
+        tables = [i._table for i in arrays]
+        if all(i is tables[0] for i in tables):
+            return tables[0], [np.arange(len(tables[0]), dtype=np.int64)] * len(tables)
+        offsets = np.cumsum([0] + [len(i) for i in tables])
+        table, inverse = _unique_rows(np.concatenate(tables))
+        return table, [inverse[offsets[i]:offsets[i + 1]] for i in range(len(tables))]
+
+    @classmethod
+    def _concat_same_type(cls,
+                          to_concat):
+        to_concat = list(to_concat)
+        table, remaps = cls._union_tables(to_concat)
+        codes = np.concatenate([_remap(i._codes, remap) for i, remap in zip(to_concat, remaps)])
+        return cls(table, codes, to_concat[0].dtype)
+
+    def _values_for_factorize(self):
+        return self._codes, -1
+
+    def _values_for_argsort(self):
+        """
+        Return ranks of the profiles, ordered like prwlr.profiles.Profile
+        objects, <-1> for a missing profile.
+        """
+        table = self._table
+        if len(table) == 0 or table.shape[1] == 0:
+            return _remap(self._codes, np.zeros(len(table), dtype=np.int64))
+        order = np.lexsort(table.T[::-1])
+        distinct = np.ones(len(order), dtype=bool)
+        distinct[1:] = (table[order[1:]] != table[order[:-1]]).any(axis=1)
+        ranks = np.empty(len(table), dtype=np.int64)
+        ranks[order] = np.cumsum(distinct) - 1
+        return _remap(self._codes, ranks)
+
+    def value_counts(self,
+                     dropna=True):
+        """
+        Return pandas.Series of the numbers of each of the distinct profiles,
+        indexed by the profiles.
+
+        Parameters
+        -------
+        dropna: bool, default <True>
+            Leave out the number of missing profiles.
+
+        Returns
+        -------
+        pandas.Series
+        """
+        counts = np.bincount(self._codes[self._codes != -1], minlength=len(self._table))
+        codes = np.flatnonzero(counts)
+        counts = counts[codes]
+        missing = int(self.isna().sum())
+        if not dropna and missing:
+            codes = np.append(codes, -1)
+            counts = np.append(counts, missing)
+        return pd.Series(counts, index=pd.Index(self.__class__(self._table, codes, self._dtype)))
+
+    def _formatter(self,
+                   boxed=False):
+        return lambda x: x.to_string() if isinstance(x, Profile) else str(x)
+
+
+def profiles_to_arrays(profiles,
+                       key):
+    """
+    Return dict of numpy.ndarray and JSON serializable description of
+    Phylogenetic Profiles, for the binary format of prwlr.core.save_network_binary.
+    Distinct profiles are packed once into one block, zero-padded to the
+    longest query, and each element is a code pointing into the block, <-1>
+    for a missing profile. Species axes are kept in the description. Elements
+    of a reference missing from its query are kept as codes into a vocabulary,
+    so the round trip is lossless.
+
+    Parameters
+    -------
+    profiles: pandas.Series, numpy.ndarray, prwlr.profiles.ProfileArray
+        Profiles to store. ProfileArray is stored as it is.
+    key: str
+        Prefix of the arrays names.
+
+    Returns
+    -------
+    tuple of dict and dict
+        Arrays and the description.
+    """
+    values = profiles.values if isinstance(profiles, pd.Series) else profiles
+    if isinstance(values, ProfileArray):
+        return {
+            "{}.bits".format(key): values._table,
+            "{}.codes".format(key): values._codes,
+        }, {"key": key, "kind": "array", "queries": [values._query]}
+    distinct = {}
+    codes = np.full(len(values), -1, dtype=np.int64)
+    for i, profile in enumerate(values):
+        if isinstance(profile, Profile):
+            codes[i] = distinct.setdefault(id(profile), (len(distinct), profile))[0]
+    distinct = [i[1] for i in sorted(distinct.values(), key=lambda x: x[0])]
+    queries = {}
+    vocabulary = {}
+    query_codes = np.empty(len(distinct), dtype=np.int64)
+    extra_codes = []
+    extra_offsets = [0]
+    for i, profile in enumerate(distinct):
+        query = tuple(profile.query)
+        query_codes[i] = queries.setdefault(query, len(queries))
+        extra_codes.extend(
+            vocabulary.setdefault(j, len(vocabulary))
+            for j in profile.reference if j not in profile.positions
+        )
+        extra_offsets.append(len(extra_codes))
+    length = max([len(i) for i in queries] or [0])
+    array = np.zeros((len(distinct), length), dtype=bool)
+    for i, profile in enumerate(distinct):
+        array[i, :len(profile.profile)] = profile.profile
+    return {
+        "{}.bits".format(key): np.packbits(array, axis=1),
+        "{}.codes".format(key): codes,
+        "{}.query_codes".format(key): query_codes,
+        "{}.extra_codes".format(key): np.array(extra_codes, dtype=np.int64),
+        "{}.extra_offsets".format(key): np.array(extra_offsets, dtype=np.int64),
+    }, {
+        "key": key,
+        "kind": "objects",
+        "queries": [list(i) for i in sorted(queries, key=queries.get)],
+        "vocabulary": sorted(vocabulary, key=vocabulary.get),
+    }
+
+
+def profiles_from_arrays(arrays,
+                         meta):
+    """
+    Return Phylogenetic Profiles from arrays and the description returned by
+    prwlr.profiles.profiles_to_arrays. ProfileArray is returned as stored,
+    with the block and codes memory-mapped if the arrays are. Otherwise
+    each distinct profile becomes one prwlr.profiles.Profile object shared
+    by all the elements pointing to it.
+
+    Parameters
+    -------
+    arrays: dict
+        Arrays by name.
+    meta: dict
+        Description of the profiles.
+
+    Returns
+    -------
+    prwlr.profiles.ProfileArray or numpy.ndarray of object dtype
+    """
+    key = meta["key"]
+    bits = arrays["{}.bits".format(key)]
+    codes = arrays["{}.codes".format(key)]
+    if meta["kind"] == "array":
+        return ProfileArray(bits, codes, ProfileDtype(meta["queries"][0]))
+    queries = [list(i) for i in meta["queries"]]
+    positions = [{k: v for v, k in enumerate(i)} for i in queries]
+    vocabulary = np.empty(len(meta["vocabulary"]), dtype=object)
+    vocabulary[:] = meta["vocabulary"]
+    query_codes = arrays["{}.query_codes".format(key)]
+    extra_codes = arrays["{}.extra_codes".format(key)]
+    extra_offsets = arrays["{}.extra_offsets".format(key)]
+    array = np.unpackbits(np.asarray(bits), axis=1).astype(bool)
+    distinct = np.empty(len(array), dtype=object)
+    for i in range(len(array)):
+        query = queries[query_codes[i]]
+        profile = Profile.from_array(
+            array[i, :len(query)],
+            query,
+            positions=positions[query_codes[i]],
+        )
+        profile.reference.update(vocabulary[extra_codes[extra_offsets[i]:extra_offsets[i + 1]]])
+        distinct[i] = profile
+    values = np.empty(len(codes), dtype=object)
+    values[:] = np.nan
+    valid = np.asarray(codes) != -1
+    values[valid] = distinct[codes[valid]]
+    return values
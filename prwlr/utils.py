@@ -2,7 +2,15 @@
 
 
 from __future__ import print_function
+import hashlib
+import json
 import math
+import os
+import numpy as np
+import pandas as pd
+
+
+COLUMNS_FORMAT_VERSION = 1
 
 
 def isiniterable(query_iterable,
@@ -102,3 +110,301 @@ def all_possible_combinations_counter(subset_size,
     """
     f = math.factorial
     return f(set_size) / f(subset_size) / f(set_size - subset_size)
+
+
+def _categories_array(categories):
+    """
+    Return categories as numpy.ndarray of unicode dtype if all of them are
+    str, which loads without pickle, or of object dtype otherwise.
+    """
+    categories = list(categories)
+    if all(isinstance(i, str) for i in categories):
+        return np.array(categories, dtype=str if categories else "<U1")
+    array = np.empty(len(categories), dtype=object)
+    array[:] = categories
+    return array
+
+
+def series_to_arrays(series,
+                     key):
+    """
+    Return dict of numpy.ndarray and JSON serializable description of
+    pandas.Series or pandas.Index. Numeric, boolean and datetime values are
+    stored as they are. Categorical and object values are stored as integer
+    codes, <-1> for missing values, and the categories.
+
+    Parameters
+    -------
+    series: pandas.Series, pandas.Index
+        Values to store.
+    key: str
+        Prefix of the arrays names.
+
+    Returns
+    -------
+    tuple of dict and dict
+        Arrays and the description.
+    """
+    meta = {
+        "name": series.name.item() if isinstance(series.name, np.generic) else series.name,
+        "key": key,
+        "dtype": str(series.dtype),
+    }
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = pd.Categorical(series)
+        meta["kind"] = "categorical"
+        meta["ordered"] = bool(values.ordered)
+        return {
+            "{}.codes".format(key): np.asarray(values.codes),
+            "{}.categories".format(key): _categories_array(values.categories),
+        }, meta
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufcmM":
+        meta["kind"] = "values"
+        return {key: np.asarray(series)}, meta
+    codes, categories = pd.factorize(np.asarray(series, dtype=object))
+    meta["kind"] = "object"
+    return {
+        "{}.codes".format(key): codes.astype(np.int64),
+        "{}.categories".format(key): _categories_array(categories),
+    }, meta
+
+
+def series_from_arrays(arrays,
+                       meta):
+    """
+    Return pandas.Series from arrays and the description returned by
+    prwlr.utils.series_to_arrays. Stored values are not copied, so
+    memory-mapped arrays stay memory-mapped.
+
+    Parameters
+    -------
+    arrays: dict
+        Arrays by name.
+    meta: dict
+        Description of the series.
+
+    Returns
+    -------
+    pandas.Series
+    """
+    key = meta["key"]
+    if meta["kind"] == "values":
+        return pd.Series(arrays[key], name=meta["name"], copy=False)
+    codes = arrays["{}.codes".format(key)]
+    categories = arrays["{}.categories".format(key)]
+    if meta["kind"] == "categorical":
+        return pd.Series(
+            pd.Categorical.from_codes(codes, categories, ordered=meta["ordered"]),
+            name=meta["name"],
+        )
+    values = np.empty(len(codes), dtype=object)
+    values[:] = np.nan
+    valid = np.asarray(codes) != -1
+    values[valid] = np.asarray(categories, dtype=object)[codes[valid]]
+    series = pd.Series(values, name=meta["name"], copy=False)
+    if meta["dtype"] != "object":
+        series = series.astype(meta["dtype"])
+    return series
+
+
+def frame_to_arrays(dataframe):
+    """
+    Return dict of numpy.ndarray and JSON serializable description of
+    pandas.DataFrame, one or two arrays per column, see
+    prwlr.utils.series_to_arrays.
+
+    Parameters
+    -------
+    dataframe: pandas.DataFrame
+        Data to store.
+
+    Returns
+    -------
+    tuple of dict and dict
+        Arrays and the description.
+    """
+    arrays = {}
+    columns = []
+    for i, name in enumerate(dataframe.columns.tolist()):
+        column_arrays, column_meta = series_to_arrays(
+            dataframe.iloc[:, i],
+            "c{}".format(i),
+        )
+        column_meta["name"] = name
+        arrays.update(column_arrays)
+        columns.append(column_meta)
+    if isinstance(dataframe.index, pd.RangeIndex):
+        index = {
+            "kind": "range",
+            "name": dataframe.index.name,
+            "start": int(dataframe.index.start),
+            "stop": int(dataframe.index.stop),
+            "step": int(dataframe.index.step),
+        }
+    elif isinstance(dataframe.index, pd.MultiIndex):
+        raise ValueError("MultiIndex cannot be stored.")
+    else:
+        index_arrays, index = series_to_arrays(dataframe.index, "index")
+        arrays.update(index_arrays)
+    return arrays, {"columns": columns, "index": index}
+
+
+def frame_from_arrays(arrays,
+                      meta):
+    """
+    Return pandas.DataFrame from arrays and the description returned by
+    prwlr.utils.frame_to_arrays.
+
+    Parameters
+    -------
+    arrays: dict
+        Arrays by name.
+    meta: dict
+        Description of the dataframe.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if meta["index"]["kind"] == "range":
+        index = pd.RangeIndex(
+            meta["index"]["start"],
+            meta["index"]["stop"],
+            meta["index"]["step"],
+            name=meta["index"]["name"],
+        )
+    else:
+        index = pd.Index(series_from_arrays(arrays, meta["index"]), name=meta["index"]["name"])
+    columns = [series_from_arrays(arrays, i) for i in meta["columns"]]
+    if not columns:
+        return pd.DataFrame(index=index)
+    dataframe = pd.concat(columns, axis=1, copy=False)
+    dataframe.columns = [i["name"] for i in meta["columns"]]
+    dataframe.index = index
+    return dataframe
+
+
+def save_arrays(dirname,
+                arrays,
+                meta):
+    """
+    Write arrays to a directory, one .npy file per array, and their
+    description to meta.json in the same directory. Arrays are never
+    pickled.
+
+    Parameters
+    -------
+    dirname: str, path
+        Directory name. Created if it does not exist.
+    arrays: dict
+        Arrays by name. Names are used as the files names.
+    meta: dict
+        JSON serializable description.
+
+    Raises
+    -------
+    ValueError
+        If any of the arrays is of object dtype.
+    """
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    for name, array in arrays.items():
+        np.save(os.path.join(dirname, "{}.npy".format(name)), array, allow_pickle=False)
+    meta = dict(meta)
+    meta["version"] = COLUMNS_FORMAT_VERSION
+    meta["arrays"] = sorted(arrays)
+    with open(os.path.join(dirname, "meta.json"), "w") as fout:
+        json.dump(meta, fout)
+
+
+def read_arrays(dirname,
+                mmap_mode="r"):
+    """
+    Return arrays and their description written by prwlr.utils.save_arrays.
+    Arrays are memory-mapped and never unpickled, an array of object dtype
+    raises ValueError.
+
+    Parameters
+    -------
+    dirname: str, path
+        Directory name.
+    mmap_mode: str, default <"r">
+        Passed to numpy.load. Arrays are read into memory if <None>.
+
+    Returns
+    -------
+    tuple of dict and dict
+        Arrays and the description.
+    """
+    with open(os.path.join(dirname, "meta.json")) as fin:
+        meta = json.load(fin)
+    if meta.get("version") != COLUMNS_FORMAT_VERSION:
+        raise ValueError("Unsupported format version: {}".format(meta.get("version")))
+    arrays = {}
+    for name in meta["arrays"]:
+        arrays[name] = np.load(
+            os.path.join(dirname, "{}.npy".format(name)),
+            mmap_mode=mmap_mode,
+            allow_pickle=False,
+        )
+    return arrays, meta
+
+
+def index_positions(keys,
+                    values):
+    """
+    Return position of each of the values in the unique keys, <-1> if
+    missing. Categorical values are looked up by their categories only and
+    the positions are taken with their codes, so each distinct value is
+    hashed once.
+
+    Parameters
+    -------
+    keys: pandas.Index, array-like
+        Unique keys to look up in.
+    values: pandas.Series, pandas.Categorical, array-like
+        Values to look up.
+
+    Returns
+    -------
+    numpy.ndarray of int64
+    """
+    if not isinstance(keys, pd.Index) or isinstance(keys, pd.CategoricalIndex):
+        keys = pd.Index(np.asarray(keys, dtype=object))
+    array = values.array if isinstance(values, pd.Series) else values
+    if isinstance(array, pd.Categorical):
+        lookup = np.append(keys.get_indexer(array.categories), -1).astype(np.int64)
+        return lookup[array.codes]
+    return keys.get_indexer(np.asarray(array, dtype=object)).astype(np.int64)
+
+
+def file_fingerprint(filename,
+                     sample=2 ** 20):
+    """
+    Return JSON serializable fingerprint of a file: its size, modification
+    time and sha256 of its first and last sample bytes. Cheap to calculate
+    for big files, changes when the file is modified.
+
+    Parameters
+    -------
+    filename: str, path
+        File name.
+    sample: int
+        Number of bytes hashed from the beginning and from the end.
+
+    Returns
+    -------
+    dict
+    """
+    stat = os.stat(filename)
+    digest = hashlib.sha256()
+    with open(filename, "rb") as fin:
+        digest.update(fin.read(sample))
+        if stat.st_size > sample:
+            fin.seek(max(stat.st_size - sample, sample))
+            digest.update(fin.read(sample))
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "sha256": digest.hexdigest(),
+    }
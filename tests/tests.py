@@ -2,12 +2,21 @@
 
 
 import unittest
+from unittest import mock
 import requests as rq
 from prwlr import *
 import pandas as pd
 import numpy as np
 import pickle
+import asyncio
 import os
+import shutil
+import tempfile
+import threading
+import time
+import random
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 
 def isUp(url):
     """
@@ -84,6 +93,92 @@ class UtilsTests(unittest.TestCase):
                                            self.characters_to_remove))
 
 
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves responses by path for the stub server. Answers <503> for the number
+    of the path failures, with Retry-After header if retry_after is set, and
+    <404> for unknown paths. Entries joined with <+> get the responses of
+    the entries joined. Each response is delayed by random time up to delay
+    seconds.
+    """
+    responses = {}
+    failures = {}
+    requested = []
+    delay = 0
+    retry_after = None
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        time.sleep(random.random() * self.delay)
+        if self.failures.get(self.path, 0) > 0:
+            self.failures[self.path] -= 1
+            status, body = 503, b""
+        elif self.path in self.responses:
+            status, body = 200, self.responses[self.path]
+        elif "+" in self.path:
+            prefix, entries = self.path.rsplit("/", 1)
+            body = b"".join(self.responses.get("{}/{}".format(prefix, i), b"")
+                            for i in entries.split("+"))
+            status = 200 if body else 404
+        else:
+            status, body = 404, b""
+        self.send_response(status)
+        if status == 503 and self.retry_after is not None:
+            self.send_header("Retry-After", self.retry_after)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def runCoroutine(coroutine):
+    """
+    Returns result of the coroutine run in a new event loop, the same as
+    asyncio.run of Python 3.7.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP server handling each request in a thread.
+    """
+    daemon_threads = True
+    request_queue_size = 64
+
+
+def stubServer(responses, failures=None):
+    """
+    Returns local HTTP server serving responses in a thread.
+
+    Parameters
+    -------
+    responses: dict of str, bytes
+        Content of the response by path.
+    failures: dict of str, int
+        Number of <503> answers before the response by path.
+
+    Returns
+    -------
+        StubServer
+    """
+    handler = type("Handler", (StubHandler,), {
+        "responses": responses,
+        "failures": dict(failures or {}),
+        "requested": [],
+    })
+    server = StubServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
 class ApisTests(unittest.TestCase,
                 apis.Columns):
     """
@@ -178,6 +273,48 @@ class ApisTests(unittest.TestCase,
         for org_name, org_id in zip(self.orgs_names, self.orgs_ids):
             self.assertEqual(self.kegg_api.org_name_2_kegg_id(org_name), org_id)
 
+    def test_org_names_2_kegg_ids(self):
+        """
+        Test if apis.org_names_2_kegg_ids returns the same organisms IDs as
+        apis.org_name_2_kegg_id for each of the biological names.
+        """
+        self.assertEqual(
+            self.kegg_api.org_names_2_kegg_ids(self.orgs_names + self.orgs_names[:2]),
+            [self.kegg_api.org_name_2_kegg_id(i) for i in self.orgs_names + self.orgs_names[:2]],
+        )
+        self.assertEqual(self.kegg_api.org_names_2_kegg_ids(self.orgs_names)[:-1], self.orgs_ids)
+
+    def test_organism_index(self):
+        """
+        Test if apis.OrganismIndex lookups give the same positions as
+        pandas.Series.str methods and the index is shared by the KEGG_API
+        with the same table.
+        """
+        index = self.kegg_api.organism_index
+        descriptions = self.kegg_api.organisms_ids_df[self.DESCRIPTION].reset_index(drop=True)
+        for name in self.orgs_names + ["coli", "Synechocystis sp.", "sp. PCC", " ", "", "S", "\n"]:
+            np.testing.assert_array_equal(index.contains(name),
+                                          np.flatnonzero(descriptions.str.contains(name).values))
+        names = self.orgs_names + ["coli", "Escherichia coli K-12", " coli", "coli ", "a c", " ", "", "S", "\n"]
+        positions = index.resolve(names)
+        for name in names:
+            np.testing.assert_array_equal(positions[name], index.contains(name))
+        kegg_api = apis.KEGG_API()
+        kegg_api.get_organisms_ids("test_data/ApisTests/test_orgs_ids_in.csv",
+                                   skip_dwnld=True)
+        self.assertIs(kegg_api.organism_index, index)
+        maxsize = apis._ORGANISMS_MAXSIZE
+        apis._ORGANISMS_MAXSIZE = 0
+        try:
+            kegg_api.get_organisms_ids("test_data/ApisTests/test_orgs_ids_in.csv",
+                                       skip_dwnld=True)
+            self.assertEqual(len(apis._ORGANISMS), 0)
+            self.assertIsNot(kegg_api.organism_index, index)
+            self.assertIs(kegg_api.organism_index, kegg_api.organism_index)
+            np.testing.assert_array_equal(kegg_api.organism_index.contains("coli"), index.contains("coli"))
+        finally:
+            apis._ORGANISMS_MAXSIZE = maxsize
+
     def test_get_org_db_X_ref_drop_all_duplicates(self):
         """
         Test if apis.get_org_db_X_ref returns correct KEGG database
@@ -245,6 +382,372 @@ class ApisTests(unittest.TestCase,
 
 
 
+class KEGGClientTests(unittest.TestCase,
+                      apis.Columns):
+    """
+    Tests for prwlr.apis.KEGGClient against the stub server.
+    """
+    def setUp(self):
+        """
+        Sets up class level attributes for the tests.
+        """
+        self.IDs = "test_data/ApisTests/test_orgs_ids_in.csv"
+        self.X_ref = "test_data/ApisTests/test_orgs_db_X_ref.csv"
+        self.KOs = "test_data/ApisTests/test_KOs_db_X_ref.csv"
+        self.test_IDs = "test_data/ApisTests/test_stub_orgs_ids.csv"
+        self.test_X_ref = "test_data/ApisTests/test_stub_orgs_db_X_ref.csv"
+        self.test_KOs = "test_data/ApisTests/test_stub_KOs_db_X_ref.csv"
+        self.test_entries = "test_data/ApisTests/test_stub_entries.txt"
+        self.test_manifest = "{}{}".format(self.test_KOs, self.MANIFEST_SUF)
+        self.test_cache_dirname = "test_data/ApisTests/test_stub_cache"
+        with open(self.IDs, "rb") as fin:
+            responses = {"/list/genome": fin.read()}
+        with open(self.X_ref, "rb") as fin:
+            responses["/link/ko/sce"] = fin.read()
+        with open(self.KOs, "rb") as fin:
+            for line in fin:
+                path = "/link/genes/{}".format(line.split(b"\t")[0][3:].decode())
+                responses[path] = responses.get(path, b"") + line
+        self.server = stubServer(responses, failures={"/list/genome": 2})
+        self.client = apis.KEGGClient(rate=1000, burst=1000, backoff_factor=0)
+        self.kegg_api = apis.KEGG_API(client=self.client)
+        self.kegg_api.home = "http://127.0.0.1:{}".format(self.server.server_port)
+
+    def tearDown(self):
+        """
+        Stops the stub server and removes files created during the tests.
+        """
+        self.server.shutdown()
+        self.server.server_close()
+        for i in (self.test_IDs, self.test_X_ref, self.test_KOs, self.test_entries,
+                  self.test_manifest):
+            if os.path.exists(i):
+                os.remove(i)
+        if os.path.exists(self.test_cache_dirname):
+            shutil.rmtree(self.test_cache_dirname)
+
+    def test_download(self):
+        """
+        Test if KEGG_API methods download the same data through the client as
+        read from the files.
+        """
+        ref_kegg_api = apis.KEGG_API()
+        ref_kegg_api.get_organisms_ids(self.IDs, skip_dwnld=True)
+        ref_kegg_api.get_org_db_X_ref(organism="Saccharomyces cerevisiae",
+                                      target_db="orthology",
+                                      out_file_name=self.X_ref,
+                                      skip_dwnld=True)
+        ref_kegg_api.get_KOs_db_X_ref(filename=self.KOs, skip_dwnld=True)
+        self.kegg_api.get_organisms_ids(self.test_IDs)
+        self.kegg_api.get_org_db_X_ref(organism="Saccharomyces cerevisiae",
+                                       target_db="orthology",
+                                       out_file_name=self.test_X_ref)
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, threads=2)
+        pd.testing.assert_frame_equal(ref_kegg_api.organisms_ids_df,
+                                      self.kegg_api.organisms_ids_df)
+        pd.testing.assert_frame_equal(ref_kegg_api.org_db_X_ref_df,
+                                      self.kegg_api.org_db_X_ref_df)
+        pd.testing.assert_frame_equal(
+            ref_kegg_api.KOs_db_X_ref_df[
+                ref_kegg_api.KOs_db_X_ref_df[self.KEGG_ID].isin(ref_kegg_api.org_db_X_ref_df[self.KEGG_ID])
+            ].reset_index(drop=True),
+            self.kegg_api.KOs_db_X_ref_df,
+        )
+
+    def test_batches(self):
+        """
+        Test if KEGG_API.get_KOs_db_X_ref and KEGG_API.get_db_entries join
+        entries in batches and split the responses per entry.
+        """
+        self.kegg_api.get_organisms_ids(self.IDs, skip_dwnld=True)
+        self.kegg_api.get_org_db_X_ref(organism="Saccharomyces cerevisiae",
+                                       target_db="orthology",
+                                       out_file_name=self.X_ref,
+                                       skip_dwnld=True)
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=1)
+        ref_KOs_db_X_ref_df = self.kegg_api.KOs_db_X_ref_df
+        with open(self.test_KOs, "rb") as fin:
+            ref_KOs = fin.read()
+        os.remove(self.test_KOs)
+        del self.server.RequestHandlerClass.requested[:]
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=4)
+        with open(self.test_KOs, "rb") as fin:
+            self.assertEqual(fin.read(), ref_KOs)
+        pd.testing.assert_frame_equal(ref_KOs_db_X_ref_df, self.kegg_api.KOs_db_X_ref_df)
+        self.assertEqual(len(self.server.RequestHandlerClass.requested), 3)
+        KOs = self.kegg_api.org_db_X_ref_df[self.KEGG_ID].tolist()
+        self.server.RequestHandlerClass.responses.update({
+            "/get/{}".format(i): "ENTRY       {}                      KO\nNAME        name\n///\n".format(i).encode()
+            for i in KOs
+        })
+        self.kegg_api.get_db_entries(self.test_entries, batch_size=4)
+        with open(self.test_entries, "rb") as fin:
+            self.assertEqual(
+                fin.read(),
+                b"".join(self.server.RequestHandlerClass.responses["/get/{}".format(i)] for i in KOs),
+            )
+
+    def test_batches_prefixed(self):
+        """
+        Test if KEGG_API.get_KOs_db_X_ref and KEGG_API.get_db_entries split
+        the responses per entry for the entries with the database prefix.
+        """
+        self.kegg_api.get_organisms_ids(self.IDs, skip_dwnld=True)
+        self.kegg_api.get_org_db_X_ref(organism="Saccharomyces cerevisiae",
+                                       target_db="orthology",
+                                       out_file_name=self.X_ref,
+                                       skip_dwnld=True)
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=4)
+        with open(self.test_KOs, "rb") as fin:
+            ref_KOs = fin.read()
+        os.remove(self.test_KOs)
+        KOs = self.kegg_api.org_db_X_ref_df[self.KEGG_ID].tolist()
+        responses = self.server.RequestHandlerClass.responses
+        responses.update({
+            "/link/genes/ko:{}".format(i): responses.get("/link/genes/{}".format(i), b"")
+            for i in KOs
+        })
+        responses.update({
+            "/get/ko:{}".format(i): "ENTRY       {}                      KO\nNAME        name\n///\n".format(i).encode()
+            for i in KOs
+        })
+        with open(self.X_ref) as fin, open(self.test_X_ref, "w") as fout:
+            fout.writelines("sce:{}\tko:{}".format(*i.split("\t")) for i in fin)
+        self.kegg_api.get_org_db_X_ref(organism="Saccharomyces cerevisiae",
+                                       target_db="orthology",
+                                       out_file_name=self.test_X_ref,
+                                       skip_dwnld=True,
+                                       strip_prefix=False)
+        self.assertTrue(self.kegg_api.org_db_X_ref_df[self.KEGG_ID].str.startswith("ko:").all())
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=4)
+        with open(self.test_KOs, "rb") as fin:
+            self.assertEqual(fin.read(), ref_KOs)
+        self.kegg_api.get_db_entries(self.test_entries, batch_size=4)
+        with open(self.test_entries, "rb") as fin:
+            self.assertEqual(
+                fin.read(),
+                b"".join(responses["/get/ko:{}".format(i)] for i in KOs),
+            )
+
+    def test_aget_KOs_db_X_ref(self):
+        """
+        Test if KEGG_API.aget_KOs_db_X_ref downloads the same file as
+        KEGG_API.get_KOs_db_X_ref.
+        """
+        self.kegg_api.get_organisms_ids(self.IDs, skip_dwnld=True)
+        self.kegg_api.get_org_db_X_ref(organism="Saccharomyces cerevisiae",
+                                       target_db="orthology",
+                                       out_file_name=self.X_ref,
+                                       skip_dwnld=True)
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=3)
+        ref_KOs_db_X_ref_df = self.kegg_api.KOs_db_X_ref_df
+        with open(self.test_KOs, "rb") as fin:
+            ref_KOs = fin.read()
+        os.remove(self.test_KOs)
+        runCoroutine(self.kegg_api.aget_KOs_db_X_ref(filename=self.test_KOs,
+                                                     concurrency=3,
+                                                     batch_size=3))
+        with open(self.test_KOs, "rb") as fin:
+            self.assertEqual(fin.read(), ref_KOs)
+        pd.testing.assert_frame_equal(ref_KOs_db_X_ref_df, self.kegg_api.KOs_db_X_ref_df)
+
+    def test_aparse_organism_info(self):
+        """
+        Test if databases.KEGG.aparse_organism_info gives the same organism
+        info as databases.KEGG.parse_organism_info.
+        """
+        kegg_dbs = [databases.KEGG("Orthology"), databases.KEGG("Orthology")]
+        for kegg_db in kegg_dbs:
+            kegg_db._api = self.kegg_api
+        kwargs = {
+            "organism": "Saccharomyces cerevisiae",
+            "reference_species": ["Haemophilus influenzae",
+                                  "Saccharomyces cerevisiae",
+                                  "Escherichia coli"],
+            "IDs": self.IDs,
+            "X_ref": self.X_ref,
+        }
+        kegg_dbs[0].parse_organism_info(threads=1, **kwargs)
+        runCoroutine(kegg_dbs[1].aparse_organism_info(concurrency=2, **kwargs))
+        pd.testing.assert_frame_equal(kegg_dbs[0].organism_info, kegg_dbs[1].organism_info)
+        self.assertEqual(kegg_dbs[0].name_ID, kegg_dbs[1].name_ID)
+
+    def test_threads_order(self):
+        """
+        Test if KEGG_API.get_KOs_db_X_ref downloads with many threads the same
+        file as with one thread, whatever order the responses come in.
+        """
+        self.kegg_api.get_organisms_ids(self.IDs, skip_dwnld=True)
+        self.kegg_api.get_org_db_X_ref(organism="Saccharomyces cerevisiae",
+                                       target_db="orthology",
+                                       out_file_name=self.X_ref,
+                                       skip_dwnld=True)
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=1)
+        with open(self.test_KOs, "rb") as fin:
+            ref_KOs = fin.read()
+        self.server.RequestHandlerClass.delay = 0.05
+        for _ in range(3):
+            os.remove(self.test_KOs)
+            self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=1, threads=5)
+            with open(self.test_KOs, "rb") as fin:
+                self.assertEqual(fin.read(), ref_KOs)
+
+    def test_resume(self):
+        """
+        Test if KEGG_API.get_KOs_db_X_ref with resume downloads only the KEGG
+        Orthology Groups missing from the manifest of interrupted download and
+        gives the same file.
+        """
+        self.kegg_api.get_organisms_ids(self.IDs, skip_dwnld=True)
+        self.kegg_api.get_org_db_X_ref(organism="Saccharomyces cerevisiae",
+                                       target_db="orthology",
+                                       out_file_name=self.X_ref,
+                                       skip_dwnld=True)
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=4)
+        with open(self.test_KOs, "rb") as fin:
+            ref_KOs = fin.read()
+        os.remove(self.test_KOs)
+        KOs = self.kegg_api.org_db_X_ref_df[self.KEGG_ID].tolist()
+        failing = "/link/genes/{}".format("+".join(KOs[8:]))
+        self.server.RequestHandlerClass.failures[failing] = self.client.retries + 1
+        with self.assertRaises(rq.HTTPError):
+            self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=4, resume=True)
+        with open(self.test_KOs, "ab") as fout:
+            fout.write(b"ko:K0")
+        with open(self.test_manifest, "a") as fout:
+            fout.write("K0")
+        del self.server.RequestHandlerClass.requested[:]
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=4, resume=True)
+        self.assertEqual(self.server.RequestHandlerClass.requested, [failing])
+        with open(self.test_KOs, "rb") as fin:
+            self.assertEqual(fin.read(), ref_KOs)
+        self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=4, resume=True)
+        self.assertEqual(self.server.RequestHandlerClass.requested, [failing])
+        with open(self.test_manifest, "a") as fout:
+            fout.write("K00000\t0\n")
+        with self.assertRaises(errors.ParserError):
+            self.kegg_api.get_KOs_db_X_ref(filename=self.test_KOs, batch_size=4, resume=True)
+
+    def test_cache(self):
+        """
+        Test if KEGGClient with ResponseCache requests each URL once and
+        again after ttl.
+        """
+        self.client.cache = apis.ResponseCache(self.test_cache_dirname)
+        url = "{}/list/genome".format(self.kegg_api.home)
+        content = self.client.get(url)
+        self.assertEqual(self.client.get(url), content)
+        self.assertEqual(apis.KEGGClient(cache=apis.ResponseCache(self.test_cache_dirname)).get(url),
+                         content)
+        self.assertEqual(self.client.get("{}/get/K00000".format(self.kegg_api.home)), b"")
+        self.assertEqual(self.client.get("{}/get/K00000".format(self.kegg_api.home)), b"")
+        self.assertEqual(self.server.RequestHandlerClass.requested,
+                         ["/list/genome"] * 3 + ["/get/K00000"])
+        self.client.cache.ttl = 0
+        time.sleep(0.01)
+        self.assertEqual(self.client.get(url), content)
+        self.assertEqual(len(self.server.RequestHandlerClass.requested), 5)
+        self.assertFalse([i for _, _, filenames in os.walk(self.test_cache_dirname)
+                          for i in filenames if i.startswith(".tmp")])
+
+    def test_cache_eviction(self):
+        """
+        Test if ResponseCache removes the least recently used content over
+        max_size.
+        """
+        cache = apis.ResponseCache(self.test_cache_dirname, max_size=25)
+        for i in range(3):
+            cache.set(str(i), "{}".format(i).encode() * 10)
+            time.sleep(0.01)
+        self.assertIsNone(cache.get("0"))
+        self.assertEqual(cache.get("2"), b"2" * 10)
+        self.assertEqual(cache.get("1"), b"1" * 10)
+        time.sleep(0.01)
+        self.assertEqual(cache.get("2"), b"2" * 10)
+        cache.set("3", b"3" * 10)
+        self.assertIsNone(cache.get("1"))
+        self.assertEqual(cache.get("2"), b"2" * 10)
+        for i in range(5):
+            cache.set("3", b"3" * 5)
+        self.assertEqual(cache._size, sum(i[1] for i in cache._entries()))
+        cache.max_size = 45
+        for i in range(4, 8):
+            cache.set(str(i), "{}".format(i).encode() * 10)
+        self.assertEqual(cache._size, 30)
+        self.assertEqual(cache._size, sum(i[1] for i in cache._entries()))
+        self.assertEqual([cache.get(str(i)) for i in (2, 3, 4)], [None, None, None])
+
+    def test_retry(self):
+        """
+        Test if KEGGClient.get retries on server errors and returns empty
+        content for not found.
+        """
+        content = self.client.get("{}/list/genome".format(self.kegg_api.home))
+        self.assertEqual(content[:9], b"gn:T00001")
+        self.assertEqual(self.server.RequestHandlerClass.requested,
+                         ["/list/genome"] * 3)
+        self.assertEqual(self.client.get("{}/get/K00000".format(self.kegg_api.home)), b"")
+
+    def test_retry_rate_limit(self):
+        """
+        Test if KEGGClient.get waits for the rate limit before each retry and
+        for Retry-After of the server.
+        """
+        url = "{}/list/genome".format(self.kegg_api.home)
+        client = apis.KEGGClient(rate=10, burst=1, backoff_factor=0)
+        start = time.monotonic()
+        client.get(url)
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+        self.server.RequestHandlerClass.failures["/list/genome"] = 1
+        self.server.RequestHandlerClass.retry_after = "0.5"
+        start = time.monotonic()
+        self.client.get(url)
+        self.assertGreaterEqual(time.monotonic() - start, 0.5)
+        self.assertEqual(self.server.RequestHandlerClass.requested,
+                         ["/list/genome"] * 5)
+
+    def test_rate_limiter(self):
+        """
+        Test if RateLimiter spaces the requests over the burst.
+        """
+        limiter = apis.RateLimiter(rate=50, burst=2)
+        start = time.monotonic()
+        for _ in range(7):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_aget_concurrency(self):
+        """
+        Test if KEGGClient.aget runs more requests at once than the default
+        executor has threads, waiting for the rate limit in the event loop.
+        """
+        self.server.RequestHandlerClass.responses.update({
+            "/get/K{:05d}".format(i): b"content" for i in range(40)
+        })
+        self.server.RequestHandlerClass.delay = 0.5
+        executor = apis.ThreadPoolExecutor(max_workers=40)
+
+        async def f():
+            return await asyncio.gather(*[
+                self.client.aget("{}/get/K{:05d}".format(self.kegg_api.home, i), executor)
+                for i in range(40)
+            ])
+        start = time.monotonic()
+        try:
+            self.assertEqual(runCoroutine(f()), [b"content"] * 40)
+        finally:
+            executor.shutdown()
+        self.assertLess(time.monotonic() - start, 1.5)
+        limiter = apis.RateLimiter(rate=50, burst=2)
+        start = time.monotonic()
+
+        async def g():
+            await asyncio.gather(*[limiter.aacquire() for _ in range(7)])
+        runCoroutine(g())
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+
 # @unittest.skipUnless(
 #     all(
 #         isUp(address)
@@ -355,6 +858,12 @@ class DatabasesTests(unittest.TestCase):
             sep="\t",
             index_col=[0],
         )
+        self.ref_organism_info, self.ref_organism_info_KO_duplicates, self.ref_organism_info_ORF_duplicates = (
+            databases.cast_dtypes(i, databases.Columns.dtypes)
+            for i in (self.ref_organism_info,
+                      self.ref_organism_info_KO_duplicates,
+                      self.ref_organism_info_ORF_duplicates)
+        )
         self.ref_kegg_db = pd.read_csv("test_data/DatabasesTests/ref_kegg_db.csv",
                                        sep='\t',
                                        index_col=[0])
@@ -474,6 +983,46 @@ class SGA1Tests(unittest.TestCase):
         self.sga1.parse(self.test_sga_filename)
         pd.testing.assert_frame_equal(self.ref_sga, self.sga1.sga)
 
+    def test_parse_usecols(self):
+        """
+        Test if SGA_v1 parsed in chunks with usecols keeps the same rows as
+        parsed whole, with the duplicates across the chunks dropped, and if
+        filtering by TEMP raises ValueError.
+        """
+        test_sga_filename = "test_data/SGA1Tests/test_sga_v1_usecols.csv"
+        usecols = [self.sga1.ORF_Q, self.sga1.ORF_A]
+        with open(self.test_sga_filename) as fin:
+            lines = fin.readlines()
+        try:
+            with open(test_sga_filename, 'w') as fout:
+                fout.writelines(lines[:300] + lines[100:300])
+            self.sga1.parse(test_sga_filename)
+            ref_sga = self.sga1.sga[usecols]
+            self.sga1.parse(test_sga_filename,
+                            usecols=usecols,
+                            chunksize=100,
+                            predicate=lambda x: np.ones(len(x), dtype=bool))
+            pd.testing.assert_frame_equal(ref_sga, self.sga1.sga)
+        finally:
+            os.remove(test_sga_filename)
+        with self.assertRaises(ValueError):
+            self.sga1.parse(self.test_sga_filename, temp='26')
+
+    def test_drop_seen_rows(self):
+        """
+        Test if databases._drop_seen_rows drops the same rows as
+        drop_duplicates of the concatenated chunks, and the distinct rows of
+        colliding hashes as documented.
+        """
+        sga = pd.DataFrame({self.sga1.ORF_Q: list("abcabdaeab"),
+                            self.sga1.GIS: [0.1, 0.2, 0.3] * 3 + [0.1]})
+        chunks = [sga.iloc[i:i + 3] for i in range(0, len(sga), 3)]
+        pd.testing.assert_frame_equal(pd.concat(databases._drop_seen_rows(chunks)),
+                                      sga.drop_duplicates())
+        with mock.patch.object(pd.util, "hash_pandas_object",
+                               lambda x, index: pd.Series(np.zeros(len(x), dtype=np.uint64))):
+            self.assertEqual(len(pd.concat(databases._drop_seen_rows(chunks))), 1)
+
 
 class SGA2Tests(unittest.TestCase):
     """
@@ -486,9 +1035,18 @@ class SGA2Tests(unittest.TestCase):
         self.sga2 = databases.SGA2()
         self.ref_sga = pd.read_csv("test_data/SGA2Tests/ref_sga_v2_1000r.csv")
         self.test_sga_filename = "test_data/SGA2Tests/test_sga_v2_1000r.csv"
+        self.test_cache_dirname = "{}{}".format(self.test_sga_filename,
+                                                self.sga2.SGA_CACHE_SUF)
         self.ref_sga = self.ref_sga.astype({k: v for k, v in self.sga2.dtypes.items()
                                             if k in self.ref_sga.columns})
 
+    def tearDown(self):
+        """
+        Removes files created during the tests.
+        """
+        if os.path.exists(self.test_cache_dirname):
+            shutil.rmtree(self.test_cache_dirname)
+
     def test_parse(self):
         """
         Test if SGA_v2 input file is properly parsed.
@@ -497,6 +1055,131 @@ class SGA2Tests(unittest.TestCase):
         pd.testing.assert_frame_equal(self.ref_sga,
                                       self.sga2.sga)
 
+    def test_parse_categories(self):
+        """
+        Test if SGA_v2 parsed in chunks with filters has the identifiers
+        categorical, with the categories of its own rows only, and if they
+        are looked up by prwlr.utils.index_positions with the same result as
+        the str.
+        """
+        self.sga2.parse(self.test_sga_filename, chunksize=300, gis=0.08)
+        for column in (self.sga2.ORF_Q, self.sga2.ORF_A, self.sga2.STR_ID_Q):
+            self.assertEqual(self.sga2.sga[column].dtype, 'category')
+            self.assertEqual(sorted(self.sga2.sga[column].cat.categories),
+                             sorted(self.sga2.sga[column].unique()))
+        keys = pd.Index(pd.unique(self.sga2.sga[self.sga2.ORF_A].astype(object))[::2])
+        np.testing.assert_array_equal(
+            utils.index_positions(keys, self.sga2.sga[self.sga2.ORF_Q]),
+            keys.get_indexer(self.sga2.sga[self.sga2.ORF_Q].astype(object)),
+        )
+
+    def test_parse_chunks(self):
+        """
+        Test if SGA_v2 input file parsed in chunks gives the same rows as
+        parsed at once.
+        """
+        chunks = list(self.sga2.parse_chunks(self.test_sga_filename,
+                                             chunksize=300))
+        self.assertEqual(len(chunks), 4)
+        pd.testing.assert_frame_equal(self.ref_sga,
+                                      databases.cast_dtypes(pd.concat(chunks, ignore_index=True),
+                                                            self.sga2.dtypes))
+
+    def test_parse_filters(self):
+        """
+        Test if SGA_v2 input file parsed with filters and columns selection
+        gives the same rows as filtered after parsing.
+        """
+        self.sga2.parse(self.test_sga_filename,
+                        usecols=[self.sga2.ORF_Q, self.sga2.ORF_A, self.sga2.GIS],
+                        p_value=0.05,
+                        gis=0.08,
+                        temp='DMA30',
+                        chunksize=100)
+        ref_sga = self.ref_sga[(self.ref_sga[self.sga2.GIS_P] <= 0.05) &
+                               (self.ref_sga[self.sga2.GIS].abs() >= 0.08)]
+        pd.testing.assert_frame_equal(databases.drop_unused_categories(ref_sga[[self.sga2.ORF_Q,
+                                                                                self.sga2.ORF_A,
+                                                                                self.sga2.GIS]].reset_index(drop=True)),
+                                      self.sga2.sga)
+
+    def test_parse_cache(self):
+        """
+        Test if SGA_v2 input file parsed with cache is written to the cache
+        and read from it with the same values.
+        """
+        self.sga2.parse(self.test_sga_filename, cache=True)
+        self.assertTrue(os.path.isdir(self.test_cache_dirname))
+        self.sga2.parse(self.test_sga_filename, cache=True)
+        self.assertIsInstance(self.sga2.sga[self.sga2.GIS].values, np.memmap)
+        pd.testing.assert_frame_equal(self.ref_sga,
+                                      self.sga2.sga.astype({k: object for k in self.sga2.sga.columns
+                                                            if self.sga2.sga[k].dtype == 'category' and
+                                                            k not in self.sga2.gene_ids}))
+
+    def test_parse_cache_unwritable(self):
+        """
+        Test if SGA_v2 input file which cache cannot be written is parsed
+        with a warning.
+        """
+        with open(self.test_cache_dirname, "w"):
+            pass
+        try:
+            with self.assertWarns(UserWarning):
+                self.sga2.parse(self.test_sga_filename, cache=True)
+        finally:
+            os.remove(self.test_cache_dirname)
+        pd.testing.assert_frame_equal(self.ref_sga,
+                                      self.sga2.sga.astype({k: object for k in self.sga2.sga.columns
+                                                            if self.sga2.sga[k].dtype == 'category' and
+                                                            k not in self.sga2.gene_ids}))
+
+    def test_parse_cache_unserializable(self):
+        """
+        Test if SGA with columns names which are not JSON serializable is
+        returned uncached with a warning.
+        """
+        ref_sga = pd.DataFrame({b"GIS": [0.1, 0.2]})
+        with self.assertWarns(UserWarning):
+            test_sga = databases._cached_sga(self.sga2,
+                                             self.test_sga_filename,
+                                             lambda: ref_sga)
+        self.assertFalse(os.path.exists(self.test_cache_dirname))
+        pd.testing.assert_frame_equal(ref_sga, test_sga)
+
+    def test_parse_cache_mixed(self):
+        """
+        Test if SGA with a column of mixed types is returned uncached with a
+        warning, without temporary directories left.
+        """
+        ref_sga = pd.DataFrame({"GENE_Q": [1, "a"]})
+        with self.assertWarns(UserWarning):
+            test_sga = databases._cached_sga(self.sga2,
+                                             self.test_sga_filename,
+                                             lambda: ref_sga)
+        self.assertFalse(os.path.exists(self.test_cache_dirname))
+        self.assertFalse([i for i in os.listdir(os.path.dirname(self.test_cache_dirname))
+                          if i.startswith(".{}".format(os.path.basename(self.test_cache_dirname)))])
+        self.assertEqual(test_sga["GENE_Q"].tolist(), [1, "a"])
+
+    def test_parse_cache_pickled(self):
+        """
+        Test if SGA_v2 cache with a pickled array is not unpickled and is
+        parsed and written again instead.
+        """
+        self.sga2.parse(self.test_sga_filename, cache=True)
+        filename = os.path.join(self.test_cache_dirname, "c0.categories.npy")
+        categories = np.load(filename).astype(object)
+        np.save(filename, categories, allow_pickle=True)
+        with self.assertRaises(ValueError):
+            utils.read_arrays(self.test_cache_dirname)
+        self.sga2.parse(self.test_sga_filename, cache=True)
+        self.assertNotEqual(np.load(filename).dtype, object)
+        pd.testing.assert_frame_equal(self.ref_sga,
+                                      self.sga2.sga.astype({k: object for k in self.sga2.sga.columns
+                                                            if self.sga2.sga[k].dtype == 'category' and
+                                                            k not in self.sga2.gene_ids}))
+
 
 class AnyNetworkTests(unittest.TestCase):
     """
@@ -514,6 +1197,7 @@ class AnyNetworkTests(unittest.TestCase):
         self.ORF_array_col = "target"
         self.sheet_name = "de novo SNPs"
         self.anynwrk = databases.AnyNetwork()
+        self.ref_anynwrk = databases.cast_dtypes(self.ref_anynwrk, self.anynwrk.dtypes)
 
     def test_parse(self):
         """
@@ -622,6 +1306,16 @@ class ProfileTests(unittest.TestCase):
         """
         self.assertEqual(self.test_profile, self.test_profile_2)
 
+    def test___hash__(self):
+        """
+        Test if equal profiles have equal hashes and profiles with different
+        queries are not equal.
+        """
+        self.assertEqual(hash(self.test_profile), hash(self.test_profile_2))
+        self.assertNotEqual(self.test_profile,
+                            profiles.Profile(reference=self.ref_reference,
+                                             query=self.ref_query[:-1] + ["!"]))
+
     def test__convert(self):
         """
         Test if profile is properly converted.
@@ -717,6 +1411,22 @@ class ProfileTests(unittest.TestCase):
                                                          ignore=self.ref_ignore_elements),
                          self.ref_pss_ignore)
 
+    def test_calculate_pss_ignore_non_destructive(self):
+        """
+        Test if ignore arg leaves the compared profiles intact, so repeated
+        calls return the same value.
+        """
+        test_profile_2 = profiles.Profile(reference=self.ref_reference,
+                                          query=self.ref_query)
+        for _ in range(2):
+            self.assertEqual(self.test_profile.calculate_pss(test_profile_2,
+                                                             ignore=self.ref_ignore_elements),
+                             self.ref_pss_ignore)
+        self.assertEqual(self.test_profile.to_string(), self.ref_profile)
+        self.assertEqual(len(test_profile_2), len(self.ref_query))
+        with self.assertRaises(errors.ProfileError):
+            self.test_profile.calculate_pss(test_profile_2, ignore=["!"])
+
     def test_get_present(self):
         """
         Test if get_present returns list of present items in the profile.
@@ -730,6 +1440,329 @@ class ProfileTests(unittest.TestCase):
         self.assertEqual(self.test_profile.get_absent(), self.ref_absent)
 
 
+class ProfileMatrixTests(unittest.TestCase):
+    """
+    Tests for prwlr.profiles.ProfileMatrix.
+    """
+    def setUp(self):
+        """
+        Sets up class level attributes for the tests.
+        """
+        self.ref_query = list("acdfhiklostuz")
+        self.ref_references = [list("bcefghijklmnprstuwxy"),
+                               list("acefghijklmnprstuwxy"),
+                               list("xyz"),
+                               list("")]
+        self.ref_index = ["YAL001", "YAL002", "YAL003", "YAL004"]
+        self.ref_profiles = pd.Series(
+            [profiles.Profile(reference=i, query=self.ref_query)
+             for i in self.ref_references],
+            index=self.ref_index,
+        )
+        self.test_matrix = profiles.ProfileMatrix.from_references(
+            self.ref_references,
+            self.ref_query,
+            index=self.ref_index,
+        )
+
+    def test_from_references(self):
+        """
+        Test if ProfileMatrix built from references holds the same profiles
+        as prwlr.profiles.Profile objects built from the same data.
+        """
+        self.assertEqual(self.test_matrix.shape, (4, len(self.ref_query)))
+        self.assertEqual(self.test_matrix.bits.shape, (4, 2))
+        pd.testing.assert_series_equal(self.ref_profiles,
+                                       self.test_matrix.to_series())
+
+    def test_to_series_lazy(self):
+        """
+        Test if profiles of ProfileMatrix.to_series keep the packed rows
+        until used and survive pickling.
+        """
+        test_profiles = self.test_matrix.to_series()
+        self.assertIsNone(test_profiles.iloc[0]._profile)
+        self.assertIsNone(test_profiles.iloc[0]._reference)
+        self.assertEqual(test_profiles.iloc[0].profile, self.ref_profiles.iloc[0].profile)
+        self.assertIsNone(test_profiles.iloc[0]._packed)
+        self.assertEqual(pickle.loads(pickle.dumps(test_profiles.iloc[1])), self.ref_profiles.iloc[1])
+        self.assertEqual(pickle.loads(pickle.dumps(test_profiles.iloc[1])).reference,
+                         test_profiles.iloc[1].reference)
+
+    def test_from_references_reference(self):
+        """
+        Test if profiles of ProfileMatrix have the present query elements as
+        the reference and are written by prwlr.core.save_profiles that way.
+        """
+        import prwlr.core
+
+        self.assertEqual(self.test_matrix[2].reference, {"z"})
+        self.assertEqual(
+            self.test_matrix[2].reference,
+            self.ref_profiles.iloc[2].reference.intersection(self.ref_query),
+        )
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, "profiles.csv")
+            prwlr.core.save_profiles(self.test_matrix.to_series(), filename)
+            self.assertEqual(pd.read_csv(filename)["REF"][2], "z")
+            pd.testing.assert_series_equal(
+                self.ref_profiles,
+                prwlr.core.read_profiles(filename, index_col=[0]),
+            )
+
+    def test_from_profiles(self):
+        """
+        Test if ProfileMatrix built from prwlr.profiles.Profile objects keeps
+        the packed bits and the index.
+        """
+        test_matrix = profiles.ProfileMatrix.from_profiles(self.ref_profiles)
+        np.testing.assert_array_equal(test_matrix.bits, self.test_matrix.bits)
+        self.assertEqual(list(test_matrix.index), self.ref_index)
+
+    def test_select(self):
+        """
+        Test if prwlr.profiles.select returns the same profiles as
+        Profile.isall and Profile.isany, for pandas.Series and ProfileMatrix.
+        """
+        present, absent, any_of = list("hi"), list("az"), list("cdo")
+        ref_selected = self.ref_profiles[self.ref_profiles.apply(
+            lambda x: x.isall(present) and
+            not x.isany(absent) and
+            x.isany(any_of)
+        )]
+        pd.testing.assert_series_equal(
+            ref_selected,
+            profiles.select(self.ref_profiles, present=present, absent=absent, any_of=any_of),
+        )
+        self.assertEqual(
+            list(ref_selected.index),
+            list(profiles.select(self.test_matrix, present=present, absent=absent, any_of=any_of).index),
+        )
+        self.assertTrue(self.test_matrix[0].isall(present))
+        with self.assertRaises(errors.ProfileError):
+            profiles.select(self.test_matrix, present=["!"])
+
+    def test_project(self):
+        """
+        Test if ProfileMatrix.project and ProfileMatrix.drop select and
+        reorder the species axis.
+        """
+        test_matrix = self.test_matrix.project(["z", "a", "c"])
+        self.assertEqual(test_matrix.query, ["z", "a", "c"])
+        self.assertEqual(test_matrix[1].to_string(), "-++")
+        test_matrix = self.test_matrix.drop(["a"])
+        self.assertEqual(test_matrix[1].to_string(), self.ref_profiles.iloc[1].to_string()[1:])
+        with self.assertRaises(errors.ProfileError):
+            self.test_matrix.project(["!"])
+
+    def test___getitem__(self):
+        """
+        Test if ProfileMatrix returns prwlr.profiles.Profile row views and
+        ProfileMatrix for slices.
+        """
+        self.assertEqual(self.test_matrix[1], self.ref_profiles.iloc[1])
+        self.assertEqual(self.test_matrix[-1].to_string(), "-" * len(self.ref_query))
+        self.assertEqual(list(self.test_matrix[1:3].index), self.ref_index[1:3])
+
+
+class ProfileArrayTests(unittest.TestCase):
+    """
+    Tests for prwlr.profiles.ProfileArray.
+    """
+    def setUp(self):
+        """
+        Sets up class level attributes for the tests.
+        """
+        self.ref_query = list("acdfhiklostuz")
+        self.ref_profiles = pd.Series(
+            [profiles.Profile(reference=i, query=self.ref_query)
+             for i in (list("bcefghijklmnprstuwxy"),
+                       list("acefghijklmnprstuwxy"),
+                       list("xyz"),
+                       list("bcefghijklmnprstuwxy"))],
+        )
+        self.test_profiles = self.ref_profiles.astype("profile")
+
+    def test_construct(self):
+        """
+        Test if ProfileArray holds the distinct profiles once and returns
+        equal prwlr.profiles.Profile objects.
+        """
+        self.assertIsInstance(self.test_profiles.dtype, profiles.ProfileDtype)
+        self.assertEqual(len(self.test_profiles.array._table), 3)
+        self.assertEqual(list(self.test_profiles), list(self.ref_profiles))
+        pd.testing.assert_series_equal(self.ref_profiles, self.test_profiles.astype(object))
+
+    def test_take_concat_isna(self):
+        """
+        Test if take, concat and isna work natively.
+        """
+        test_taken = self.test_profiles.take([3, 0])
+        self.assertIs(test_taken.array._table, self.test_profiles.array._table)
+        test_reindexed = self.test_profiles.reindex([0, 7])
+        self.assertEqual(list(test_reindexed.isna()), [False, True])
+        test_concat = pd.concat([
+            self.test_profiles,
+            self.ref_profiles.iloc[1:3].astype("profile"),
+        ])
+        self.assertIsInstance(test_concat.dtype, profiles.ProfileDtype)
+        self.assertEqual(list(test_concat), list(self.ref_profiles) + list(self.ref_profiles.iloc[1:3]))
+
+    def test_factorize_eq(self):
+        """
+        Test if factorize and equality use the codes of distinct profiles.
+        """
+        codes, uniques = pd.factorize(self.test_profiles)
+        self.assertEqual(list(codes), [0, 1, 2, 0])
+        self.assertEqual(len(uniques), 3)
+        self.assertEqual(list(self.test_profiles == self.test_profiles.iloc[0]),
+                         [True, False, False, True])
+        self.assertEqual(len(pd.DataFrame({"PROF": self.test_profiles}).drop_duplicates()), 3)
+
+    def test_sort_value_counts(self):
+        """
+        Test if sorting orders the profiles like prwlr.profiles.Profile objects
+        and value_counts counts each of the distinct profiles.
+        """
+        self.assertEqual(list(self.test_profiles.sort_values()), sorted(self.ref_profiles))
+        self.assertEqual(list(self.test_profiles.argsort()), list(self.ref_profiles.argsort()))
+        test_counts = self.test_profiles.reindex([0, 1, 2, 3, 7]).value_counts(dropna=False)
+        self.assertEqual(list(test_counts), [2, 1, 1, 1])
+        self.assertEqual(test_counts.index[0], self.ref_profiles[0])
+        self.assertEqual(sorted(test_counts.index[1:3]), sorted(self.ref_profiles.iloc[1:3]))
+        self.assertTrue(pd.isna(test_counts.index[3]))
+
+    def test_calculate_pss(self):
+        """
+        Test if prwlr.core.calculate_pss returns the same values for
+        ProfileArray and object columns.
+        """
+        import prwlr.core
+
+        network = pd.DataFrame({
+            "PROF_Q": self.ref_profiles,
+            "PROF_A": self.ref_profiles.iloc[::-1].reset_index(drop=True),
+        })
+        ref_pss = prwlr.core.calculate_pss(network.copy(), "jaccard")["PSS"]
+        test_pss = prwlr.core.calculate_pss(network.astype("profile"), "jaccard")["PSS"]
+        pd.testing.assert_series_equal(ref_pss, test_pss)
+
+
+class ProfileIndexTests(unittest.TestCase):
+    """
+    Tests for prwlr.profiles.ProfileIndex.
+    """
+    def setUp(self):
+        """
+        Sets up class level attributes for the tests.
+        """
+        rng = np.random.RandomState(0)
+        self.ref_query = ["sp{:02d}".format(i) for i in range(40)]
+        self.ref_profiles = pd.Series(
+            [profiles.Profile(reference=[q for q, p in zip(self.ref_query, rng.rand(40)) if p < density],
+                              query=self.ref_query)
+             for density in np.linspace(0.05, 0.95, 150)],
+            index=["ORF{:03d}".format(i) for i in range(150)],
+        )
+        self.ref_label = "ORF042"
+        self.k = 7
+
+    def brute_force(self,
+                    method):
+        """
+        Returns distances of all the profiles to the query sorted by distance
+        and the position.
+        """
+        query = self.ref_profiles[self.ref_label]
+        distances = self.ref_profiles.drop(self.ref_label).apply(
+            lambda x: query.calculate_pss(x, method=method),
+        )
+        positions = np.arange(len(distances))
+        return distances.iloc[np.lexsort((positions, distances.values))]
+
+    def test_topk(self):
+        """
+        Test if ProfileIndex.topk returns the same profiles as the brute
+        force search, for a single query and in batch.
+        """
+        for method in profiles.ProfileIndex.methods:
+            index = profiles.ProfileIndex(self.ref_profiles, method=method, slices=4)
+            ref_topk = self.brute_force(method).iloc[:self.k]
+            test_topk = index.topk(self.ref_label, k=self.k, chunksize=8)
+            self.assertEqual(list(ref_topk.index), list(test_topk.index))
+            np.testing.assert_array_equal(ref_topk.values, test_topk.values)
+            test_batch = index.topk(self.ref_profiles.iloc[:3], k=self.k)
+            self.assertEqual(len(test_batch), 3 * self.k)
+            self.assertEqual(test_batch[index.PSS].iloc[0], 0)
+
+    def test_radius(self):
+        """
+        Test if ProfileIndex.radius returns all the profiles within the
+        radius.
+        """
+        for method in profiles.ProfileIndex.methods:
+            index = profiles.ProfileIndex(self.ref_profiles, method=method)
+            ref_distances = self.brute_force(method)
+            radius = ref_distances.iloc[10]
+            test_radius = index.radius(self.ref_label, radius)
+            self.assertEqual(list(ref_distances[ref_distances <= radius].index),
+                             list(test_radius.index))
+
+
+class SimilarPairsTests(unittest.TestCase):
+    """
+    Tests for prwlr.profiles.similar_pairs.
+    """
+    def setUp(self):
+        """
+        Sets up class level attributes for the tests. Synthetic profiles come
+        in families derived from one random profile with a few species
+        flipped.
+        """
+        rng = np.random.RandomState(0)
+        families = rng.rand(30, 200) < 0.3
+        members = families.repeat(10, axis=0) ^ (rng.rand(300, 200) < 0.03)
+        self.test_matrix = profiles.ProfileMatrix.from_bool(
+            members,
+            ["sp{:03d}".format(i) for i in range(200)],
+        )
+        self.max_distance = 0.3
+
+    def test_similar_pairs(self):
+        """
+        Test if similar_pairs finds only pairs within the distance and
+        recovers most of the exact pairs.
+        """
+        test_pairs = profiles.similar_pairs(self.test_matrix, self.max_distance)
+        self.assertTrue((test_pairs[profiles.Columns.PSS] <= self.max_distance).all())
+        self.assertGreater(len(test_pairs), 0)
+        recall = profiles.similar_pairs_recall(self.test_matrix, self.max_distance)
+        self.assertGreaterEqual(recall, 0.9)
+        self.assertLessEqual(recall, 1.0)
+
+    def test_similar_pairs_identical(self):
+        """
+        Test if similar_pairs reports each pair of thousands of identical
+        profiles once, together with the pairs of the other profiles.
+        """
+        identical = np.repeat(self.test_matrix.to_bool()[:1], 1500, axis=0)
+        test_matrix = profiles.ProfileMatrix.from_bool(
+            np.concatenate((self.test_matrix.to_bool(), identical)),
+            self.test_matrix.query,
+        )
+        test_pairs = profiles.similar_pairs(test_matrix, self.max_distance)
+        ref_pairs = profiles.similar_pairs(self.test_matrix, self.max_distance)
+        self.assertFalse(test_pairs.duplicated([profiles.Columns.QUERY, profiles.Columns.TARGET]).any())
+        self.assertTrue((test_pairs[profiles.Columns.QUERY] < test_pairs[profiles.Columns.TARGET]).all())
+        within = test_pairs[profiles.Columns.QUERY] >= len(self.test_matrix)
+        self.assertEqual(within.sum(), 1500 * 1499 // 2)
+        self.assertTrue((test_pairs[profiles.Columns.PSS][within] == 0).all())
+        pd.testing.assert_frame_equal(
+            ref_pairs,
+            test_pairs[test_pairs[profiles.Columns.TARGET] < len(self.test_matrix)].reset_index(drop=True),
+        )
+
+
 class StatsTests(unittest.TestCase):
     """
     Tests of prwlr.stats top-level functions.
@@ -783,6 +1816,15 @@ class CoreTests(unittest.TestCase):
         self.ref_network_filename = 'test_data/CoreTests/ref_network.csv'
         self.test_saved_profiles_filename = 'test_data/CoreTests/test_save_profiles.csv'
         self.test_saved_network_filename = 'test_data/CoreTests/test_save_network.csv'
+        self.test_saved_network_table_filename = '{}.profiles.csv'.format(self.test_saved_network_filename)
+        self.test_saved_pss_filename = 'test_data/CoreTests/test_all_vs_all_pss.npy'
+        self.test_saved_profiles_dirname = 'test_data/CoreTests/test_save_profiles_binary'
+        self.test_saved_network_dirname = 'test_data/CoreTests/test_save_network_binary'
+        self.test_scored_sga_filename = 'test_data/CoreTests/test_score_sga.csv'
+        self.test_split_sga_filenames = [
+            'test_data/CoreTests/test_sga_part_1.csv',
+            'test_data/CoreTests/test_sga_part_2.csv',
+        ]
 
         self.ref_profile_1, self.ref_profile_2 = (
             prwlr.profiles.Profile(
@@ -817,6 +1859,19 @@ class CoreTests(unittest.TestCase):
             os.remove(self.test_saved_profiles_filename)
         if os.path.exists(self.test_saved_network_filename):
             os.remove(self.test_saved_network_filename)
+        if os.path.exists(self.test_saved_network_table_filename):
+            os.remove(self.test_saved_network_table_filename)
+        if os.path.exists(self.test_saved_pss_filename):
+            os.remove(self.test_saved_pss_filename)
+        if os.path.exists(self.test_saved_profiles_dirname):
+            shutil.rmtree(self.test_saved_profiles_dirname)
+        if os.path.exists(self.test_saved_network_dirname):
+            shutil.rmtree(self.test_saved_network_dirname)
+        if os.path.exists(self.test_scored_sga_filename):
+            os.remove(self.test_scored_sga_filename)
+        for i in self.test_split_sga_filenames:
+            if os.path.exists(i):
+                os.remove(i)
 
     def test_read_profiles(self):
         """
@@ -869,6 +1924,435 @@ class CoreTests(unittest.TestCase):
             check_like=True,
         )
 
+    def test_save_network_profiles_table(self):
+        """
+        Tests if prwlr.core.save_network writes the profiles in every row, or
+        once to the profiles table, and prwlr.core.read_network shares one
+        object per distinct profile, also for some of the rows only. Codes
+        missing from the profiles table raise ParserError.
+        """
+        import prwlr.core
+
+        network_df = pd.concat(
+            [self.ref_network_df] * 3,
+            ignore_index=True,
+        )
+        prwlr.core.save_network(
+            network_df,
+            self.test_saved_network_filename,
+        )
+        saved_df = pd.read_csv(self.test_saved_network_filename)
+        self.assertEqual(
+            saved_df[['PROF_Q_QRY', 'PROF_A_QRY']].notna().sum().sum(),
+            6,
+        )
+        test_network_df = prwlr.core.read_network(
+            self.test_saved_network_filename,
+            index_col=[0],
+        )
+        pd.testing.assert_frame_equal(
+            network_df,
+            test_network_df[network_df.columns],
+        )
+        self.assertIs(test_network_df['PROF_Q'][0], test_network_df['PROF_Q'][2])
+        test_network_df = prwlr.core.read_network(
+            self.test_saved_network_filename,
+            index_col=[0],
+            skiprows=[1],
+        )
+        pd.testing.assert_frame_equal(
+            network_df.iloc[1:],
+            test_network_df[network_df.columns],
+        )
+        prwlr.core.save_network(
+            network_df,
+            self.test_saved_network_filename,
+            profiles_table=True,
+        )
+        table_df = pd.read_csv(self.test_saved_network_table_filename, index_col=[0])
+        self.assertEqual(len(table_df), 2)
+        saved_df = pd.read_csv(self.test_saved_network_filename)
+        self.assertNotIn('PROF_Q_QRY', saved_df.columns)
+        self.assertEqual(saved_df['PROF_Q'].dtype, np.int64)
+        test_network_df = prwlr.core.read_network(
+            self.test_saved_network_filename,
+            index_col=[0],
+            skiprows=[1],
+        )
+        pd.testing.assert_frame_equal(
+            network_df.iloc[1:],
+            test_network_df[network_df.columns],
+        )
+        self.assertIs(test_network_df['PROF_Q'][1], test_network_df['PROF_Q'][2])
+        table_df.iloc[:1].to_csv(self.test_saved_network_table_filename)
+        with self.assertRaises(errors.ParserError):
+            prwlr.core.read_network(
+                self.test_saved_network_filename,
+                index_col=[0],
+            )
+        os.remove(self.test_saved_network_table_filename)
+        with self.assertRaises(errors.ParserError):
+            prwlr.core.read_network(
+                self.test_saved_network_filename,
+                index_col=[0],
+            )
+
+    def test_save_network_chunks(self):
+        """
+        Tests if prwlr.core.save_network written in chunks is read back by
+        prwlr.core.read_network in chunks sharing the profiles.
+        """
+        import prwlr.core
+
+        network_df = pd.concat(
+            [self.ref_network_df] * 3,
+            ignore_index=True,
+        )
+        prwlr.core.save_network(
+            network_df,
+            self.test_saved_network_filename,
+            chunksize=2,
+        )
+        test_chunks = list(prwlr.core.read_network(
+            self.test_saved_network_filename,
+            chunksize=1,
+            index_col=[0],
+        ))
+        self.assertEqual(len(test_chunks), 3)
+        self.assertIs(test_chunks[0]['PROF_A'][0], test_chunks[2]['PROF_A'][2])
+        pd.testing.assert_frame_equal(
+            network_df,
+            pd.concat(test_chunks)[network_df.columns],
+        )
+
+    def test_merge_sga_profiles_profile_matrix(self):
+        """
+        Tests if prwlr.core.merge_sga_profiles returns the same network for
+        prwlr.profiles.ProfileMatrix and pandas.DataFrame of profiles.
+        """
+        import prwlr.core
+
+        sga = pd.DataFrame({
+            'ORF_Q': ['YAL001', 'YAL001', 'YAL003'],
+            'ORF_A': ['YAL002', 'YAL003', 'YAL002'],
+            'GIS': [0.1, 0.2, 0.3],
+        })
+        profile_matrix = prwlr.profiles.ProfileMatrix.from_profiles(
+            pd.Series(
+                [self.ref_profile_1, self.ref_profile_1],
+                index=['YAL001', 'YAL002'],
+            ),
+        )
+        pd.testing.assert_frame_equal(
+            prwlr.core.merge_sga_profiles(
+                sga,
+                pd.DataFrame({
+                    'ORF_ID': ['YAL001', 'YAL002'],
+                    'PROF': [self.ref_profile_1, self.ref_profile_1],
+                }),
+            ),
+            prwlr.core.merge_sga_profiles(sga, profile_matrix).astype({
+                'PROF_Q': object,
+                'PROF_A': object,
+            }),
+        )
+
+    def test_merge_sga_profiles_categorical(self):
+        """
+        Tests if prwlr.core.merge_sga_profiles keeps ORFs of categorical
+        SGA categorical and shares the profiles objects.
+        """
+        import prwlr.core
+
+        sga = pd.DataFrame({
+            'ORF_Q': ['YAL001', 'YAL001', 'YAL003', 'YAL002'],
+            'ORF_A': ['YAL002', 'YAL003', 'YAL002', 'YAL004'],
+            'GIS': [0.1, 0.2, 0.3, 0.4],
+        })
+        profiles = pd.DataFrame({
+            'ORF_ID': ['YAL001', 'YAL002', 'YAL003'],
+            'PROF': [self.ref_profile_1, self.ref_profile_2, self.ref_profile_1],
+        })
+        network = prwlr.core.merge_sga_profiles(sga.astype('category'), profiles)
+        self.assertEqual(network['ORF_Q'].dtype, 'category')
+        self.assertEqual(
+            network['ORF_Q'].tolist(),
+            ['YAL001', 'YAL001', 'YAL003'],
+        )
+        self.assertEqual(network['ORF_A'].tolist(), ['YAL002', 'YAL003', 'YAL002'])
+        self.assertEqual(network.groupby('ORF_A', observed=True).size().tolist(), [2, 1])
+        self.assertIs(network['PROF_Q'][0], network['PROF_A'][1])
+
+    def test_calculate_pss(self):
+        """
+        Tests if prwlr.core.calculate_pss returns the same values as
+        prwlr.profiles.Profile.calculate_pss for all the methods.
+        """
+        import prwlr.core
+
+        rng = np.random.RandomState(0)
+        query = list('abcdefghijklmnopqrst')
+        test_profiles = [
+            prwlr.profiles.Profile(
+                reference=[q for q, p in zip(query, rng.rand(len(query))) if p < density],
+                query=query,
+            )
+            for density in (0.0, 0.1, 0.3, 0.5, 0.7, 1.0) * 5
+        ]
+        network = pd.DataFrame({
+            'PROF_Q': [test_profiles[i] for i in rng.randint(0, len(test_profiles), 200)],
+            'PROF_A': [test_profiles[i] for i in rng.randint(0, len(test_profiles), 200)],
+        })
+        for method in prwlr.profiles.PSS_METHODS:
+            np.testing.assert_array_equal(
+                network.apply(
+                    lambda x: x['PROF_Q'].calculate_pss(x['PROF_A'], method=method),
+                    axis=1,
+                ).values,
+                prwlr.core.calculate_pss(network, method)['PSS'].values,
+            )
+            np.testing.assert_array_equal(
+                network.apply(
+                    lambda x: x['PROF_Q'].calculate_pss(x['PROF_A'], method=method, ignore=query[3:9]),
+                    axis=1,
+                ).values,
+                prwlr.core.calculate_pss(network, method, ignore=query[3:9])['PSS'].values,
+            )
+
+    def test_calculate_pss_cache(self):
+        """
+        Tests if prwlr.core.calculate_pss scores each distinct pair of
+        profiles once and reuses the prwlr.profiles.PairCache across calls.
+        """
+        import prwlr.core
+
+        network = pd.DataFrame({
+            'PROF_Q': [self.ref_profile_1, self.ref_profile_2, self.ref_profile_1],
+            'PROF_A': [
+                self.ref_profile_2,
+                self.ref_profile_1,
+                prwlr.profiles.Profile(
+                    reference=self.ref_reference_2,
+                    query=self.ref_query_2,
+                ),
+            ],
+        })
+        cache = prwlr.profiles.PairCache(maxsize=10)
+        prwlr.core.calculate_pss(network, 'jaccard', cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        prwlr.core.calculate_pss(network, 'jaccard', cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        self.assertEqual(
+            list(network['PSS']),
+            [q.calculate_pss(a, method='jaccard') for q, a in zip(network['PROF_Q'], network['PROF_A'])],
+        )
+        cache = prwlr.profiles.PairCache(max_profiles=1)
+        pss = list(network['PSS'])
+        prwlr.core.calculate_pss(network, 'jaccard', cache=cache)
+        self.assertEqual(list(network['PSS']), pss)
+        self.assertEqual((len(cache), len(cache._profiles)), (0, 0))
+
+    def test_leave_one_out_pss(self):
+        """
+        Tests if prwlr.core.leave_one_out_pss returns the same values as
+        prwlr.core.calculate_pss with each of the species ignored.
+        """
+        import prwlr.core
+
+        rng = np.random.RandomState(0)
+        query = list('abcdefghij')
+        test_matrix = prwlr.profiles.ProfileMatrix.from_bool(rng.rand(8, 10) < 0.5, query)
+        network = pd.DataFrame({
+            'PROF_Q': test_matrix.to_series().values[rng.randint(0, 8, 50)],
+            'PROF_A': test_matrix.to_series().values[rng.randint(0, 8, 50)],
+        })
+        for method in ('pairwise', 'jaccard', 'sokalmichener'):
+            test_pss = prwlr.core.leave_one_out_pss(network, method)
+            self.assertEqual(list(test_pss.columns), query)
+            for species in query:
+                np.testing.assert_array_equal(
+                    prwlr.core.calculate_pss(network, method, ignore=[species])['PSS'].values,
+                    test_pss[species].values,
+                )
+            pd.testing.assert_frame_equal(prwlr.core.leave_one_out_pss(network, method, memory=2000), test_pss)
+
+    def test_read_sga_files(self):
+        """
+        Tests if prwlr.core.read_sga reads list or glob of files into the same
+        interactions as the single file, with the source column.
+        """
+        import prwlr.core
+
+        sga_filename = 'test_data/SGA2Tests/test_sga_v2_1000r.csv'
+        raw_sga = pd.read_csv(sga_filename, sep='\t')
+        raw_sga.iloc[:400].to_csv(self.test_split_sga_filenames[0], sep='\t', index=False)
+        raw_sga.iloc[400:].to_csv(self.test_split_sga_filenames[1], sep='\t', index=False)
+        ref_sga = prwlr.core.read_sga(sga_filename)
+        for filenames, workers in (
+            (self.test_split_sga_filenames, 1),
+            ('test_data/CoreTests/test_sga_part_*.csv', None),
+        ):
+            test_sga = prwlr.core.read_sga(filenames, workers=workers)
+            self.assertEqual(
+                test_sga['SOURCE'].value_counts().to_dict(),
+                {self.test_split_sga_filenames[0]: 400,
+                 self.test_split_sga_filenames[1]: 599},
+            )
+            self.assertEqual(test_sga['ORF_Q'].dtype, ref_sga['ORF_Q'].dtype)
+            pd.testing.assert_frame_equal(
+                ref_sga,
+                test_sga.drop(columns='SOURCE'),
+            )
+
+    def test_score_sga(self):
+        """
+        Tests if prwlr.core.score_sga writes the same interactions and PSS
+        as prwlr.core.calculate_pss of the merged network, also when called
+        again with workers and other profiles.
+        """
+        import prwlr.core
+
+        sga_filename = 'test_data/SGA2Tests/test_sga_v2_1000r.csv'
+        sga = prwlr.core.read_sga(sga_filename)
+        orfs = pd.unique(pd.concat([sga['ORF_Q'], sga['ORF_A']]).astype(object))
+        for seed, workers in ((0, 1), (0, 2), (1, 2)):
+            profile_matrix = prwlr.profiles.ProfileMatrix.from_bool(
+                np.random.RandomState(seed).rand(len(orfs) - 20 * (seed + 1), 30) > 0.5,
+                ['species_{}'.format(i) for i in range(30)],
+                index=orfs[:len(orfs) - 20 * (seed + 1)],
+            )
+            ref_network_df = prwlr.core.calculate_pss(
+                prwlr.core.merge_sga_profiles(sga, profile_matrix),
+                'jaccard',
+            )
+            written = prwlr.core.score_sga(
+                sga_filename,
+                profile_matrix,
+                self.test_scored_sga_filename,
+                'jaccard',
+                chunksize=100,
+                workers=workers,
+            )
+            test_network_df = pd.read_csv(self.test_scored_sga_filename)
+            self.assertEqual(written, len(ref_network_df))
+            self.assertEqual(
+                test_network_df['ORF_Q'].tolist(),
+                ref_network_df['ORF_Q'].tolist(),
+            )
+            np.testing.assert_allclose(
+                test_network_df['PSS'].values,
+                ref_network_df['PSS'].values,
+            )
+
+    def test_score_sga_v1(self):
+        """
+        Tests if prwlr.core.score_sga drops the duplicates of SGA v1 across
+        the chunks, as prwlr.core.read_sga does, and writes the header of a
+        SGA with no interactions.
+        """
+        import prwlr.core
+
+        sga_filename = 'test_data/CoreTests/test_score_sga_v1.csv'
+        with open('test_data/SGA1Tests/test_sga_v1_1000r.csv') as fin:
+            lines = fin.readlines()
+        try:
+            with open(sga_filename, 'w') as fout:
+                fout.writelines(lines[:300] + lines[100:300])
+            sga = prwlr.core.read_sga(sga_filename, version=1)
+            orfs = pd.unique(pd.concat([sga['ORF_Q'], sga['ORF_A']]))
+            profile_matrix = prwlr.profiles.ProfileMatrix.from_bool(
+                np.random.RandomState(0).rand(len(orfs), 30) > 0.5,
+                ['species_{}'.format(i) for i in range(30)],
+                index=orfs,
+            )
+            ref_network_df = prwlr.core.calculate_pss(
+                prwlr.core.merge_sga_profiles(sga, profile_matrix),
+                'jaccard',
+            )
+            written = prwlr.core.score_sga(
+                sga_filename,
+                profile_matrix,
+                self.test_scored_sga_filename,
+                'jaccard',
+                version=1,
+                chunksize=100,
+            )
+            self.assertEqual(written, len(ref_network_df))
+            self.assertEqual(
+                pd.read_csv(self.test_scored_sga_filename)['ORF_A'].tolist(),
+                ref_network_df['ORF_A'].tolist(),
+            )
+            with open(sga_filename, 'w') as fout:
+                fout.writelines(lines[:10])
+            written = prwlr.core.score_sga(
+                sga_filename,
+                profile_matrix,
+                self.test_scored_sga_filename,
+                'jaccard',
+                version=1,
+                chunksize=100,
+                gis=100,
+            )
+            self.assertEqual(written, 0)
+            test_network_df = pd.read_csv(self.test_scored_sga_filename)
+            self.assertEqual(len(test_network_df), 0)
+            self.assertIn('PSS', test_network_df.columns)
+        finally:
+            os.remove(sga_filename)
+
+    def test_all_vs_all_pss(self):
+        """
+        Tests if prwlr.core.all_vs_all_pss returns square and condensed
+        matrices consistent with prwlr.profiles.Profile.calculate_pss.
+        """
+        import prwlr.core
+        from scipy.spatial.distance import squareform
+
+        rng = np.random.RandomState(0)
+        query = list('abcdefghijklmnopqrst')
+        test_profiles = pd.Series([
+            prwlr.profiles.Profile(
+                reference=[q for q, p in zip(query, rng.rand(len(query))) if p < 0.5],
+                query=query,
+            )
+            for _ in range(23)
+        ])
+        ref_pss = np.array([
+            [i.calculate_pss(j, method='jaccard') for j in test_profiles]
+            for i in test_profiles
+        ])
+        test_pss = prwlr.core.all_vs_all_pss(
+            test_profiles,
+            method='jaccard',
+            block_size=5,
+        )
+        np.testing.assert_array_equal(ref_pss, test_pss)
+        test_condensed_pss = prwlr.core.all_vs_all_pss(
+            prwlr.profiles.ProfileMatrix.from_profiles(test_profiles),
+            method='jaccard',
+            block_size=5,
+            workers=2,
+            out=self.test_saved_pss_filename,
+            condensed=True,
+        )
+        np.testing.assert_array_equal(squareform(ref_pss, checks=False), test_condensed_pss)
+        np.testing.assert_array_equal(
+            test_condensed_pss,
+            np.load(self.test_saved_pss_filename, mmap_mode='r'),
+        )
+        for _ in range(2):
+            test_out = np.full(len(test_condensed_pss), np.nan)
+            test_condensed_pss = prwlr.core.all_vs_all_pss(
+                test_profiles,
+                method='jaccard',
+                block_size=4,
+                workers=3,
+                out=test_out,
+                condensed=True,
+            )
+            self.assertIs(test_condensed_pss, test_out)
+            np.testing.assert_array_equal(squareform(ref_pss, checks=False), test_out)
+
     def test_save_profiles(self):
         """
         Tests if prwlr.core.save_profiles writes CSV file with correct values.
@@ -887,6 +2371,53 @@ class CoreTests(unittest.TestCase):
             ),
         )
 
+    def test_save_profiles_binary(self):
+        """
+        Tests if prwlr.core.save_profiles_binary saves profiles suitable for
+        prwlr.core.read_profiles_binary, keeping the references elements
+        missing from the query.
+        """
+        import prwlr.core
+
+        prwlr.core.save_profiles_binary(
+            self.ref_profiles_srs,
+            self.test_saved_profiles_dirname,
+        )
+        test_profiles_srs = prwlr.core.read_profiles_binary(
+            self.test_saved_profiles_dirname,
+        )
+        pd.testing.assert_series_equal(
+            self.ref_profiles_srs,
+            test_profiles_srs,
+        )
+        self.assertEqual(
+            [i.reference for i in self.ref_profiles_srs],
+            [i.reference for i in test_profiles_srs],
+        )
+
+    def test_save_network_binary(self):
+        """
+        Tests if prwlr.core.save_network_binary saves network suitable for
+        prwlr.core.read_network_binary, with numeric columns memory-mapped.
+        """
+        import prwlr.core
+
+        prwlr.core.save_network_binary(
+            self.ref_network_df,
+            self.test_saved_network_dirname,
+        )
+        test_network_df = prwlr.core.read_network_binary(
+            self.test_saved_network_dirname,
+        )
+        pd.testing.assert_frame_equal(
+            self.ref_network_df,
+            test_network_df,
+        )
+        self.assertIsInstance(
+            test_network_df['PSS'].values,
+            np.memmap,
+        )
+
 
 if __name__ == '__main__':
     unittest.main()